@@ -0,0 +1,160 @@
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+# バッチサイズの決定方式（fixed: READ_NUMで固定、adaptive: 計測したスループットに応じて調整）
+BATCH_SIZE_MODE = os.getenv('BATCH_SIZE_MODE', 'fixed').lower()
+# 調整時のバッチサイズの下限・上限
+BATCH_SIZE_MIN = int(os.getenv('BATCH_SIZE_MIN', '100'))
+BATCH_SIZE_MAX = int(os.getenv('BATCH_SIZE_MAX', '50000'))
+# 1バッチの読み取り・書き込みにかける最大秒数（超えた場合はバッチサイズを半分にする）
+BATCH_MAX_SECONDS = float(os.getenv('BATCH_MAX_SECONDS', '10'))
+# 1バッチのデータの推定最大メモリ（MB、超えた場合はバッチサイズを半分にする）
+BATCH_MAX_MEMORY_MB = float(os.getenv('BATCH_MAX_MEMORY_MB', '256'))
+
+# スループットが改善したとみなす比率と、悪化したとみなす比率
+_IMPROVEMENT = 1.05
+_DEGRADATION = 0.9
+
+def estimate_batch_bytes(rows: Sequence[Sequence[Any]], sample_size: int = 50) -> int:
+    """
+    先頭の数行の値のサイズからバッチ全体のメモリ使用量を推定する
+    :param rows: 行のリスト
+    :param sample_size: 計測する行数
+    :return: 推定バイト数
+    """
+    if not rows:
+        return 0
+    sample = rows[:sample_size]
+    sample_bytes = sum(sys.getsizeof(value) for row in sample for value in row)
+    return sample_bytes * len(rows) // len(sample)
+
+class BatchSizeController:
+    def __init__(self, initial_size: int, min_size: int = None, max_size: int = None,
+                 max_seconds: float = None, max_memory_mb: float = None):
+        """
+        計測したスループットに応じてバッチサイズを調整する（テーブルごとに作成し、範囲ワーカー間で共有する）
+        スループット（行/秒）が改善する間はバッチサイズを倍にし、改善しなくなった時点のサイズに収束する。
+        スループットが悪化した場合は最も速かったサイズに戻す。
+        1バッチの処理時間または推定メモリが上限を超えた場合は半分にし、以降はそのサイズを上限とする。
+        パイプラインでは読み取りと書き込みが並行するため、遅い方の段の時間でスループットを計算する。
+        サイズを変更した時点で前のサイズのバッチが処理中のことが多いため、計測は破棄せず
+        これまでに指定したサイズごとに行/秒として集計し、処理時間・メモリの上限は現在のサイズに換算して判定する。
+        :param initial_size: 初期バッチサイズ
+        :param min_size: 下限（省略時はBATCH_SIZE_MIN）
+        :param max_size: 上限（省略時はBATCH_SIZE_MAX）
+        :param max_seconds: 1バッチの最大秒数（省略時はBATCH_MAX_SECONDS）
+        :param max_memory_mb: 1バッチの推定最大メモリ（省略時はBATCH_MAX_MEMORY_MB）
+        """
+        self.min_size = min_size or BATCH_SIZE_MIN
+        self.max_size = max(max_size or BATCH_SIZE_MAX, self.min_size)
+        self.max_seconds = max_seconds or BATCH_MAX_SECONDS
+        self.max_bytes = (max_memory_mb or BATCH_MAX_MEMORY_MB) * 1024 * 1024
+        self.size = min(max(initial_size, self.min_size), self.max_size)
+        self.converged = False
+        self._lock = threading.Lock()
+        self._read_seconds: Dict[int, float] = {}  # バッチサイズごとの直近の読み取り秒数
+        self._totals: Dict[int, List[float]] = {self.size: [0, 0.0]}  # 指定したバッチサイズごとの [行数, 秒数]
+        self._best_rate = None
+        self._best_size = self.size
+        self._ceiling = self.max_size
+
+    def observe_read(self, size: int, row_count: int, seconds: float):
+        """
+        読み取りの計測結果を記録する
+        :param size: 読み取りで指定したバッチサイズ
+        :param row_count: 取得した行数
+        :param seconds: 読み取りにかかった秒数
+        """
+        with self._lock:
+            if row_count == size:
+                self._read_seconds[size] = seconds
+
+    def observe_write(self, rows: Sequence[Sequence[Any]], seconds: float):
+        """
+        書き込みの計測結果を記録し、次のバッチサイズを決める
+        以前に指定したサイズのバッチの計測も、そのサイズの行/秒として集計する
+        最終バッチなど、指定したどのサイズにも一致しないバッチは調整に使わない
+        :param rows: 書き込んだバッチの行
+        :param seconds: 書き込みにかかった秒数
+        """
+        with self._lock:
+            row_count = len(rows)
+            if row_count not in self._totals:
+                return
+            stage_seconds = max(seconds, self._read_seconds.get(row_count, 0.0))
+            # 処理時間・メモリは現在のサイズのバッチに換算して上限と比べる
+            scale = self.size / row_count
+            if stage_seconds * scale > self.max_seconds or estimate_batch_bytes(rows) * scale > self.max_bytes:
+                self._shrink()
+                return
+            totals = self._totals[row_count]
+            totals[0] += row_count
+            totals[1] += stage_seconds
+            if self.converged:
+                return
+            self._adjust()
+
+    def _rate(self, size: int) -> Optional[float]:
+        """サイズごとに集計した行/秒（未計測の場合はNone）"""
+        rows, seconds = self._totals.get(size, (0, 0.0))
+        return rows / max(seconds, 1e-6) if rows else None
+
+    def _adjust(self):
+        """
+        現在のサイズの行/秒を、これまでに計測した最も速いサイズと比べて次のサイズを決める
+        """
+        rate = self._rate(self.size)
+        if rate is None:
+            # 現在のサイズのバッチはまだ処理中
+            return
+        other_rates = [(self._rate(size), size) for size in self._totals if size != self.size]
+        other_rates = [(other_rate, size) for other_rate, size in other_rates if other_rate is not None]
+        self._best_rate, self._best_size = max(other_rates) if other_rates else (None, self.size)
+        if self._best_rate is None or rate > self._best_rate * _IMPROVEMENT:
+            self._best_rate = rate
+            self._best_size = self.size
+            if self.size < self._ceiling:
+                self._set_size(min(self.size * 2, self._ceiling))
+            else:
+                self.converged = True
+        elif rate < self._best_rate * _DEGRADATION:
+            self._set_size(self._best_size)
+            self.converged = True
+        else:
+            self._best_rate = max(self._best_rate, rate)
+            self.converged = True
+
+    def _set_size(self, size: int):
+        self.size = size
+        self._totals.setdefault(size, [0, 0.0])
+
+    def _shrink(self):
+        self._ceiling = max(self.min_size, self.size // 2)
+        self._set_size(self._ceiling)
+        # 上限を超えるサイズの計測は以降の比較に使わない（処理中のバッチも集計しない）
+        for size in [size for size in self._totals if size > self._ceiling]:
+            del self._totals[size]
+        self._best_size = min(self._best_size, self.size)
+        self._best_rate = None
+        self.converged = False
+
+    def summary(self) -> str:
+        """
+        収束したバッチサイズと計測したスループットの表示用文字列
+        """
+        with self._lock:
+            state = '収束' if self.converged else '調整中'
+            rate = f", {self._best_rate:.0f} 行/秒" if self._best_rate else ''
+            return f"{self.size} 行（{state}{rate}）"
+
+def create_batch_controller(initial_size: int) -> Optional[BatchSizeController]:
+    """
+    BATCH_SIZE_MODEがadaptiveの場合にバッチサイズ調整器を作成する
+    :param initial_size: 初期バッチサイズ
+    :return: 調整器、fixedの場合はNone
+    """
+    if BATCH_SIZE_MODE != 'adaptive':
+        return None
+    return BatchSizeController(initial_size)
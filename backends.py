@@ -0,0 +1,162 @@
+import sqlite3
+from decimal import Decimal
+from typing import Any, Dict, List
+import pyodbc
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+class OdbcBackend:
+    """SQL Server（ODBC Driver 17 for SQL Server）への接続"""
+    name = 'odbc'
+    dialect = 'mssql'
+    # 接続断・タイムアウトなど、行の内容に関係なく発生するエラー
+    connection_errors = (pyodbc.OperationalError, pyodbc.InterfaceError)
+
+    def is_connection_error(self, error: Exception) -> bool:
+        """
+        行の内容に関係なく発生するエラー（分割して再実行しても成功しない）かどうか
+        """
+        return isinstance(error, self.connection_errors)
+
+    def connect(self, config: dict):
+        # 標準的なODBC接続文字列フォーマットを使用
+        conn_str = (
+            "Driver={ODBC Driver 17 for SQL Server};"
+            f"Server={config['server']};"
+            f"Database={config['database']};"
+            f"Uid={config['uid']};"
+            f"Pwd={config['pwd']};"
+            "TrustServerCertificate=yes"
+        )
+        # 接続文字列にはパスワードが含まれるため、DEBUGでのみ出力する
+        logger.debug(f"データベースへの接続を試みます。接続文字列: {conn_str}")
+        return pyodbc.connect(conn_str)
+
+    def describe(self, config: dict) -> str:
+        return f"{config['server']}/{config['database']}"
+
+    def get_key_columns(self, connector, table_name: str) -> List[str]:
+        query = """
+        SELECT i.index_id, c.name
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+        JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE i.object_id = OBJECT_ID(?)
+          AND ic.key_ordinal > 0
+          AND (i.is_primary_key = 1 OR (i.type = 1 AND i.is_unique = 1))
+        ORDER BY i.is_primary_key DESC, i.index_id, ic.key_ordinal
+        """
+        rows = connector.fetch_all(query, [table_name])
+        if not rows:
+            return []
+        # 優先度が最も高いインデックスの列のみを使用
+        index_id = rows[0][0]
+        return [row[1] for row in rows if row[0] == index_id]
+
+    def get_table_columns(self, connector, table_name: str) -> List[Dict[str, Any]]:
+        # IDENTITY列・計算列は値を挿入できないため除外する
+        query = """
+        SELECT c.name, t.name, c.max_length, c.precision, c.scale, c.is_nullable
+        FROM sys.columns c
+        JOIN sys.types t ON t.user_type_id = c.user_type_id
+        WHERE c.object_id = OBJECT_ID(?) AND c.is_identity = 0 AND c.is_computed = 0
+        ORDER BY c.column_id
+        """
+        columns = []
+        for name, type_name, max_length, precision, scale, is_nullable in connector.fetch_all(query, [table_name]):
+            type_name = type_name.lower()
+            if type_name in ('varchar', 'nvarchar', 'char', 'nchar', 'varbinary', 'binary'):
+                # max_lengthはバイト数（nvarchar/ncharは1文字2バイト、-1はmax）
+                length = 'max' if max_length == -1 else (max_length // 2 if type_name.startswith('n') else max_length)
+                data_type = f"{type_name}({length})"
+            elif type_name in ('decimal', 'numeric'):
+                data_type = f"{type_name}({precision},{scale})"
+            else:
+                data_type = type_name
+            columns.append({'name': name, 'data_type': data_type, 'nullable': bool(is_nullable)})
+        return columns
+
+class _SqliteCursor:
+    """pyodbc固有の属性（fast_executemany, setinputsizes）を受け付けるsqlite3カーソルのラッパー"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.fast_executemany = False
+
+    def setinputsizes(self, sizes):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _SqliteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _SqliteCursor(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class SqliteBackend:
+    """
+    SQLiteファイルへの接続（SQL Serverなしでのベンチマーク・動作確認用）
+    configのdatabaseにファイルパスを指定し、同じファイルをスキーマ名（既定はdbo）でアタッチするため、
+    「dbo.テーブル名」の形式のテーブル名をそのまま使える
+    """
+    name = 'sqlite'
+    dialect = 'sqlite'
+    # sqlite3.OperationalErrorは列名の誤り・構文エラー・ロックなども含むため、メッセージで接続・ファイルのエラーだけを判定する
+    connection_error_messages = ('unable to open database', 'disk i/o error', 'database disk image is malformed',
+                                 'cannot operate on a closed database', 'database or disk is full')
+
+    def is_connection_error(self, error: Exception) -> bool:
+        """
+        行の内容に関係なく発生するエラー（分割して再実行しても成功しない）かどうか
+        """
+        if not isinstance(error, (sqlite3.OperationalError, sqlite3.ProgrammingError)):
+            return False
+        message = str(error).lower()
+        return any(text in message for text in self.connection_error_messages)
+
+    def connect(self, config: dict):
+        path = config['database']
+        logger.info(f"SQLiteデータベースに接続します: {path}")
+        # 接続は1スレッドずつ使うが、作成したスレッドと使用するスレッドが異なる場合があるため同一スレッドの確認は行わない
+        conn = sqlite3.connect(':memory:', timeout=60, check_same_thread=False)
+        for schema in config.get('schemas') or ['dbo']:
+            conn.execute("ATTACH DATABASE ? AS " + schema, [path])
+            conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+        return _SqliteConnection(conn)
+
+    def describe(self, config: dict) -> str:
+        return config['database']
+
+    def get_key_columns(self, connector, table_name: str) -> List[str]:
+        schema, _, name = table_name.rpartition('.')
+        pragma = f"PRAGMA {schema + '.' if schema else ''}table_info({name})"
+        columns = [(row[5], row[1]) for row in connector.fetch_all(pragma) if row[5] > 0]
+        return [name for _, name in sorted(columns)]
+
+    def get_table_columns(self, connector, table_name: str) -> List[Dict[str, Any]]:
+        schema, _, name = table_name.rpartition('.')
+        pragma = f"PRAGMA {schema + '.' if schema else ''}table_info({name})"
+        return [{'name': row[1], 'data_type': (row[2] or '').lower(), 'nullable': not row[3] and not row[5]}
+                for row in connector.fetch_all(pragma)]
+
+# sqlite3は標準でDecimalをバインドできないため文字列で保存する
+sqlite3.register_adapter(Decimal, str)
+
+BACKENDS = {backend.name: backend for backend in (OdbcBackend(), SqliteBackend())}
+
+def get_backend(name: str = None):
+    """
+    接続設定のbackendに対応するバックエンドを取得
+    :param name: バックエンド名（odbc / sqlite、省略時はodbc）
+    """
+    name = (name or 'odbc').lower()
+    if name not in BACKENDS:
+        raise ValueError(f"サポートされていないバックエンドです: {name}")
+    return BACKENDS[name]
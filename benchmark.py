@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+import pandas as pd
+
+# ベンチマークする移行パスと、既定のソース行数
+BENCH_PATHS = ('one_to_one', 'one_to_many', 'many_to_one')
+DEFAULT_SIZES = [10000, 100000]
+
+# ソーステーブル（dbo.BenchSource: 1行が1件、dbo.BenchDetail: BenchSourceの1行に1件）
+SOURCE_DDL = [
+    "CREATE TABLE dbo.BenchSource (id INTEGER PRIMARY KEY, code TEXT, amount TEXT, created TEXT, note TEXT)",
+    "CREATE TABLE dbo.BenchDetail (detail_id INTEGER PRIMARY KEY, source_id INTEGER, qty TEXT, memo TEXT)",
+]
+
+# 移行パスごとのターゲットテーブル
+TARGET_DDL = {
+    'one_to_one': ["CREATE TABLE dbo.BenchTarget (ID INTEGER, CODE TEXT, AMOUNT REAL, CREATED TEXT, NOTE TEXT)"],
+    'one_to_many': [
+        "CREATE TABLE dbo.BenchHeader (ID INTEGER, CODE TEXT, CREATED TEXT)",
+        "CREATE TABLE dbo.BenchAmount (ID INTEGER, AMOUNT REAL, NOTE TEXT)",
+    ],
+    'many_to_one': ["CREATE TABLE dbo.BenchJoined (ID INTEGER, CODE TEXT, AMOUNT REAL, QTY INTEGER, MEMO TEXT)"],
+}
+
+# マッピング一覧（移行パス → (論理名, 次期DB物理名, 現行DB物理名)）
+MAPPINGS = {
+    'one_to_one': ('BenchOneToOne', 'dbo.BenchTarget', 'dbo.BenchSource'),
+    'one_to_many': ('BenchOneToMany', 'dbo.BenchHeader', 'dbo.BenchSource'),
+    'many_to_one': ('BenchManyToOne', 'dbo.BenchJoined', 'dbo.BenchSource'),
+}
+
+# フィールドマッピング（現行DB物理名, 現行Type物理名, 次期DB物理名, 次期Type物理名, データ型, Transform, Key, JoinKey）
+FIELD_MAPPINGS = {
+    'one_to_one': [
+        ('dbo.BenchSource', 'id', 'dbo.BenchTarget', 'ID', 'int', 'Y', 'Y', None),
+        ('dbo.BenchSource', 'code', 'dbo.BenchTarget', 'CODE', 'nvarchar(20)', 'Y', None, None),
+        ('dbo.BenchSource', 'amount', 'dbo.BenchTarget', 'AMOUNT', 'decimal(18,2)', 'Y', None, None),
+        ('dbo.BenchSource', 'created', 'dbo.BenchTarget', 'CREATED', 'date', 'Y', None, None),
+        ('dbo.BenchSource', 'note', 'dbo.BenchTarget', 'NOTE', 'nvarchar(200)', 'Y', None, None),
+    ],
+    'one_to_many': [
+        ('dbo.BenchSource', 'id', 'dbo.BenchHeader', 'ID', 'int', 'Y', None, None),
+        ('dbo.BenchSource', 'code', 'dbo.BenchHeader', 'CODE', 'nvarchar(20)', 'Y', None, None),
+        ('dbo.BenchSource', 'created', 'dbo.BenchHeader', 'CREATED', 'date', 'Y', None, None),
+        ('dbo.BenchSource', 'id', 'dbo.BenchAmount', 'ID', 'int', 'Y', None, None),
+        ('dbo.BenchSource', 'amount', 'dbo.BenchAmount', 'AMOUNT', 'decimal(18,2)', 'Y', None, None),
+        ('dbo.BenchSource', 'note', 'dbo.BenchAmount', 'NOTE', 'nvarchar(200)', 'Y', None, None),
+    ],
+    'many_to_one': [
+        ('dbo.BenchSource', 'id', 'dbo.BenchJoined', 'ID', 'int', 'Y', None, 'Y'),
+        ('dbo.BenchSource', 'code', 'dbo.BenchJoined', 'CODE', 'nvarchar(20)', 'Y', None, None),
+        ('dbo.BenchSource', 'amount', 'dbo.BenchJoined', 'AMOUNT', 'decimal(18,2)', 'Y', None, None),
+        ('dbo.BenchDetail', 'source_id', 'dbo.BenchJoined', None, None, None, None, 'Y'),
+        ('dbo.BenchDetail', 'qty', 'dbo.BenchJoined', 'QTY', 'int', 'Y', None, None),
+        ('dbo.BenchDetail', 'memo', 'dbo.BenchJoined', 'MEMO', 'nvarchar(200)', 'Y', None, None),
+    ],
+}
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:')
+    conn.execute("ATTACH DATABASE ? AS dbo", [str(path)])
+    return conn
+
+def create_source_database(path: Path, row_count: int, seed: int = 0):
+    """
+    ソースデータベース（SQLite）を作成し、ベンチマーク用のデータを投入する
+    :param path: データベースファイルのパス
+    :param row_count: dbo.BenchSourceの行数
+    :param seed: 乱数のシード
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    if path.exists():
+        path.unlink()
+    conn = _connect(path)
+    for ddl in SOURCE_DDL:
+        conn.execute(ddl)
+    chunk_size = 50000
+    for start in range(0, row_count, chunk_size):
+        ids = np.arange(start + 1, min(start + chunk_size, row_count) + 1)
+        amounts = rng.integers(0, 10_000_000, len(ids)) / 100
+        days = rng.integers(0, 3650, len(ids))
+        created = (np.datetime64('2015-01-01') + days).astype(str)
+        conn.executemany(
+            "INSERT INTO dbo.BenchSource VALUES (?, ?, ?, ?, ?)",
+            [(int(i), f"C{i:08d}", f"{a:.2f}", str(c), f"note {i} " + "x" * int(i % 50))
+             for i, a, c in zip(ids, amounts, created)]
+        )
+        conn.executemany(
+            "INSERT INTO dbo.BenchDetail VALUES (?, ?, ?, ?)",
+            [(int(i), int(i), str(int(q)), f"memo {i}") for i, q in zip(ids, rng.integers(1, 1000, len(ids)))]
+        )
+    conn.commit()
+    conn.close()
+
+def create_target_database(path: Path, path_name: str):
+    """
+    ターゲットデータベース（SQLite）を移行パスのターゲットテーブルで作成する
+    """
+    if path.exists():
+        path.unlink()
+    conn = _connect(path)
+    for ddl in TARGET_DDL[path_name]:
+        conn.execute(ddl)
+    conn.commit()
+    conn.close()
+
+def write_workbook(path: Path):
+    """
+    ベンチマーク用のマッピングExcel（マッピング一覧と移行パスごとのフィールドマッピングシート）を作成する
+    """
+    mapping_list = pd.DataFrame([
+        {'次期DB論理名': logical_name, '次期DB物理名': physical_name, '現行DB物理名': source_name,
+         'MigrationType': path_name, '移行': 'Y'}
+        for path_name, (logical_name, physical_name, source_name) in MAPPINGS.items()
+    ])
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        mapping_list.to_excel(writer, sheet_name='マッピング一覧', index=False)
+        for path_name, (logical_name, _, _) in MAPPINGS.items():
+            pd.DataFrame([
+                {'現行DB物理名': source_table, '現行Type物理名': source_field, '次期DB物理名': target_table,
+                 '次期Type物理名': target_field, 'データ型': data_type, 'Not Null': None, 'デフォルト': None,
+                 'Select': transform, 'Transform': transform, 'Key': key, 'JoinKey': join_key}
+                for source_table, source_field, target_table, target_field, data_type, transform, key, join_key
+                in FIELD_MAPPINGS[path_name]
+            ]).to_excel(writer, sheet_name=logical_name, index=False)
+
+def _peak_memory_mb(tracing: bool) -> float:
+    if tracing:
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # LinuxはKB、macOSはバイト単位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def run_case(path_name: str, excel_path: str) -> Dict[str, Any]:
+    """
+    1つの移行パスを実行して計測する（ソース/ターゲットの接続設定は環境変数で子プロセスに渡す）
+    :param path_name: 移行パス（one_to_one / one_to_many / many_to_one）
+    :param excel_path: マッピングExcelのパス
+    :return: 計測結果
+    """
+    try:
+        import resource  # noqa: F401
+        tracing = False
+    except ImportError:
+        # resourceが使えない環境（Windows）ではPythonのメモリ確保量のピークを計測する
+        import tracemalloc
+        tracemalloc.start()
+        tracing = True
+
+    from excel_parser import ExcelParser
+    from db_connector import DatabaseConnector
+    from data_migration_onetoone3 import execute_one_to_one_migration
+    from data_migration_onetomany import execute_one_to_many_migration
+    from data_migration_manytoone import execute_many_to_one_migration
+    migrate = {
+        'one_to_one': execute_one_to_one_migration,
+        'one_to_many': execute_one_to_many_migration,
+        'many_to_one': execute_many_to_one_migration,
+    }[path_name]
+
+    parser = ExcelParser(excel_path)
+    sheet = parser.parse_mapping_data_to_run(MAPPINGS[path_name][1])
+    source_db = DatabaseConnector(is_source=True)
+    target_db = DatabaseConnector(is_source=False)
+    try:
+        started = time.perf_counter()
+        results = migrate(excel_path, parser, source_db, target_db, [sheet]) or {}
+        elapsed = time.perf_counter() - started
+    finally:
+        source_db.close()
+        target_db.close()
+    rows = results.get(sheet.logical_name, 0)
+    return {
+        'path': path_name,
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed, 1) if elapsed else None,
+        'peak_memory_mb': round(_peak_memory_mb(tracing), 1),
+        'memory_source': 'tracemalloc' if tracing else 'rss',
+    }
+
+def run_benchmarks(sizes: List[int], paths: List[str], workdir: Path) -> List[Dict[str, Any]]:
+    """
+    行数・移行パスごとに子プロセスで移行を実行して計測する
+    （プロセスごとに実行するため、ピークメモリや変換キャッシュが他のケースの影響を受けない）
+    :param sizes: ソース行数のリスト
+    :param paths: 移行パスのリスト
+    :param workdir: 作業ディレクトリ（データベース・ログ・チェックポイントの出力先）
+    :return: 計測結果のリスト
+    """
+    workdir.mkdir(parents=True, exist_ok=True)
+    excel_path = workdir / 'benchmark_mapping.xlsx'
+    write_workbook(excel_path)
+    results = []
+    for size in sizes:
+        source_path = workdir / f"source_{size}.db"
+        print(f"\nソースデータを作成しています: {size} 行")
+        create_source_database(source_path, size)
+        for path_name in paths:
+            target_path = workdir / f"target_{path_name}_{size}.db"
+            create_target_database(target_path, path_name)
+            checkpoint_path = workdir / f"checkpoint_{path_name}_{size}.db"
+            if checkpoint_path.exists():
+                checkpoint_path.unlink()
+            result_path = workdir / f"result_{path_name}_{size}.json"
+            env = dict(
+                os.environ,
+                SOURCE_DB_BACKEND='sqlite', SOURCE_DB_NAME=str(source_path.resolve()),
+                TARGET_DB_BACKEND='sqlite', TARGET_DB_NAME=str(target_path.resolve()),
+                CHECKPOINT_FILE=str(checkpoint_path.resolve()),
+            )
+            print(f"  {path_name} ({size} 行) を実行しています...")
+            with open(workdir / f"benchmark_{path_name}_{size}.log", 'w', encoding='utf-8') as log:
+                subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), '--run-case', path_name,
+                     '--excel', str(excel_path.resolve()), '--result', str(result_path.resolve())],
+                    cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT, check=True
+                )
+            with open(result_path, encoding='utf-8') as f:
+                result = json.load(f)
+            result['size'] = size
+            results.append(result)
+            print(f"    {result['rows']} 行, {result['seconds']} 秒, {result['rows_per_second']} 行/秒, "
+                  f"ピークメモリ {result['peak_memory_mb']} MB")
+    return results
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """
+    前回の計測結果と比較し、スループットの低下またはピークメモリの増加が許容範囲を超えたケースを返す
+    :param results: 今回の計測結果
+    :param baseline: 比較対象の計測結果
+    :param tolerance: 許容する変化率（0.2は20%）
+    :return: 劣化したケースの説明のリスト
+    """
+    baseline_by_case = {(result['path'], result['size']): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_by_case.get((result['path'], result['size']))
+        if not base:
+            continue
+        case = f"{result['path']} ({result['size']} 行)"
+        if base['rows_per_second'] and result['rows_per_second'] < base['rows_per_second'] * (1 - tolerance):
+            regressions.append(f"{case}: スループット {base['rows_per_second']} → {result['rows_per_second']} 行/秒")
+        if (base.get('memory_source') == result.get('memory_source') and
+                result['peak_memory_mb'] > base['peak_memory_mb'] * (1 + tolerance)):
+            regressions.append(f"{case}: ピークメモリ {base['peak_memory_mb']} → {result['peak_memory_mb']} MB")
+    return regressions
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="SQLiteをソース/ターゲットにした移行処理のベンチマーク")
+    arg_parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                            help="ソース行数（カンマ区切り）")
+    arg_parser.add_argument('--paths', default=','.join(BENCH_PATHS), help="移行パス（カンマ区切り）")
+    arg_parser.add_argument('--workdir', default='benchmark_work', help="作業ディレクトリ")
+    arg_parser.add_argument('--output', default='benchmark_results.json', help="計測結果の出力ファイル")
+    arg_parser.add_argument('--baseline', help="比較対象の計測結果ファイル（劣化があれば終了コード1）")
+    arg_parser.add_argument('--tolerance', type=float, default=0.2, help="許容する変化率")
+    arg_parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    arg_parser.add_argument('--excel', help=argparse.SUPPRESS)
+    arg_parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    # 子プロセス: 1ケースを実行して結果を書き出す
+    if args.run_case:
+        result = run_case(args.run_case, args.excel)
+        with open(args.result, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    paths = [path.strip() for path in args.paths.split(',')]
+    unknown = [path for path in paths if path not in BENCH_PATHS]
+    if unknown:
+        arg_parser.error(f"サポートされていない移行パスです: {', '.join(unknown)}")
+
+    results = run_benchmarks(sizes, paths, Path(args.workdir))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n計測結果: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("性能の劣化を検出しました:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("比較対象からの劣化はありません")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import datetime
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 進捗状態のうちチェックポイントに保存する項目
+# pending_offsetは書き込み中のバッチの終了位置（コミット前に記録し、コミット後にNoneに戻す）
+PROGRESS_FIELDS = ('offset', 'last_key', 'processed', 'errors', 'batches', 'pending_offset')
+
+class CheckpointStore:
+    def __init__(self, path):
+        """
+        テーブル移行のチェックポイントストア（ローカルSQLiteファイル）の初期化
+        コミット済みバッチごとに、テーブル（範囲並列コピー時は範囲）単位の進捗状態を記録する
+        差分移行のハイウォーターマークもテーブル単位で記録する
+        :param path: SQLiteファイルのパス
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tables ("
+                "table_name TEXT PRIMARY KEY, key_columns TEXT, bounds BLOB, "
+                "status TEXT, updated_at TEXT, mode TEXT)"
+            )
+            # 移行方式の列がない旧形式のファイルには列を追加する（既存の記録は全件移行として扱う）
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(tables)")]
+            if 'mode' not in columns:
+                self._conn.execute("ALTER TABLE tables ADD COLUMN mode TEXT")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS partitions ("
+                "table_name TEXT, part INTEGER, progress BLOB, status TEXT, updated_at TEXT, "
+                "PRIMARY KEY (table_name, part))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                "table_name TEXT PRIMARY KEY, watermark BLOB, pending BLOB, updated_at TEXT)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def start_table(self, table_name: str, key_columns: Sequence[str],
+                    bounds: Optional[List[Tuple[Any, Any]]] = None, mode: str = 'full'):
+        """
+        テーブルのチェックポイントを新規に作成する（前回の記録は破棄する）
+        :param table_name: テーブル名（次期DB論理名）
+        :param key_columns: キー列リスト（OFFSETページングの場合は空）
+        :param bounds: 範囲並列コピーのキー範囲リスト
+        :param mode: 移行方式（full: 全件、incremental: ウォーターマーク条件による差分）
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM partitions WHERE table_name = ?", (table_name,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tables (table_name, key_columns, bounds, status, updated_at, mode) "
+                "VALUES (?, ?, ?, 'running', ?, ?)",
+                (table_name, ','.join(key_columns), pickle.dumps(bounds), self._now(), mode)
+            )
+            self._conn.commit()
+
+    def get_table(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        テーブルのチェックポイントを取得する
+        :return: {'key_columns', 'bounds', 'status', 'mode'}、記録がない場合はNone
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key_columns, bounds, status, mode FROM tables WHERE table_name = ?", (table_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        key_columns, bounds, status, mode = row
+        return {
+            'key_columns': key_columns.split(',') if key_columns else [],
+            'bounds': pickle.loads(bounds) if bounds is not None else None,
+            'status': status,
+            'mode': mode or 'full'
+        }
+
+    def get_progress(self, table_name: str, part: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        範囲の進捗状態を取得する
+        :param part: 範囲番号（逐次コピーの場合は0）
+        :return: 進捗状態と完了したかどうか ({..., 'done'})、記録がない場合はNone
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT progress, status FROM partitions WHERE table_name = ? AND part = ?", (table_name, part)
+            ).fetchone()
+        if row is None:
+            return None
+        progress = pickle.loads(row[0])
+        progress.setdefault('pending_offset', None)
+        progress['done'] = row[1] == 'done'
+        return progress
+
+    def save_progress(self, table_name: str, progress: Dict[str, Any], part: int = 0, done: bool = False):
+        """
+        コミット済みバッチまでの進捗状態を記録する
+        :param progress: 進捗状態
+        :param part: 範囲番号（逐次コピーの場合は0）
+        :param done: 範囲のコピーが完了したかどうか
+        """
+        state = {field: progress.get(field) for field in PROGRESS_FIELDS}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO partitions (table_name, part, progress, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (table_name, part, pickle.dumps(state), 'done' if done else 'running', self._now())
+            )
+            self._conn.commit()
+
+    def finish_table(self, table_name: str):
+        """
+        テーブルの移行完了を記録する
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tables SET status = 'done', updated_at = ? WHERE table_name = ?",
+                (self._now(), table_name)
+            )
+            self._conn.commit()
+
+    def get_watermark(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        テーブルのハイウォーターマークを取得する
+        :return: {'watermark': 前回成功した実行の値, 'pending': 実行中の値}、記録がない場合はNone
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, pending FROM watermarks WHERE table_name = ?", (table_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'watermark': pickle.loads(row[0]) if row[0] is not None else None,
+            'pending': pickle.loads(row[1]) if row[1] is not None else None
+        }
+
+    def set_pending_watermark(self, table_name: str, value: Any):
+        """
+        今回の実行で抽出する上限のハイウォーターマークを記録する（再開時に同じ上限を使うため）
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO watermarks (table_name, watermark, pending, updated_at) VALUES (?, NULL, ?, ?) "
+                "ON CONFLICT(table_name) DO UPDATE SET pending = excluded.pending, updated_at = excluded.updated_at",
+                (table_name, pickle.dumps(value), self._now())
+            )
+            self._conn.commit()
+
+    def commit_watermark(self, table_name: str):
+        """
+        実行の成功後、実行中のハイウォーターマークを確定する
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE watermarks SET watermark = pending, pending = NULL, updated_at = ? "
+                "WHERE table_name = ? AND pending IS NOT NULL",
+                (self._now(), table_name)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
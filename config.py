@@ -4,7 +4,9 @@ import os
 load_dotenv()
 
 # データベース接続設定
+# backendは接続先の種類（odbc: SQL Server、sqlite: SQLiteファイル、databaseにファイルパスを指定）
 SOURCE_DB_CONFIG = {
+    'backend': os.getenv('SOURCE_DB_BACKEND', 'odbc'),
     'driver': 'SQL Server',
     'server': os.getenv('SOURCE_DB_SERVER'),
     'database': os.getenv('SOURCE_DB_NAME'),
@@ -13,6 +15,7 @@ SOURCE_DB_CONFIG = {
 }
 
 TARGET_DB_CONFIG = {
+    'backend': os.getenv('TARGET_DB_BACKEND', 'odbc'),
     'driver': 'SQL Server',
     'server': os.getenv('TARGET_DB_SERVER'),
     'database': os.getenv('TARGET_DB_NAME'),
@@ -20,6 +23,34 @@ TARGET_DB_CONFIG = {
     'pwd': os.getenv('TARGET_DB_PASSWORD')  # SQL Server認証パスワード
 }
 
+def get_source_db_config(connection_name: str = None) -> dict:
+    """
+    名前付きソース接続の設定を取得（別サーバー/別DBのソーステーブル用）
+    SOURCE_DB_<名前>_BACKEND / _SERVER / _NAME / _USER / _PASSWORD を読み込み、未設定の項目は既定のソース接続の値を使う
+    :param connection_name: 接続名（省略時は既定のソース接続）
+    :return: 接続設定
+    """
+    if not connection_name:
+        return SOURCE_DB_CONFIG
+    prefix = f"SOURCE_DB_{connection_name.upper()}_"
+    return {
+        'backend': os.getenv(f"{prefix}BACKEND", SOURCE_DB_CONFIG['backend']),
+        'driver': SOURCE_DB_CONFIG['driver'],
+        'server': os.getenv(f"{prefix}SERVER", SOURCE_DB_CONFIG['server']),
+        'database': os.getenv(f"{prefix}NAME", SOURCE_DB_CONFIG['database']),
+        'uid': os.getenv(f"{prefix}USER", SOURCE_DB_CONFIG['uid']),
+        'pwd': os.getenv(f"{prefix}PASSWORD", SOURCE_DB_CONFIG['pwd'])
+    }
+
+# 一括挿入設定（1回のexecutemanyで送信する行数）
+BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', '1000'))
+
+# ストリーミング読み取り設定（1回のfetchmanyで取得する行数）
+FETCH_CHUNK_SIZE = int(os.getenv('FETCH_CHUNK_SIZE', '10000'))
+
+# 並列移行設定（同時に移行するテーブル数）
+MIGRATION_WORKERS = int(os.getenv('MIGRATION_WORKERS', '4'))
+
 # データ型マッピング
 DATA_TYPE_MAPPINGS = {
     'int': str,
@@ -0,0 +1,373 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+import numpy as np
+import pandas as pd
+
+# 每批生成并插入的行数
+DATAGEN_BATCH_SIZE = int(os.getenv('DATAGEN_BATCH_SIZE', '5000'))
+# 并行写入的线程数（每个线程使用独立的数据库连接）
+DATAGEN_WORKERS = int(os.getenv('DATAGEN_WORKERS', '4'))
+# 随机数种子（种子和批次号相同时生成的数据相同，与线程数无关）
+DATAGEN_SEED = int(os.getenv('DATAGEN_SEED', '0'))
+# 允许NULL的列默认的NULL比例
+DATAGEN_NULL_RATE = float(os.getenv('DATAGEN_NULL_RATE', '0'))
+# 字符串列默认的不同值个数
+DATAGEN_CARDINALITY = int(os.getenv('DATAGEN_CARDINALITY', '1000'))
+
+DISTRIBUTIONS = ('sequence', 'uniform', 'normal', 'zipf', 'constant')
+
+# 各整数类型的取值范围
+_INT_RANGES = {
+    'tinyint': (0, 255),
+    'smallint': (-32768, 32767),
+    'int': (-2 ** 31, 2 ** 31 - 1),
+    'integer': (-2 ** 31, 2 ** 31 - 1),
+    'bigint': (-2 ** 63, 2 ** 63 - 1),
+}
+# max等没有长度的字符串列生成的长度
+_DEFAULT_STRING_LENGTH = 50
+# 日期列默认的范围
+_DEFAULT_DATE_RANGE = ('2000-01-01', '2030-12-31')
+
+@dataclass
+class ColumnSpec:
+    """
+    测试数据列的定义
+    distribution: sequence（从min开始连续编号，键列的默认值）/ uniform（默认）/ normal / zipf / constant
+    cardinality: 不同值的个数（值在min～max之间等间隔取得；指定values时为其个数）
+    min_value / max_value: 数值为取值范围，日期为起止日期，字符串为编号的起始值和上限
+    values: 候选值列表（按分布从中选取，如区分代码）
+    """
+    name: str
+    data_type: str
+    nullable: bool = True
+    is_key: bool = False
+    distribution: Optional[str] = None
+    cardinality: Optional[int] = None
+    null_rate: Optional[float] = None
+    min_value: Any = None
+    max_value: Any = None
+    values: Optional[List[Any]] = None
+
+def parse_data_type(data_type: str):
+    """
+    解析数据类型字符串
+    :param data_type: 数据类型（如 nvarchar(20)、decimal(18,2)、date）
+    :return: (种类, 长度, 小数位数)，种类为 string / int / decimal / float / date / datetime / bit
+    """
+    match = re.match(r'\s*(\w+)\s*(?:\(\s*(\w+)\s*(?:,\s*(\d+)\s*)?\))?', str(data_type or '').lower())
+    if not match:
+        return 'string', _DEFAULT_STRING_LENGTH, 0
+    base, size, scale = match.group(1), match.group(2), match.group(3)
+    if base in _INT_RANGES:
+        return 'int', None, 0
+    if base in ('decimal', 'numeric', 'money', 'smallmoney'):
+        precision = int(size) if size and size.isdigit() else 18
+        return 'decimal', precision, int(scale) if scale else (4 if 'money' in base else 0)
+    if base in ('float', 'real', 'double'):
+        return 'float', None, 0
+    if base == 'date':
+        return 'date', None, 0
+    if base in ('datetime', 'datetime2', 'smalldatetime', 'timestamp'):
+        return 'datetime', None, 0
+    if base == 'bit':
+        return 'bit', None, 0
+    length = int(size) if size and size.isdigit() else _DEFAULT_STRING_LENGTH
+    return 'string', length, 0
+
+def _default_cardinality(spec: ColumnSpec, kind: str, length: Optional[int], low, high) -> int:
+    if spec.values:
+        return len(spec.values)
+    if spec.cardinality:
+        return max(int(spec.cardinality), 1)
+    if kind == 'bit':
+        return 2
+    if kind == 'int':
+        return int(min(high - low + 1, 2 ** 62))
+    if kind in ('date', 'datetime'):
+        return int((high - low).astype(np.int64)) + 1
+    if kind == 'string':
+        return int(min(DATAGEN_CARDINALITY, high - low + 1))
+    return 10 ** 6
+
+def _value_range(spec: ColumnSpec, kind: str, length: Optional[int], scale: int):
+    """列的取值范围（日期为datetime64）"""
+    if kind in ('date', 'datetime'):
+        unit = 'D' if kind == 'date' else 's'
+        low = np.datetime64(pd.Timestamp(spec.min_value if spec.min_value is not None else _DEFAULT_DATE_RANGE[0]), unit)
+        high = np.datetime64(pd.Timestamp(spec.max_value if spec.max_value is not None else _DEFAULT_DATE_RANGE[1]), unit)
+        return low, high
+    if kind == 'int':
+        type_low, type_high = _INT_RANGES.get(re.match(r'\s*(\w+)', spec.data_type.lower()).group(1), _INT_RANGES['int'])
+        default_low, default_high = max(type_low, 1), min(type_high, 10 ** 6)
+    elif kind == 'decimal':
+        # 整数部分的位数不超过 精度 - 小数位数
+        default_low, default_high = 0, min(10 ** 6, 10 ** max(length - scale, 0) - 10 ** -scale)
+    elif kind == 'string':
+        # 编号的位数不超过列长度
+        default_low, default_high = 1, _string_code_limit(length)
+    else:
+        default_low, default_high = 0, 10 ** 6
+    low = float(spec.min_value) if spec.min_value is not None else default_low
+    high = float(spec.max_value) if spec.max_value is not None else default_high
+    if kind == 'string':
+        # 指定的上限超过列长度时也按列长度限制，避免截断后重复
+        return int(low), min(int(high), default_high)
+    if kind == 'int':
+        return int(low), int(high)
+    return low, high
+
+def _string_code_limit(length: int) -> int:
+    """字符串列能容纳的最大编号（位数不超过列长度）"""
+    return 10 ** min(length, 18) - 1
+
+def sequence_capacity(spec: ColumnSpec) -> Optional[int]:
+    """
+    sequence分布的列能生成的不重复值的个数
+    整数为到类型上限（指定max时为max）为止，字符串为到列长度能容纳的最大编号为止
+    :return: 个数，不是按编号生成的列时为None
+    """
+    kind, length, scale = parse_data_type(spec.data_type)
+    distribution = (spec.distribution or ('sequence' if spec.is_key else 'uniform')).lower()
+    if distribution != 'sequence' or spec.values or kind not in ('int', 'string'):
+        return None
+    low, high = _value_range(spec, kind, length, scale)
+    if kind == 'int' and spec.max_value is None:
+        high = _INT_RANGES.get(re.match(r'\s*(\w+)', spec.data_type.lower()).group(1), _INT_RANGES['int'])[1]
+    return max(high - low + 1, 0)
+
+def check_sequence_capacity(specs: List[ColumnSpec], count: int, start: int = 0):
+    """
+    确认各sequence列能为第start～start+count-1行生成不重复的值，不能时抛出ValueError（不截断）
+    """
+    for spec in specs:
+        capacity = sequence_capacity(spec)
+        if capacity is not None and start + count > capacity:
+            raise ValueError(
+                f"列 {spec.name}（{spec.data_type}）按序号最多只能生成 {capacity} 个不重复的值，"
+                f"无法生成到第 {start + count} 条（请减少条数，或使用更长的列/更大的类型）"
+            )
+
+def _generate_codes(rng: np.random.Generator, distribution: str, cardinality: int, count: int, offset: int) -> np.ndarray:
+    """按分布生成 0～cardinality-1 的编号"""
+    if distribution == 'sequence':
+        return np.arange(offset, offset + count, dtype=np.int64)
+    if distribution == 'constant':
+        return np.zeros(count, dtype=np.int64)
+    if distribution == 'normal':
+        codes = np.rint(rng.normal(cardinality / 2, cardinality / 6, count))
+        return np.clip(codes, 0, cardinality - 1).astype(np.int64)
+    if distribution == 'zipf':
+        # 编号越小出现越多（偏斜的外键、状态码等）
+        return (rng.zipf(1.5, count) - 1) % cardinality
+    return rng.integers(0, cardinality, count, dtype=np.int64)
+
+def generate_column(spec: ColumnSpec, rng: np.random.Generator, count: int, offset: int = 0) -> np.ndarray:
+    """
+    用NumPy向量化生成一列的值
+    :param spec: 列定义
+    :param rng: 随机数生成器
+    :param count: 行数
+    :param offset: 本批第一行的行号（从0开始，sequence使用）
+    :return: Python值（str、int、float、date、datetime、None）的object数组
+    """
+    kind, length, scale = parse_data_type(spec.data_type)
+    distribution = (spec.distribution or ('sequence' if spec.is_key else 'uniform')).lower()
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"不支持的分布: {spec.name} {distribution}")
+    low, high = _value_range(spec, kind, length, scale)
+    cardinality = _default_cardinality(spec, kind, length, low, high)
+    if distribution == 'sequence':
+        check_sequence_capacity([spec], count, offset)
+    codes = _generate_codes(rng, distribution, cardinality, count, offset)
+
+    if spec.values:
+        column = np.asarray(spec.values, dtype=object)[codes % len(spec.values)]
+    elif kind in ('date', 'datetime'):
+        step = 1 if distribution == 'sequence' or cardinality < 2 else max((high - low).astype(np.int64) // (cardinality - 1), 1)
+        column = (low + codes * step).astype(object)
+    elif kind == 'bit':
+        column = (codes % 2).astype(object)
+    elif distribution == 'sequence' or kind == 'string':
+        # 字符串为从min开始的编号
+        column = low + codes
+    else:
+        # 在min～max之间等间隔取cardinality个值
+        step = (high - low) / (cardinality - 1) if cardinality > 1 else 0
+        column = low + codes * step
+
+    if kind == 'int' and not spec.values:
+        column = np.rint(column).astype(np.int64).astype(object)
+    elif kind in ('decimal', 'float') and not spec.values:
+        column = np.round(column.astype(np.float64), scale if kind == 'decimal' else 6).astype(object)
+    elif kind == 'string' and not spec.values:
+        # 编号的位数不超过列长度（见_value_range、check_sequence_capacity）
+        column = np.rint(column).astype(np.int64).astype(str).astype(object)
+
+    null_rate = spec.null_rate if spec.null_rate is not None else DATAGEN_NULL_RATE
+    if spec.nullable and not spec.is_key and null_rate > 0:
+        column = column.astype(object)
+        column[rng.random(count) < null_rate] = None
+    return column
+
+def generate_rows(specs: List[ColumnSpec], count: int, seed: int = 0, batch_index: int = 0, offset: int = 0) -> List[tuple]:
+    """
+    生成一批行
+    :param specs: 列定义列表
+    :param count: 行数
+    :param seed: 随机数种子
+    :param batch_index: 批次号（与种子一起决定随机数序列）
+    :param offset: 本批第一行的行号（从0开始）
+    :return: 值元组的列表
+    """
+    rng = np.random.default_rng([seed, batch_index])
+    columns = [generate_column(spec, rng, count, offset) for spec in specs]
+    return list(zip(*columns))
+
+def _optional(row, column: str):
+    value = row.get(column)
+    return None if value is None or pd.isna(value) or str(value).strip() == '' else value
+
+def load_column_specs_from_workbook(parser, mapping_name: str) -> List[ColumnSpec]:
+    """
+    从映射Excel的字段映射sheet读取目标表的列定义（仅Transform为Y的列）
+    可选列 Distribution / Cardinality / NullRate / Min / Max / Values（逗号分隔）指定生成方式
+    :param parser: ExcelParser
+    :param mapping_name: マッピング一覧的次期DB物理名
+    :return: 列定义列表
+    """
+    sheet = parser.parse_mapping_data_to_run(mapping_name)
+    df = parser.get_sheet(sheet.logical_name)
+    # 一对多的sheet包含多个目标表，只取该表的行
+    if '次期DB物理名' in df.columns and (df['次期DB物理名'] == sheet.physical_name).any():
+        df = df[df['次期DB物理名'] == sheet.physical_name]
+    type_column = 'データ型' if 'データ型' in df.columns else '次期Typeデータ型'
+    not_null_column = 'Not Null' if 'Not Null' in df.columns else '次期TypeNot Null'
+
+    specs = {}
+    for _, row in df.iterrows():
+        if str(row.get('Transform', '')).upper() != 'Y':
+            continue
+        name = str(row.get('次期Type物理名'))
+        if name in specs:
+            continue
+        values = _optional(row, 'Values')
+        cardinality = _optional(row, 'Cardinality')
+        null_rate = _optional(row, 'NullRate')
+        specs[name] = ColumnSpec(
+            name=name,
+            data_type=str(row.get(type_column, '')),
+            nullable=str(row.get(not_null_column, '')).upper() != 'Y',
+            is_key=str(row.get('Key', '')).upper() == 'Y',
+            distribution=_optional(row, 'Distribution'),
+            cardinality=int(float(cardinality)) if cardinality is not None else None,
+            null_rate=float(null_rate) if null_rate is not None else None,
+            min_value=_optional(row, 'Min'),
+            max_value=_optional(row, 'Max'),
+            values=[value.strip() for value in str(values).split(',')] if values is not None else None,
+        )
+    if not specs:
+        raise ValueError(f"映射中没有Transform为Y的列: {mapping_name}")
+    return list(specs.values())
+
+def load_column_specs_from_schema(db, table_name: str) -> List[ColumnSpec]:
+    """
+    从目标表的结构读取列定义（不含IDENTITY列和计算列，键列按顺序编号）
+    :param db: 目标数据库连接（需要get_table_columns / get_key_columns）
+    :param table_name: 表名
+    :return: 列定义列表
+    """
+    columns = db.get_table_columns(table_name)
+    if not columns:
+        raise ValueError(f"找不到表或没有可插入的列: {table_name}")
+    key_columns = {column.lower() for column in db.get_key_columns(table_name)}
+    return [
+        ColumnSpec(name=column['name'], data_type=column['data_type'], nullable=column['nullable'],
+                   is_key=column['name'].lower() in key_columns)
+        for column in columns
+    ]
+
+def build_insert_query(table_name: str, specs: List[ColumnSpec]) -> str:
+    columns = ', '.join(f"[{spec.name}]" for spec in specs)
+    placeholders = ', '.join('?' for _ in specs)
+    return f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+
+def generate_table_data(target_db, table_name: str, specs: List[ColumnSpec], count: int,
+                        connection_factory: Callable[[], Any] = None, batch_size: int = None,
+                        workers: int = None, seed: int = None, start: int = 0) -> int:
+    """
+    按列定义生成测试数据并分批插入
+    各批次由独立的随机数序列生成，多个线程各自使用独立连接并行插入（每批提交一次，失败时二分拆分重试）
+    :param target_db: 目标数据库连接（单线程时使用）
+    :param table_name: 目标表名
+    :param specs: 列定义列表
+    :param count: 生成的行数
+    :param connection_factory: 创建并行写入用连接的函数（省略时不并行）
+    :param batch_size: 每批行数（省略时为DATAGEN_BATCH_SIZE）
+    :param workers: 并行线程数（省略时为DATAGEN_WORKERS）
+    :param seed: 随机数种子（省略时为DATAGEN_SEED）
+    :param start: 第一行的行号（追加数据时避免键重复）
+    :return: 插入成功的行数
+    """
+    batch_size = batch_size or DATAGEN_BATCH_SIZE
+    workers = workers or DATAGEN_WORKERS
+    seed = DATAGEN_SEED if seed is None else seed
+    if connection_factory is None:
+        workers = 1
+    # 序号列的值不够时在插入前报错
+    check_sequence_capacity(specs, count, start)
+    query = build_insert_query(table_name, specs)
+    batches = [(index, offset, min(batch_size, count - offset))
+               for index, offset in enumerate(range(0, count, batch_size))]
+
+    local = threading.local()
+    connections = []
+    lock = threading.Lock()
+    progress = {'done': 0, 'inserted': 0}
+    started = time.perf_counter()
+
+    def get_connection():
+        if workers <= 1:
+            return target_db
+        if not hasattr(local, 'db'):
+            local.db = connection_factory()
+            with lock:
+                connections.append(local.db)
+        return local.db
+
+    def write_batch(batch):
+        index, offset, size = batch
+        rows = generate_rows(specs, size, seed, index, start + offset)
+
+        def report_error(row_index, values, e):
+            print(f"  第 {start + offset + row_index + 1} 条数据插入失败: {str(e)}")
+
+        inserted = get_connection().bulk_insert(query, rows, on_error=report_error)
+        with lock:
+            progress['done'] += size
+            progress['inserted'] += inserted
+            print(f"  已处理 {progress['done']}/{count} 条数据")
+        return inserted
+
+    try:
+        if workers <= 1:
+            for batch in batches:
+                write_batch(batch)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='datagen') as executor:
+                # 有批次失败时取出异常并停止
+                for _ in executor.map(write_batch, batches):
+                    pass
+    finally:
+        for db in connections:
+            db.close()
+
+    elapsed = time.perf_counter() - started
+    rate = progress['inserted'] / elapsed if elapsed > 0 else 0
+    print(f"测试数据生成完成，共插入 {progress['inserted']} 条数据（{elapsed:.2f} 秒，{rate:,.0f} 行/秒，{workers} 线程）")
+    return progress['inserted']
@@ -1,7 +1,69 @@
+import os
+import time
 import pandas as pd
-from typing import List
+from typing import List, Dict, Any, Tuple, Iterator
 from excel_parser import MigrationSheet
-from util import convert_type
+from util import compile_converter, convert_rows, get_cache_stats
+from config import FETCH_CHUNK_SIZE, get_source_db_config
+from db_connector import DatabaseConnector
+from join import hash_join, key_getter, iter_rows, iter_chunks
+from metrics import RUN_METRICS, TableMetrics
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+def _stream_joined_rows(source_mappings: Dict[str, Dict[str, Any]], join_type: str,
+                        connectors: List[DatabaseConnector],
+                        metrics: TableMetrics = None) -> Tuple[Iterator[tuple], Dict[str, int], Dict[str, List[str]]]:
+    """
+    ソーステーブルをそれぞれ専用の接続でストリーム読み込みし、宣言された結合キーでハッシュ結合する
+    先頭のソーステーブルをプローブ側（結合結果の左側）とし、2番目以降のテーブルを順にビルド側として結合する
+    同じ結合キー名（JoinKey列の値）の列同士を等価条件とする
+    :param source_mappings: ソーステーブルごとのマッピング（fields, join_keys, connection）
+    :param join_type: 'inner' または 'left'（先頭テーブルの行を残す外部結合）
+    :param connectors: 作成した接続の格納先（呼び出し元でクローズする）
+    :param metrics: 読み取り時間の記録先
+    :return: (結合結果の行のイテレーター, テーブルごとの列オフセット, テーブルごとのSELECT列)
+    """
+    columns_by_table = {}
+    for source_table, mapping in source_mappings.items():
+        columns = [field['source_field'] for field in mapping['fields']]
+        columns += [field for _, field in mapping['join_keys'] if field not in columns]
+        columns_by_table[source_table] = columns
+    
+    def stream(source_table):
+        connection_name = source_mappings[source_table]['connection']
+        connector = DatabaseConnector(config=get_source_db_config(connection_name))
+        connectors.append(connector)
+        query = f"SELECT {', '.join(columns_by_table[source_table])} FROM {source_table}"
+        logger.info(f"  クエリ実行{f' ({connection_name})' if connection_name else ''}: {query}")
+        return iter_rows(connector.fetch_iter(query, metrics=metrics))
+    
+    tables = list(source_mappings.keys())
+    joined = stream(tables[0])
+    offsets = {tables[0]: 0}
+    width = len(columns_by_table[tables[0]])
+    # 結合キー名ごとの結合結果内の列位置
+    key_positions = {label: columns_by_table[tables[0]].index(field) for label, field in source_mappings[tables[0]]['join_keys']}
+    
+    for source_table in tables[1:]:
+        join_keys = source_mappings[source_table]['join_keys']
+        if not join_keys:
+            raise ValueError(f"結合キーが宣言されていません: {source_table}")
+        missing = [label for label, _ in join_keys if label not in key_positions]
+        if missing:
+            raise ValueError(f"結合キー {', '.join(missing)} が先行するテーブルに見つかりません: {source_table}")
+        columns = columns_by_table[source_table]
+        probe_key = key_getter([key_positions[label] for label, _ in join_keys])
+        build_key = key_getter([columns.index(field) for _, field in join_keys])
+        logger.info(f"  結合: {source_table} ({join_type}, キー: {', '.join(field for _, field in join_keys)})")
+        joined = hash_join(stream(source_table), joined, build_key, probe_key, len(columns),
+                           left_outer=join_type == 'left')
+        offsets[source_table] = width
+        for label, field in join_keys:
+            key_positions.setdefault(label, width + columns.index(field))
+        width += len(columns)
+    return joined, offsets, columns_by_table
 
 def execute_many_to_one_migration(excel_path: str, parser, source_db, target_db, sheets: List[MigrationSheet]):
     """
@@ -11,14 +73,16 @@ def execute_many_to_one_migration(excel_path: str, parser, source_db, target_db,
     :param source_db: ソースデータベース接続
     :param target_db: ターゲットデータベース接続
     :param sheets: 移行対象のテーブル設定リスト
+    :return: 論理名ごとの挿入件数
     """
+    results = {}
     try:
         for sheet in sheets:
-            print(f"\nテーブルグループ {sheet.logical_name} の処理:")
-            print(f"ターゲットテーブル: {sheet.physical_name}")
+            logger.info(f"テーブルグループ {sheet.logical_name} の処理:")
+            logger.info(f"ターゲットテーブル: {sheet.physical_name}")
             
             # フィールドマッピングシートの読み込み
-            df = pd.read_excel(excel_path, sheet_name=sheet.logical_name)
+            df = parser.get_sheet(sheet.logical_name)
             
             # ソーステーブルのフィールドマッピングを保存するための辞書
             source_mappings = {}
@@ -30,19 +94,29 @@ def execute_many_to_one_migration(excel_path: str, parser, source_db, target_db,
                 # 結合条件の取得
                 if pd.notna(row.get('Union')):
                     join_conditions = str(row.get('Union')).strip()
+                
+                source_table = str(row.get('現行DB物理名'))
+                join_key = row.get('JoinKey')
+                is_join_key = pd.notna(join_key) and str(join_key).strip() != ''
+                if (str(row.get('Transform', '')).upper() == 'Y' or is_join_key) and source_table not in source_mappings:
+                    # ソーステーブルが存在しない場合、マッピング構造を作成
+                    source_mappings[source_table] = {
+                        'fields': [],
+                        'type_conversion': {},
+                        'join_keys': [],  # (結合キー名, ソースフィールド)
+                        'connection': None  # 名前付きソース接続（別サーバー/別DBの場合）
+                    }
+                
+                # クライアント側結合の結合キーと接続先
+                if is_join_key:
+                    source_mappings[source_table]['join_keys'].append((str(join_key).strip().upper(), str(row.get('現行Type物理名'))))
+                if source_table in source_mappings and pd.notna(row.get('Connection')):
+                    source_mappings[source_table]['connection'] = str(row.get('Connection')).strip()
                     
                 if str(row.get('Transform', '')).upper() == 'Y':
-                    source_table = str(row.get('現行DB物理名'))
                     source_field = str(row.get('現行Type物理名'))
                     target_field = str(row.get('次期Type物理名'))
                     
-                    # ソーステーブルが存在しない場合、マッピング構造を作成
-                    if source_table not in source_mappings:
-                        source_mappings[source_table] = {
-                            'fields': [],
-                            'type_conversion': {}
-                        }
-                    
                     # フィールドマッピングの追加
                     source_mappings[source_table]['fields'].append({
                         'source_field': source_field,
@@ -61,71 +135,86 @@ def execute_many_to_one_migration(excel_path: str, parser, source_db, target_db,
                         target_fields.append(target_field)
             
             if not source_mappings:
-                print("  警告: 移行対象のフィールドが見つかりません")
-                continue
-            
-            if not join_conditions:
-                print("  警告: テーブル結合条件が見つかりません")
+                logger.warning("  移行対象のフィールドが見つかりません")
                 continue
             
-            print(f"  結合条件: {join_conditions}")
+            # 結合キーが宣言されている場合は、テーブルごとに読み込んでクライアント側で結合する
+            client_join = any(mapping['join_keys'] for mapping in source_mappings.values())
             
-            # SELECT部分の構築
-            select_parts = []
-            for source_table, mapping in source_mappings.items():
-                for field in mapping['fields']:
-                    table_alias = 'a' if source_table == 'dbo.Test1' else 'b'
-                    select_parts.append(f"{table_alias}.{field['source_field']}")
-            
-            # Excelで指定された結合クエリ条件の使用
-            select_query = f"SELECT {', '.join(select_parts)} FROM {join_conditions}"
-            print(f"  クエリ実行: {select_query}")
-            
-            # 結合クエリの実行
-            rows = source_db.fetch_all(select_query)
-            
-            if not rows:
-                print(f"  警告: ソーステーブルの結合クエリでデータが返されませんでした")
-                continue
+            # 処理段階ごとの計測値の記録先
+            metrics = RUN_METRICS.table(sheet.logical_name)
             
-            print(f"  ソーステーブルから {len(rows)} 件のレコードを読み取りました")
-            
-            # 挿入文の準備
-            insert_query = f"INSERT INTO {sheet.physical_name} ({', '.join(target_fields)}) VALUES ({', '.join(['?' for _ in target_fields])})"
-            print(f"  挿入実行: {insert_query}")
-            
-            # データの行ごとの処理
-            for i, row_data in enumerate(rows, 1):
-                # データの変換
-                converted_values = []
-                field_index = 0
+            if client_join:
+                join_type = os.getenv('MANY_TO_ONE_JOIN_TYPE', 'inner').lower()
+                connectors = []
+                joined_rows, offsets, columns_by_table = _stream_joined_rows(source_mappings, join_type, connectors, metrics)
+                chunks = iter_chunks(joined_rows, FETCH_CHUNK_SIZE)
+            else:
+                if not join_conditions:
+                    logger.warning("  テーブル結合条件が見つかりません")
+                    continue
                 
+                logger.info(f"  結合条件: {join_conditions}")
+                
+                # SELECT部分の構築
+                select_parts = []
                 for source_table, mapping in source_mappings.items():
                     for field in mapping['fields']:
-                        value = row_data[field_index]
-                        conversion_rule = mapping['type_conversion'][field['source_field']]
-                        converted_value = convert_type(value, conversion_rule)
-                        converted_values.append(converted_value)
-                        field_index += 1
+                        table_alias = 'a' if source_table == 'dbo.Test1' else 'b'
+                        select_parts.append(f"{table_alias}.{field['source_field']}")
                 
-                try:
-                    # 挿入の実行
-                    target_db.execute_query(insert_query, converted_values)
+                # Excelで指定された結合クエリ条件の使用
+                select_query = f"SELECT {', '.join(select_parts)} FROM {join_conditions}"
+                logger.info(f"  クエリ実行: {select_query}")
+                chunks = source_db.fetch_iter(select_query, metrics=metrics)
+            
+            # 挿入文の準備
+            insert_query = f"INSERT INTO {sheet.physical_name} ({', '.join(target_fields)}) VALUES ({', '.join(['?' for _ in target_fields])})"
+            logger.info(f"  挿入実行: {insert_query}")
+            
+            def report_error(index, values, e):
+                logger.warning("  挿入エラー: %s", e)
+            
+            # 変換プランの作成（ソース列インデックス, 変換関数）、SELECT列（結合結果の列）の並び順と一致
+            conversion_plan = []
+            for source_table, mapping in source_mappings.items():
+                for field in mapping['fields']:
+                    conversion_rule = mapping['type_conversion'][field['source_field']]
+                    if client_join:
+                        index = offsets[source_table] + columns_by_table[source_table].index(field['source_field'])
+                    else:
+                        index = len(conversion_plan)
+                    conversion_plan.append((index, compile_converter(conversion_rule)))
+            
+            # 結合結果をチャンク単位で処理
+            total_count = 0
+            success_total = 0
+            try:
+                for rows in chunks:
+                    # データの変換（列単位で一括変換）
+                    started = time.perf_counter()
+                    converted_rows = convert_rows(rows, conversion_plan)
+                    metrics.record('convert', time.perf_counter() - started, len(rows))
                     
-                    # 100件ごとにトランザクションをコミット
-                    if i % 100 == 0:
-                        target_db.commit()
-                        print(f"  {i}/{len(rows)} 件のレコードを処理しました")
-                except Exception as e:
-                    target_db.rollback()
-                    print(f"  挿入エラー: {str(e)}")
-                    continue
+                    # 一括挿入の実行（バッチごとにコミット）
+                    success_total += target_db.bulk_insert(insert_query, converted_rows, on_error=report_error, metrics=metrics)
+                    total_count += len(rows)
+                    logger.info("  %d/%d 件のレコードを挿入しました", success_total, total_count)
+            finally:
+                if client_join:
+                    for connector in connectors:
+                        connector.close()
+            
+            if total_count == 0:
+                logger.warning(f"  ソーステーブルの結合クエリでデータが返されませんでした")
+                continue
             
-            # 残りのトランザクションのコミット
-            target_db.commit()
-            print(f"  移行が完了しました。合計 {len(rows)} 件のレコードを処理しました")
+            logger.info(f"  移行が完了しました。合計 {total_count} 件のレコードを処理しました")
+            hits, misses = get_cache_stats([converter for _, converter in conversion_plan])
+            logger.info(f"  変換キャッシュ: ヒット {hits} 件, ミス {misses} 件")
+            results[sheet.logical_name] = success_total
             
     except Exception as e:
-        print(f"多対1移行中にエラーが発生しました: {str(e)}")
-        import traceback
-        traceback.print_exc() 
\ No newline at end of file
+        logger.exception(f"多対1移行中にエラーが発生しました: {str(e)}")
+        raise
+    return results
\ No newline at end of file
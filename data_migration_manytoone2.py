@@ -1,91 +1,38 @@
-import pandas as pd
 from typing import List
-from excel_parser import MigrationSheet
-from util import convert_type
+from data_generator import ColumnSpec, generate_table_data, load_column_specs_from_schema
 
-def generate_test_data(target_db, table_name: str, count: int = 10000):
+def generate_test_data(target_db, table_name: str, count: int = 10000, specs: List[ColumnSpec] = None,
+                       connection_factory=None, batch_size: int = None, workers: int = None, seed: int = None):
     """
     生成测试数据
     :param target_db: 目标数据库连接
     :param table_name: 目标表名
     :param count: 需要生成的数据条数
+    :param specs: 列定义（省略时从目标表结构读取，见data_generator）
+    :param connection_factory: 创建并行写入用连接的函数（省略时不并行）
+    :param batch_size: 每批行数
+    :param workers: 并行线程数
+    :param seed: 随机数种子
+    :return: 插入成功的行数
     """
     try:
         print(f"\n开始生成测试数据，目标表: {table_name}")
         print(f"计划生成 {count} 条数据")
         
-        # 准备插入语句
-        insert_query = f"""
-        INSERT INTO {table_name} (
-            [INST_TYPE_ID], [INST_TYPE_SEQ], [INST_ID], [EDA_NO], [DATA_KBN], 
-            [PROCESS_KBN], [PROCESS_YMD], [PROCESS_TTL_AMOUNT], [PROCESS_P_AMOUNT], 
-            [PROCESS_I_AMOUNT], [MISHU_JIYU], [BIKO], [SEIKYU_MEISAI_NUM], 
-            [KEIJO_YM], [KEIRI_YM], [OHTOH_YM], [OHTOH_S_NUM], [OHTOH_E_NUM], 
-            [NYUKIN_MEISAI_NUM], [CREATE_D], [CREATE_OP], [CREATE_PG], 
-            [UPDATE_D], [UPDATE_OP], [UPDATE_PG]
-        ) VALUES (
-            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-        )
-        """
+        # 读取列定义（类型、长度、是否允许NULL、键列）
+        if specs is None:
+            specs = load_column_specs_from_schema(target_db, table_name)
+        print(f"  列数: {len(specs)}（{', '.join(spec.name for spec in specs)}）")
         
-        # 批量插入数据
-        batch_size = 1000
-        for i in range(0, count, batch_size):
-            current_batch_size = min(batch_size, count - i)
-            values_list = []
-            
-            for j in range(current_batch_size):
-                inst_type_id = str(i + j + 1)  # 从1开始递增
-                values = [
-                    inst_type_id,  # INST_TYPE_ID
-                    '1',           # INST_TYPE_SEQ
-                    '1',           # INST_ID
-                    '1',           # EDA_NO
-                    '1',           # DATA_KBN
-                    '1',           # PROCESS_KBN
-                    '20250321',    # PROCESS_YMD
-                    1,             # PROCESS_TTL_AMOUNT
-                    1,             # PROCESS_P_AMOUNT
-                    1,             # PROCESS_I_AMOUNT
-                    '1',           # MISHU_JIYU
-                    '1',           # BIKO
-                    '1',           # SEIKYU_MEISAI_NUM
-                    '1',           # KEIJO_YM
-                    '1',           # KEIRI_YM
-                    '1',           # OHTOH_YM
-                    1,             # OHTOH_S_NUM
-                    1,             # OHTOH_E_NUM
-                    '1',           # NYUKIN_MEISAI_NUM
-                    '202503',      # CREATE_D
-                    '1',           # CREATE_OP
-                    '1',           # CREATE_PG
-                    '202503',      # UPDATE_D
-                    '1',           # UPDATE_OP
-                    '1'            # UPDATE_PG
-                ]
-                values_list.append(values)
-            
-            try:
-                # 执行批量插入
-                target_db.executemany(insert_query, values_list)
-                target_db.commit()
-                print(f"  已插入 {i + current_batch_size}/{count} 条数据")
-            except Exception as e:
-                target_db.rollback()
-                print(f"  插入失败: {str(e)}")
-                continue
-        
-        print(f"测试数据生成完成，共插入 {count} 条数据")
+        # 按列向量化生成，分批并行插入
+        return generate_table_data(target_db, table_name, specs, count, connection_factory=connection_factory,
+                                   batch_size=batch_size, workers=workers, seed=seed)
         
     except Exception as e:
         print(f"生成测试数据时发生错误: {str(e)}")
         import traceback
         traceback.print_exc()
-            
-    except Exception as e:
-        print(f"多对一迁移过程中发生错误: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        return 0
 
 if __name__ == "__main__":
     # 这里可以添加测试代码
@@ -1,7 +1,14 @@
-import pandas as pd
+import os
+import time
 from typing import List
 from excel_parser import MigrationSheet
-from util import convert_type
+from util import compile_converter, convert_rows, get_cache_stats
+from db_connector import DatabaseConnector
+from pipeline import run_fanout
+from metrics import RUN_METRICS
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 def execute_one_to_many_migration(excel_path: str, parser, source_db, target_db, sheets: List[MigrationSheet]):
     """
@@ -11,14 +18,16 @@ def execute_one_to_many_migration(excel_path: str, parser, source_db, target_db,
     :param source_db: ソースデータベース接続
     :param target_db: ターゲットデータベース接続
     :param sheets: 移行対象のテーブル設定リスト
+    :return: 論理名ごとの挿入件数
     """
+    results = {}
     try:
         for sheet in sheets:
-            print(f"\nテーブルグループ {sheet.logical_name} の処理:")
-            print(f"ソーステーブル: {sheet.source_name}")
+            logger.info(f"テーブルグループ {sheet.logical_name} の処理:")
+            logger.info(f"ソーステーブル: {sheet.source_name}")
             
             # フィールドマッピングシートの読み込み
-            df = pd.read_excel(excel_path, sheet_name=sheet.logical_name)
+            df = parser.get_sheet(sheet.logical_name)
             
             # ターゲットテーブルのフィールドマッピングを保存するための辞書
             target_mappings = {}
@@ -50,62 +59,88 @@ def execute_one_to_many_migration(excel_path: str, parser, source_db, target_db,
                 all_source_fields.update(mappings['field_mapping'].keys())
             
             if not all_source_fields:
-                print("  警告: 移行対象のフィールドが見つかりません")
+                logger.warning("  移行対象のフィールドが見つかりません")
                 continue
             
-            select_query = f"SELECT {', '.join(all_source_fields)} FROM {sheet.source_name}"
-            print(f"  クエリ実行: {select_query}")
-            rows = source_db.fetch_all(select_query)
-            
-            if not rows:
-                print(f"  警告: ソーステーブル {sheet.source_name} にデータがありません")
-                continue
+            # SELECT列の並び順を固定
+            source_fields = list(all_source_fields)
             
-            print(f"  ソーステーブルから {len(rows)} 件のレコードを読み取りました")
-            
-            # 各ターゲットテーブルの処理
+            # 各ターゲットテーブルの挿入文と変換プラン（ソース列インデックス, 変換関数）の準備
+            insert_queries = {}
+            conversion_plans = {}
+            success_counts = {}
             for target_table, mappings in target_mappings.items():
                 if not mappings['field_mapping']:
                     continue
-                    
-                print(f"\nターゲットテーブルの処理: {target_table}")
                 field_mapping = mappings['field_mapping']
                 type_conversion_mapping = mappings['type_conversion_mapping']
-                
-                # 挿入文の準備
-                insert_query = f"INSERT INTO {target_table} ({', '.join(field_mapping.values())}) VALUES ({', '.join(['?' for _ in field_mapping])})"
-                print(f"  挿入実行: {insert_query}")
-                
-                # データの行ごとの処理
-                for i, row_data in enumerate(rows, 1):
-                    # データの変換
-                    converted_values = []
-                    for source_field in field_mapping.keys():
-                        # ソースフィールドのインデックスを取得
-                        source_index = list(all_source_fields).index(source_field)
-                        value = row_data[source_index]
-                        conversion_rule = type_conversion_mapping.get(source_field)
-                        converted_value = convert_type(value, conversion_rule)
-                        converted_values.append(converted_value)
-                    
-                    try:
-                        # 挿入の実行
-                        target_db.execute_query(insert_query, converted_values)
-                        
-                        # 100件ごとにトランザクションをコミット
-                        if i % 100 == 0:
-                            target_db.commit()
-                            print(f"  {i}/{len(rows)} 件のレコードを処理しました")
-                    except Exception as e:
-                        target_db.rollback()
-                        print(f"  挿入エラー: {str(e)}")
-                        continue
-                
-                # 残りのトランザクションのコミット
-                target_db.commit()
-                print(f"  移行が完了しました。合計 {len(rows)} 件のレコードを処理しました")
+                insert_queries[target_table] = f"INSERT INTO {target_table} ({', '.join(field_mapping.values())}) VALUES ({', '.join(['?' for _ in field_mapping])})"
+                conversion_plans[target_table] = [
+                    (source_fields.index(source_field), compile_converter(type_conversion_mapping.get(source_field)))
+                    for source_field in field_mapping.keys()
+                ]
+                success_counts[target_table] = 0
+                logger.info(f"  挿入実行: {insert_queries[target_table]}")
+            
+            def report_error(index, values, e):
+                logger.warning("  挿入エラー: %s", e)
+            
+            # ソーステーブルからチャンク単位でデータを取得
+            select_query = f"SELECT {', '.join(source_fields)} FROM {sheet.source_name}"
+            logger.info(f"  クエリ実行: {select_query}")
+            
+            # ターゲットテーブルごとに専用の接続を用意し、並行して書き込む（1テーブルのみの場合は既存の接続を使用）
+            if len(insert_queries) > 1:
+                writer_dbs = {target_table: DatabaseConnector(is_source=False) for target_table in insert_queries}
+            else:
+                writer_dbs = {target_table: target_db for target_table in insert_queries}
+            
+            # 処理段階ごとの計測値の記録先（書き込みスレッド間で共有する）
+            metrics = RUN_METRICS.table(sheet.logical_name)
+            
+            def make_writer(target_table):
+                def write(converted_rows):
+                    # 一括挿入の実行（バッチごとにコミット）
+                    success_counts[target_table] += writer_dbs[target_table].bulk_insert(
+                        insert_queries[target_table], converted_rows, on_error=report_error, metrics=metrics)
+                return write
+            
+            total_count = 0
+            
+            def route(rows):
+                # 読み込んだチャンクを各ターゲットテーブル向けに変換して振り分ける（列単位で一括変換）
+                nonlocal total_count
+                total_count += len(rows)
+                logger.info(f"  ソーステーブルから {total_count} 件のレコードを読み込みました")
+                started = time.perf_counter()
+                routed = {target_table: convert_rows(rows, conversion_plan)
+                          for target_table, conversion_plan in conversion_plans.items()}
+                metrics.record('convert', time.perf_counter() - started, len(rows))
+                return routed
+            
+            # ソーステーブルを1回だけ読み込み、ターゲットテーブルごとの書き込みスレッドへ振り分ける
+            queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', '2'))
+            try:
+                run_fanout(source_db.fetch_iter(select_query, metrics=metrics), route,
+                           {target_table: make_writer(target_table) for target_table in insert_queries}, queue_size)
+            finally:
+                for writer_db in writer_dbs.values():
+                    if writer_db is not target_db:
+                        writer_db.close()
+            
+            if total_count == 0:
+                logger.warning(f"  ソーステーブル {sheet.source_name} にデータがありません")
+                continue
+            
+            for target_table, success_count in success_counts.items():
+                logger.info(f"ターゲットテーブルの処理: {target_table}")
+                logger.info(f"  {success_count}/{total_count} 件のレコードを挿入しました")
+            logger.info(f"  移行が完了しました。合計 {total_count} 件のレコードを処理しました")
+            hits, misses = get_cache_stats([converter for plan in conversion_plans.values() for _, converter in plan])
+            logger.info(f"  変換キャッシュ: ヒット {hits} 件, ミス {misses} 件")
+            results[sheet.logical_name] = sum(success_counts.values())
                 
     except Exception as e:
-        print(f"1対多移行中にエラーが発生しました: {str(e)}")
-        import traceback
-        traceback.print_exc() 
\ No newline at end of file
+        logger.exception(f"1対多移行中にエラーが発生しました: {str(e)}")
+        raise
+    return results
\ No newline at end of file
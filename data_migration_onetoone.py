@@ -1,7 +1,11 @@
-import pandas as pd
+import time
 from typing import List
 from excel_parser import MigrationSheet
-from util import convert_type
+from util import compile_converter, convert_rows, get_cache_stats
+from metrics import RUN_METRICS
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db, sheets: List[MigrationSheet]):
     """
@@ -11,15 +15,17 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
     :param source_db: ソースデータベース接続
     :param target_db: ターゲットデータベース接続
     :param sheets: 移行対象のテーブル設定リスト
+    :return: 論理名ごとの挿入件数
     """
+    results = {}
     try:
         for sheet in sheets:
-            print(f"\nテーブルグループ {sheet.logical_name} の処理:")
-            print(f"ソーステーブル: {sheet.source_name}")
-            print(f"ターゲットテーブル: {sheet.physical_name}")
+            logger.info(f"テーブルグループ {sheet.logical_name} の処理:")
+            logger.info(f"ソーステーブル: {sheet.source_name}")
+            logger.info(f"ターゲットテーブル: {sheet.physical_name}")
             
             # フィールドマッピングシートの読み込み
-            df = pd.read_excel(excel_path, sheet_name=sheet.logical_name)
+            df = parser.get_sheet(sheet.logical_name)
             
             # フィールドマッピングの処理
             field_mapping = {}
@@ -38,52 +44,52 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
                     }
             
             if not field_mapping:
-                print("  警告: 移行対象のフィールドが見つかりません")
+                logger.warning("  移行対象のフィールドが見つかりません")
                 continue
             
-            # ソーステーブルからデータを取得
-            select_query = f"SELECT {', '.join(field_mapping.keys())} FROM {sheet.source_name}"
-            print(f"  クエリ実行: {select_query}")
-            rows = source_db.fetch_all(select_query)
+            # 挿入文の準備
+            insert_query = f"INSERT INTO {sheet.physical_name} ({', '.join(field_mapping.values())}) VALUES ({', '.join(['?' for _ in field_mapping])})"
             
-            if not rows:
-                print(f"  警告: ソーステーブル {sheet.source_name} にデータがありません")
-                continue
+            def report_error(index, values, e):
+                logger.warning("  挿入エラー: %s", e)
+            
+            # ソーステーブルからチャンク単位でデータを取得
+            select_query = f"SELECT {', '.join(field_mapping.keys())} FROM {sheet.source_name}"
+            logger.info(f"  クエリ実行: {select_query}")
+            logger.info(f"  挿入実行: {insert_query}")
             
-            print(f"  ソーステーブルから {len(rows)} 件のレコードを読み取りました")
+            # 変換プランの作成（ソース列インデックス, 変換関数）
+            conversion_plan = [
+                (index, compile_converter(type_conversion_mapping.get(source_field)))
+                for index, source_field in enumerate(field_mapping.keys())
+            ]
             
-            # 挿入文の準備
-            insert_query = f"INSERT INTO {sheet.physical_name} ({', '.join(field_mapping.values())}) VALUES ({', '.join(['?' for _ in field_mapping])})"
-            print(f"  挿入実行: {insert_query}")
+            # 処理段階ごとの計測値の記録先
+            metrics = RUN_METRICS.table(sheet.logical_name)
             
-            # データの行ごとの処理
-            for i, row_data in enumerate(rows, 1):
-                # データの変換
-                converted_values = []
-                for source_field in field_mapping.keys():
-                    value = row_data[list(field_mapping.keys()).index(source_field)]
-                    conversion_rule = type_conversion_mapping.get(source_field)
-                    converted_value = convert_type(value, conversion_rule)
-                    converted_values.append(converted_value)
+            total_count = 0
+            success_total = 0
+            for rows in source_db.fetch_iter(select_query, metrics=metrics):
+                # データの変換（列単位で一括変換）
+                started = time.perf_counter()
+                converted_rows = convert_rows(rows, conversion_plan)
+                metrics.record('convert', time.perf_counter() - started, len(rows))
                 
-                try:
-                    # 挿入の実行
-                    target_db.execute_query(insert_query, converted_values)
-                    
-                    # 100件ごとにトランザクションをコミット
-                    if i % 100 == 0:
-                        target_db.commit()
-                        print(f"  {i}/{len(rows)} 件のレコードを処理しました")
-                except Exception as e:
-                    target_db.rollback()
-                    print(f"  挿入エラー: {str(e)}")
-                    continue
+                # 一括挿入の実行（バッチごとにコミット）
+                success_total += target_db.bulk_insert(insert_query, converted_rows, on_error=report_error, metrics=metrics)
+                total_count += len(rows)
+                logger.info("  %d/%d 件のレコードを挿入しました", success_total, total_count)
+            
+            if total_count == 0:
+                logger.warning(f"  ソーステーブル {sheet.source_name} にデータがありません")
+                continue
             
-            # 残りのトランザクションのコミット
-            target_db.commit()
-            print(f"  移行が完了しました。合計 {len(rows)} 件のレコードを処理しました")
+            logger.info(f"  移行が完了しました。合計 {total_count} 件のレコードを処理しました")
+            hits, misses = get_cache_stats([converter for _, converter in conversion_plan])
+            logger.info(f"  変換キャッシュ: ヒット {hits} 件, ミス {misses} 件")
+            results[sheet.logical_name] = success_total
             
     except Exception as e:
-        print(f"1対1移行中にエラーが発生しました: {str(e)}")
-        import traceback
-        traceback.print_exc() 
\ No newline at end of file
+        logger.exception(f"1対1移行中にエラーが発生しました: {str(e)}")
+        raise
+    return results
\ No newline at end of file
@@ -4,6 +4,9 @@ from typing import List, Dict, Any
 from excel_parser import MigrationSheet
 import datetime
 from util import convert_type
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 def process_default_value(default_config: str) -> Any:
     """
@@ -34,7 +37,7 @@ def process_default_value(default_config: str) -> Any:
     except json.JSONDecodeError:
         return default_config
     except Exception as e:
-        print(f"Error processing default value: {str(e)}")
+        logger.error(f"Error processing default value: {str(e)}")
         return None
 
 def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db, sheets: List[MigrationSheet]):
@@ -48,11 +51,11 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
     """
     try:
         for sheet in sheets:
-            print(f"\n处理表 {sheet.logical_name}:")
-            print(f"从 {sheet.source_name} 迁移到 {sheet.physical_name}")
+            logger.info(f"处理表 {sheet.logical_name}:")
+            logger.info(f"从 {sheet.source_name} 迁移到 {sheet.physical_name}")
             
             # 读取字段映射sheet
-            df = pd.read_excel(excel_path, sheet_name=sheet.logical_name)
+            df = parser.get_sheet(sheet.logical_name)
             
             # 构建字段映射
             select_fields = {}  # 用于SELECT语句的字段
@@ -84,28 +87,28 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
                     merge_fields[target_field] = default_value
             
             if not select_fields:
-                print("  警告: 没有找到需要查询的字段")
+                logger.warning("  没有找到需要查询的字段")
                 continue
                 
             if not insert_fields:
-                print("  警告: 没有找到需要插入的字段")
+                logger.warning("  没有找到需要插入的字段")
                 continue
             
             # 构建并执行SELECT语句
             select_query = f"SELECT {', '.join(select_fields.keys())} FROM {sheet.source_name}"
-            print(f"  执行查询: {select_query}")
+            logger.info(f"  执行查询: {select_query}")
             rows = source_db.fetch_all(select_query)
             
             if not rows:
-                print(f"  警告: 源表 {sheet.source_name} 没有数据")
+                logger.warning(f"  源表 {sheet.source_name} 没有数据")
                 continue
             
-            print(f"  从源表读取到 {len(rows)} 条记录")
+            logger.info(f"  从源表读取到 {len(rows)} 条记录")
             
             # 准备INSERT语句
             insert_fields_list = list(insert_fields.keys())
             insert_query = f"INSERT INTO {sheet.physical_name} ({', '.join(insert_fields_list)}) VALUES ({', '.join(['?' for _ in insert_fields_list])})"
-            print(f"  执行插入: {insert_query}")
+            logger.info(f"  执行插入: {insert_query}")
             
             # 处理每一行数据
             for row_data in rows:
@@ -132,15 +135,13 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
                 try:
                     target_db.execute_query(insert_query, insert_values)
                 except Exception as e:
-                    print(f"  插入失败: {str(e)}")
+                    logger.warning("  插入失败: %s", e)
                     target_db.rollback()
                     continue
             
             target_db.commit()
-            print(f"  迁移成功完成，共处理 {len(rows)} 条记录")
+            logger.info(f"  迁移成功完成，共处理 {len(rows)} 条记录")
             
     except Exception as e:
-        print(f"一对一迁移过程中发生错误: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"一对一迁移过程中发生错误: {str(e)}")
         raise 
\ No newline at end of file
@@ -1,12 +1,51 @@
 import pandas as pd
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from excel_parser import MigrationSheet
 import datetime
-from util import convert_type
+from util import compile_converter, get_cache_stats
 import os
-import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
 from pathlib import Path
+from db_connector import DatabaseConnector
+from checkpoint import CheckpointStore
+from error_sink import ErrorSink, format_error_value
+from keyset import build_keyset_query, build_keyset_params, build_range_condition, build_offset_query, build_key_check_queries
+from incremental import build_watermark_expression, build_watermark_condition, build_upsert_query
+from pipeline import run_pipeline
+from adaptive_batch import BatchSizeController, create_batch_controller
+from metrics import RUN_METRICS, TableMetrics
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass
+class TablePlan:
+    """1テーブル分の移行設定（範囲ワーカー間で共有する）"""
+    sheet: MigrationSheet
+    # INSERT列ごとの変換プラン (ターゲットフィールド, ソースフィールド, ソース列インデックス, 変換関数)
+    # ソース列の変換関数はColumnConverter、インデックスがNoneの列は引数なしで呼んで値を得る
+    column_plan: List[Tuple[str, Optional[str], Optional[int], Callable]]
+    select_columns: List[str]  # SELECT対象の列（キー列を含む）
+    key_columns: List[str]  # キーセットページングのキー列（空の場合はOFFSETページング）
+    insert_query: str
+    batch_size: int
+    queue_size: int  # パイプラインの段間キューの最大バッチ数（0は逐次実行）
+    error_sink: ErrorSink  # エラーレコードの出力先（範囲ワーカー間で共有する）
+    checkpoint: Optional[CheckpointStore] = None  # コミット済みバッチごとに進捗を記録するストア
+    filter_condition: Optional[str] = None  # 抽出条件（差分移行のウォーターマーク条件）
+    filter_params: List[Any] = field(default_factory=list)  # 抽出条件のパラメータ
+    batch_controller: Optional[BatchSizeController] = None  # バッチサイズの調整器（Noneはbatch_sizeで固定）
+    metrics: Optional[TableMetrics] = None  # 処理段階ごとの計測値の記録先
+    # 再開時、前回コミット済みか不明なバッチの行に使うアップサート文（Noneはキー列がなくINSERTのまま）
+    replay_query: Optional[str] = None
+    
+    def current_batch_size(self) -> int:
+        """次に読み取るバッチのサイズ"""
+        return self.batch_controller.size if self.batch_controller else self.batch_size
 
 def process_default_value(default_config: str) -> Any:
     """
@@ -37,10 +76,340 @@ def process_default_value(default_config: str) -> Any:
     except json.JSONDecodeError:
         return default_config
     except Exception as e:
-        print(f"デフォルト値の処理中にエラーが発生しました: {str(e)}")
+        logger.error(f"デフォルト値の処理中にエラーが発生しました: {str(e)}")
         return None
 
-def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db, sheets: List[MigrationSheet]):
+def compile_default_value(default_config: str) -> Callable[[], Any]:
+    """
+    デフォルト値設定を事前に評価し、値を返す関数を作成する
+    now()などの関数指定は呼び出しごとに評価する
+    :param default_config: デフォルト値設定のJSON文字列
+    :return: 引数なしで値を返す関数
+    """
+    try:
+        is_function = json.loads(default_config).get('type', '').lower() == 'function'
+    except Exception:
+        is_function = False
+    if is_function:
+        return lambda: process_default_value(default_config)
+    value = process_default_value(default_config)
+    return lambda: value
+
+def _compile_column_plan(insert_fields_list: List[str], select_fields: Dict[str, str], merge_fields: Dict[str, Any],
+                         type_conversion_mapping: Dict[str, Dict[str, Any]]) -> List[Tuple[str, Optional[str], Optional[int], Callable]]:
+    """
+    フィールドマッピングをINSERT列ごとの変換プランにコンパイルする
+    :return: (ターゲットフィールド, ソースフィールド, ソース列インデックス, 変換関数) のリスト
+    """
+    select_field_list = list(select_fields.keys())
+    column_plan = []
+    for target_field in insert_fields_list:
+        # フィールドにマージ処理が必要な場合
+        if target_field in merge_fields:
+            column_plan.append((target_field, None, None, compile_default_value(merge_fields[target_field])))
+            continue
+        # クエリ結果から対応する値を取得
+        source_field = next((k for k, v in select_fields.items() if v == target_field), None)
+        if source_field:
+            converter = compile_converter(type_conversion_mapping.get(source_field))
+            column_plan.append((target_field, source_field, select_field_list.index(source_field), converter))
+        else:
+            column_plan.append((target_field, None, None, lambda: None))
+    return column_plan
+
+def _check_key_columns(source_db, table_name: str, key_columns: List[str], check_unique: bool = True) -> bool:
+    """
+    キー列がキーセットページング・アップサートの照合に使えるか（一意かつNULLを含まないか）を確認する
+    :param source_db: ソースデータベース接続
+    :param table_name: ソーステーブル名
+    :param key_columns: キー列リスト
+    :param check_unique: 一意性を確認するかどうか（主キー/一意インデックスの場合は不要）
+    :return: 使える場合はTrue（使えない場合は理由を警告する）
+    """
+    duplicate_query, null_query = build_key_check_queries(table_name, key_columns)
+    null_count = source_db.fetch_all(null_query)[0][0]
+    duplicate_count = source_db.fetch_all(duplicate_query)[0][0] if check_unique else 0
+    if not null_count and not duplicate_count:
+        return True
+    logger.warning(
+        f"  キー列 {', '.join(key_columns)} は一意でないかNULLを含むため使用しません"
+        f"（重複する値: {duplicate_count} 件、NULLの行: {null_count} 件）"
+    )
+    return False
+
+def _new_progress() -> Dict[str, Any]:
+    """
+    範囲コピーの進捗状態を作成（コミット済みバッチごとに更新される）
+    """
+    return {'offset': 0, 'last_key': None, 'processed': 0, 'errors': 0, 'batches': 0, 'pending_offset': None}
+
+def _load_progress(plan: TablePlan, part: int = 0) -> Tuple[Dict[str, Any], bool]:
+    """
+    チェックポイントから範囲の進捗状態を読み込む（記録がない場合は新規作成）
+    :return: (進捗状態, 範囲のコピーが完了済みかどうか)
+    """
+    progress = plan.checkpoint.get_progress(plan.sheet.logical_name, part) if plan.checkpoint else None
+    if progress is None:
+        return _new_progress(), False
+    done = progress.pop('done')
+    return progress, done
+
+def _build_error_record(plan: TablePlan, row_data, insert_values, e: Exception) -> Dict[str, Any]:
+    """
+    挿入に失敗した行のエラーレコードを作成する（失敗した行だけで呼ばれる）
+    :param row_data: ソースの行データ
+    :param insert_values: 変換後の挿入値
+    :return: 元の値と変換後の値（文字列）、エラー内容のレコード
+    """
+    record = {}
+    for (target_field, source_field, source_index, _), value in zip(plan.column_plan, insert_values):
+        if source_index is not None:
+            # 元の値を記録します
+            record[source_field] = row_data[source_index]
+        record[target_field] = format_error_value(value)
+    record['error_message'] = str(e)
+    record['error_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return record
+
+def _read_batches(source_db, plan: TablePlan, progress: Dict[str, Any],
+                  bounds: Optional[Tuple[Any, Any]] = None, label: str = ''):
+    """
+    ソーステーブルからバッチ単位でデータを読み取るジェネレーター
+    読み取り位置はprogress（最後にコミットしたバッチ）の続きから独自に進める
+    :return: 行リストのジェネレーター
+    """
+    range_condition, range_params = None, []
+    if bounds:
+        range_condition, range_params = build_range_condition(plan.key_columns[0], *bounds)
+    # 差分移行の抽出条件はキー範囲の条件と合わせて指定する
+    if plan.filter_condition:
+        range_condition = " AND ".join(filter(None, [range_condition, plan.filter_condition]))
+        range_params = range_params + plan.filter_params
+    key_indexes = [plan.select_columns.index(column) for column in plan.key_columns]
+    offset = progress['offset']
+    last_key = progress['last_key']
+    batch_number = progress['batches']
+    
+    while True:
+        batch_size = plan.current_batch_size()
+        # ページングクエリを作成
+        if plan.key_columns:
+            select_query = build_keyset_query(plan.sheet.source_name, plan.select_columns, plan.key_columns,
+                                              batch_size, last_key is not None, range_condition, source_db.dialect)
+            params = build_keyset_params(plan.key_columns, last_key) if last_key is not None else []
+            params += range_params
+        else:
+            select_query = build_offset_query(plan.sheet.source_name, plan.select_columns, offset, batch_size,
+                                              range_condition, source_db.dialect)
+            params = range_params
+        batch_number += 1
+        # SQL全文は件数が多くコンソール出力が遅くなるため、DEBUGでのみ出力する
+        logger.debug("  %sバッチ %d 実行中: %s", label, batch_number, select_query)
+        started = time.perf_counter()
+        rows = source_db.fetch_all(select_query, params or None, metrics=plan.metrics)
+        if plan.batch_controller:
+            plan.batch_controller.observe_read(batch_size, len(rows), time.perf_counter() - started)
+        
+        if not rows:
+            return
+        
+        logger.debug("  %s今回のバッチで %d 件のレコードを取得しました", label, len(rows))
+        yield rows
+        
+        offset += len(rows)
+        if plan.key_columns:
+            last_key = tuple(rows[-1][i] for i in key_indexes)
+        
+        # 取得件数がバッチサイズ未満なら最終バッチ
+        if len(rows) < batch_size:
+            return
+
+def _copy_range(source_db, target_db, plan: TablePlan, progress: Dict[str, Any],
+                bounds: Optional[Tuple[Any, Any]] = None, label: str = '', total_count: int = None, part: int = 0):
+    """
+    先頭キー列の範囲内のデータをバッチ単位でコピーする
+    読み取り・変換・書き込みはパイプラインで並行に実行する
+    :param source_db: ソースデータベース接続
+    :param target_db: ターゲットデータベース接続
+    :param plan: テーブルの移行設定
+    :param progress: 進捗状態（途中から再開する場合は前回の状態を渡す）
+    :param bounds: (下限（含まない）, 上限（含む）)、Noneはテーブル全体
+    :param label: 進捗表示の接頭辞
+    :param total_count: 総レコード数（指定時は総進捗を表示）
+    :param part: チェックポイントに記録する範囲番号（逐次コピーの場合は0）
+    """
+    key_indexes = [plan.select_columns.index(column) for column in plan.key_columns]
+    
+    def convert(rows):
+        # 列単位で一括変換する
+        started = time.perf_counter()
+        columns = []
+        for target_field, source_field, source_index, converter in plan.column_plan:
+            if source_index is None:
+                columns.append([converter() for _ in rows])
+            else:
+                columns.append(converter.convert_column([row_data[source_index] for row_data in rows])[0])
+        insert_rows = [list(values) for values in zip(*columns)]  # 一括挿入する値リスト
+        if plan.metrics:
+            plan.metrics.record('convert', time.perf_counter() - started, len(rows))
+        return rows, insert_rows
+    
+    def write(batch):
+        rows, insert_rows = batch
+        error_count = 0  # 現在のバッチのエラー件数
+        
+        def record_error(index, values, e):
+            nonlocal error_count
+            # エラーレコードは失敗した行についてのみ作成する
+            plan.error_sink.record(_build_error_record(plan, rows[index], insert_rows[index], e))
+            error_count += 1
+            # 同じ例外の型のエラーは一定件数を超えると件数だけをまとめて出力する（logger参照）
+            logger.warning("    %sデータの挿入に失敗しました: %s", label, e)
+        
+        # 前回の実行でコミット後・チェックポイント記録前に中断した場合、pending_offsetまでの行は
+        # ターゲットに挿入済みの可能性があるため、アップサートで書き込む
+        pending_offset = progress['pending_offset']
+        replay_count = min(max(pending_offset - progress['offset'], 0), len(rows)) if pending_offset is not None else 0
+        # コミット前に書き込み中のバッチの終了位置を記録する
+        if plan.checkpoint:
+            progress['pending_offset'] = max(pending_offset or 0, progress['offset'] + len(rows))
+            plan.checkpoint.save_progress(plan.sheet.logical_name, progress, part)
+        
+        # 一括挿入を実行する（取得したバッチ単位でコミット）
+        started = time.perf_counter()
+        insert_count = 0
+        if replay_count:
+            if plan.replay_query:
+                logger.info("  %s前回コミット済みの可能性がある %d 件をアップサートします", label, replay_count)
+                insert_count += target_db.bulk_insert(plan.replay_query, insert_rows[:replay_count],
+                                                      batch_size=replay_count, on_error=record_error,
+                                                      metrics=plan.metrics)
+            else:
+                logger.warning("  %s挿入対象にキー列がないため、前回コミット済みの可能性がある %d 件をそのまま挿入します（重複する場合があります）",
+                               label, replay_count)
+                replay_count = 0
+        if replay_count < len(insert_rows):
+            insert_count += target_db.bulk_insert(
+                plan.insert_query, insert_rows[replay_count:], batch_size=max(len(insert_rows) - replay_count, 1),
+                on_error=lambda index, values, e: record_error(index + replay_count, values, e),
+                metrics=plan.metrics)
+        if plan.batch_controller:
+            plan.batch_controller.observe_write(rows, time.perf_counter() - started)
+        logger.debug("    %s%d/%d 件のレコードが挿入されました", label, insert_count, len(rows))
+        
+        progress['processed'] += insert_count
+        progress['errors'] += error_count
+        progress['offset'] += len(rows)
+        if plan.key_columns:
+            progress['last_key'] = tuple(rows[-1][i] for i in key_indexes)
+        progress['batches'] += 1
+        if progress['pending_offset'] is not None and progress['pending_offset'] <= progress['offset']:
+            progress['pending_offset'] = None
+        
+        # コミット済みの位置をチェックポイントに記録する（再開時はこの続きから読み取る）
+        # 記録済みの位置より前のエラーレコードが失われないよう、先にエラーログへ追記する
+        if plan.checkpoint:
+            if error_count:
+                plan.error_sink.flush()
+            plan.checkpoint.save_progress(plan.sheet.logical_name, progress, part)
+        
+        logger.info("  %sバッチ %d 完了、%d 件のレコードが正常に挿入されました", label, progress['batches'], insert_count)
+        if total_count:
+            logger.info("  総進捗: %d/%d (%.2f%%)", progress['processed'], total_count, progress['processed'] / total_count * 100)
+    
+    run_pipeline(_read_batches(source_db, plan, progress, bounds, label), convert, write, plan.queue_size)
+
+def _compute_partition_bounds(source_db, plan: TablePlan, partition_count: int, method: str) -> List[Tuple[Any, Any]]:
+    """
+    先頭キー列の値域をpartition_count個の範囲に分割する
+    :param source_db: ソースデータベース接続
+    :param plan: テーブルの移行設定
+    :param partition_count: 分割数
+    :param method: 'ntile'（NTILEによる等件数分割）または 'minmax'（数値キーの最小値〜最大値を等間隔分割）
+    :return: [(下限（含まない）, 上限（含む）), ...]、先頭の下限と末尾の上限はNone
+    """
+    table_name = plan.sheet.source_name
+    key_column = plan.key_columns[0]
+    upper_bounds = None
+    
+    if method == 'minmax':
+        min_value, max_value = source_db.fetch_all(f"SELECT MIN({key_column}), MAX({key_column}) FROM {table_name}")[0]
+        if isinstance(min_value, int) and not isinstance(min_value, bool):
+            upper_bounds = [min_value + (max_value - min_value) * i // partition_count for i in range(1, partition_count)]
+        elif isinstance(min_value, (float, Decimal)):
+            upper_bounds = [min_value + (max_value - min_value) * i / partition_count for i in range(1, partition_count)]
+        else:
+            logger.warning(f"  キー列 {key_column} が数値型ではないため、NTILEで分割します")
+    
+    if upper_bounds is None:
+        query = (
+            f"SELECT MAX({key_column}) FROM ("
+            f"SELECT {key_column}, NTILE({partition_count}) OVER (ORDER BY {key_column}) AS tile FROM {table_name}"
+            f") t GROUP BY tile ORDER BY tile"
+        )
+        upper_bounds = [row[0] for row in source_db.fetch_all(query)][:-1]
+    
+    # 重複する境界（先頭キー列の値が複数の範囲にまたがる場合）を除外
+    unique_bounds = []
+    for bound in upper_bounds:
+        if not unique_bounds or bound > unique_bounds[-1]:
+            unique_bounds.append(bound)
+    return list(zip([None] + unique_bounds, unique_bounds + [None]))
+
+def _copy_partition(plan: TablePlan, bounds: Tuple[Any, Any], label: str, retries: int, part: int) -> Dict[str, Any]:
+    """
+    1つのキー範囲を専用の接続でコピーし、失敗時は最後にコミットしたバッチの続きから再試行する
+    チェックポイントに記録がある場合は前回の実行の続きからコピーする
+    :return: 範囲の進捗状態
+    """
+    progress, done = _load_progress(plan, part)
+    if done:
+        logger.info(f"  {label}前回の実行で完了済みのためスキップします: {progress['processed']} 件")
+        return progress
+    attempt = 0
+    while True:
+        source_db = DatabaseConnector(is_source=True)
+        target_db = DatabaseConnector(is_source=False)
+        try:
+            _copy_range(source_db, target_db, plan, progress, bounds, label, part=part)
+            if plan.checkpoint:
+                plan.checkpoint.save_progress(plan.sheet.logical_name, progress, part, done=True)
+            logger.info(f"  {label}完了: {progress['processed']} 件")
+            return progress
+        except Exception as e:
+            attempt += 1
+            if attempt > retries:
+                logger.error(f"  {label}再試行回数の上限に達しました: {str(e)}")
+                raise
+            logger.warning(f"  {label}エラーが発生したため再試行します ({attempt}/{retries}): {str(e)}")
+        finally:
+            source_db.close()
+            target_db.close()
+
+def _copy_partitioned(plan: TablePlan, bounds_list: List[Tuple[Any, Any]]) -> Dict[str, Any]:
+    """
+    キー範囲ごとに並列でコピーする
+    :param bounds_list: _compute_partition_boundsで分割したキー範囲リスト
+    :return: 全範囲を合算した進捗状態
+    """
+    retries = int(os.getenv('PARTITION_RETRIES', '3'))
+    logger.info(f"  {len(bounds_list)} 個のキー範囲で並列コピーします")
+    
+    with ThreadPoolExecutor(max_workers=len(bounds_list), thread_name_prefix='partition') as executor:
+        futures = [
+            executor.submit(_copy_partition, plan, bounds, f"[範囲 {i}/{len(bounds_list)}] ", retries, i)
+            for i, bounds in enumerate(bounds_list, 1)
+        ]
+        partition_progress = [future.result() for future in futures]
+    
+    total = _new_progress()
+    for progress in partition_progress:
+        for key in ('processed', 'errors', 'batches'):
+            total[key] += progress[key]
+    return total
+
+def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db, sheets: List[MigrationSheet],
+                                 resume: bool = False, incremental: bool = False):
     """
     一対一のデータ移行を実行する
     :param excel_path: Excelファイルのパス
@@ -48,32 +417,49 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
     :param source_db: ソースデータベース接続
     :param target_db: ターゲットデータベース接続
     :param sheets: 移行するテーブルの設定リスト
+    :param resume: チェックポイントに記録された最後のコミット済みバッチの続きから再開するかどうか
+    :param incremental: 前回のハイウォーターマークより後に更新された行だけを抽出してアップサートするかどうか
+    :return: 論理名ごとの挿入件数
     """
+    results = {}
+    # コミット済みバッチごとの進捗を記録するチェックポイントストア
+    checkpoint = CheckpointStore(os.getenv('CHECKPOINT_FILE', 'migration_checkpoint.db'))
+    error_sink = None
     try:
         # 1回の読み取りデータ数、デフォルトは1000
         batch_size = int(os.getenv('READ_NUM', '1000'))
-        print(f"バッチごとの処理データ数: {batch_size}")
+        logger.info(f"バッチごとの処理データ数: {batch_size}")
+        
+        # ページング方式（keyset: キー列によるシーク、offset: OFFSET/FETCH）
+        paging_mode = os.getenv('PAGING_MODE', 'keyset').lower()
+        
+        # 読み取り・変換・書き込みパイプラインの段間キューの大きさ（0の場合は逐次実行）
+        queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', '2'))
+        
+        # テーブル内の範囲並列コピーの分割数（1の場合は逐次コピー）
+        partition_count = int(os.getenv('PARTITION_COUNT', '1'))
         
         # 创建错误日志目录
         error_log_dir = Path("error_logs")
         error_log_dir.mkdir(exist_ok=True)
         
         for sheet in sheets:
-            print(f"\nテーブル {sheet.logical_name} を処理中:")
-            print(f"ソーステーブル {sheet.source_name} からターゲットテーブル {sheet.physical_name} へ")
+            logger.info(f"テーブル {sheet.logical_name} を処理中:")
+            logger.info(f"ソーステーブル {sheet.source_name} からターゲットテーブル {sheet.physical_name} へ")
             
             # 为每个表创建错误日志文件
-            error_log_file = error_log_dir / f"error_log_{sheet.source_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            error_records = []
+            error_sink = ErrorSink(error_log_dir / f"error_log_{sheet.source_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
             
             # フィールドマッピングのシートを読み込む
-            df = pd.read_excel(excel_path, sheet_name=sheet.logical_name)
+            df = parser.get_sheet(sheet.logical_name)
             
             # フィールドマッピングの作成
             select_fields = {}  # SELECT文用のフィールド
             insert_fields = {}  # INSERT文用のフィールド
             merge_fields = {}  # デフォルト値を処理するフィールド
             type_conversion_mapping = {}  # 型変換のマッピング
+            declared_key_columns = []  # マッピングシートで宣言されたキー列
+            watermark_columns = []  # マッピングシートで宣言されたウォーターマーク列（差分移行用）
             
             for _, row in df.iterrows():
                 target_field = str(row.get('次期Type物理名'))
@@ -86,6 +472,12 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
                 if is_select:
                     select_fields[source_field] = target_field
                 
+                if str(row.get('Key', '')).upper() == 'Y':
+                    declared_key_columns.append(source_field)
+                
+                if str(row.get('Watermark', '')).upper() == 'Y':
+                    watermark_columns.append(source_field)
+                
                 if is_transform:
                     insert_fields[target_field] = None  # 後で値を埋める
                     # 型変換ルールを追加
@@ -99,129 +491,165 @@ def execute_one_to_one_migration(excel_path: str, parser, source_db, target_db,
                     merge_fields[target_field] = default_value
             
             if not select_fields:
-                print("  警告: クエリするフィールドが見つかりませんでした")
+                logger.warning("  クエリするフィールドが見つかりませんでした")
                 continue
                 
             if not insert_fields:
-                print("  警告: 挿入するフィールドが見つかりませんでした")
+                logger.warning("  挿入するフィールドが見つかりませんでした")
                 continue
             
             # INSERT文の準備
             insert_fields_list = list(insert_fields.keys())
             insert_query = f"INSERT INTO {sheet.physical_name} ({', '.join(insert_fields_list)}) VALUES ({', '.join(['?' for _ in insert_fields_list])})"
             
+            # テーブルのキー列（マッピングシートの宣言を優先し、なければ主キー/クラスター化インデックス）
+            # 宣言されたキー列が一意でない、またはNULLを含む場合は主キー/クラスター化インデックスを使う
+            table_key_columns = []
+            if declared_key_columns:
+                if _check_key_columns(source_db, sheet.source_name, declared_key_columns):
+                    table_key_columns = declared_key_columns
+            if not table_key_columns:
+                table_key_columns = source_db.get_key_columns(sheet.source_name)
+                if table_key_columns and not _check_key_columns(source_db, sheet.source_name, table_key_columns,
+                                                                 check_unique=False):
+                    table_key_columns = []
+            
+            # 差分移行の設定（マッピングシートでウォーターマーク列が宣言されている場合）
+            # 今回の上限は抽出前に確定し、成功後に次回の下限として記録する（全件移行時も記録する）
+            filter_condition, filter_params = None, []
+            if watermark_columns:
+                watermark_expression = build_watermark_expression(watermark_columns)
+                watermark_state = checkpoint.get_watermark(sheet.logical_name) or {'watermark': None, 'pending': None}
+                if resume and watermark_state['pending'] is not None:
+                    high_watermark = watermark_state['pending']
+                else:
+                    high_watermark = source_db.fetch_all(f"SELECT MAX({watermark_expression}) FROM {sheet.source_name}")[0][0]
+                    checkpoint.set_pending_watermark(sheet.logical_name, high_watermark)
+                low_watermark = watermark_state['watermark'] if incremental else None
+                if low_watermark is not None:
+                    filter_condition, filter_params = build_watermark_condition(watermark_expression, low_watermark, high_watermark)
+                    logger.info(f"  差分移行: {watermark_expression} が {low_watermark} より後、{high_watermark} 以下の行を抽出します")
+                    # 差分は既存行を更新するためアップサートする
+                    match_fields = [select_fields.get(column) for column in table_key_columns]
+                    if not match_fields or any(field not in insert_fields for field in match_fields):
+                        raise ValueError(f"差分移行には挿入対象に含まれるキー列が必要です: {sheet.logical_name}")
+                    insert_query = build_upsert_query(sheet.physical_name, insert_fields_list, match_fields, target_db.dialect)
+                elif incremental:
+                    logger.warning("  前回のハイウォーターマークがないため全件を移行します")
+            elif incremental:
+                logger.warning("  ウォーターマーク列が宣言されていないため全件を移行します")
+            
+            # 移行方式（差分移行の抽出条件がある場合のみincremental、再開時は前回と同じ方式であることを確認する）
+            migration_mode = 'incremental' if filter_condition else 'full'
+            
+            # 再開時に前回コミット済みか不明なバッチを書き込むアップサート文（挿入対象にキー列が含まれる場合のみ）
+            replay_query = None
+            if filter_condition:
+                replay_query = insert_query
+            else:
+                match_fields = [select_fields.get(column) for column in table_key_columns]
+                if match_fields and all(field in insert_fields for field in match_fields):
+                    replay_query = build_upsert_query(sheet.physical_name, insert_fields_list, match_fields, target_db.dialect)
+            
             # 総レコード数の取得
             count_query = f"SELECT COUNT(*) as total FROM {sheet.source_name}"
-            total_count = source_db.fetch_all(count_query)[0][0]
-            print(f"  ソーステーブルの総レコード数: {total_count}")
+            if filter_condition:
+                count_query += f" WHERE {filter_condition}"
+            total_count = source_db.fetch_all(count_query, filter_params or None)[0][0]
+            logger.info(f"  ソーステーブルの総レコード数: {total_count}")
             
             if total_count == 0:
-                print(f"  警告: ソーステーブル {sheet.source_name} にデータがありません")
+                logger.warning(f"  ソーステーブル {sheet.source_name} にデータがありません")
+                checkpoint.commit_watermark(sheet.logical_name)
                 continue
             
-            # バッチ処理
-            offset = 0
-            processed_count = 0
-            batch_count = 0
-            error_count = 0
-            
-            while offset < total_count:
-                # ページングクエリを作成
-                select_query = f"SELECT {', '.join(select_fields.keys())} FROM {sheet.source_name} ORDER BY (SELECT NULL) OFFSET {offset} ROWS FETCH NEXT {batch_size} ROWS ONLY"
-                print(f"  バッチ {batch_count + 1} 実行中: {select_query}")
-                rows = source_db.fetch_all(select_query)
-                
-                if not rows:
-                    break
-                
-                print(f"  今回のバッチで {len(rows)} 件のレコードを取得しました")
-                
-                # 各行データを処理
-                insert_count = 0
-                batch_error_records = []  # 現在のバッチのエラーレコード
-                
-                for row_data in rows:
-                    insert_values = []
-                    row_dict = {}  # エラーログの行データ
-                    
-                    try:
-                        for target_field in insert_fields_list:
-                            # フィールドにマージ処理が必要な場合
-                            if target_field in merge_fields:
-                                value = process_default_value(merge_fields[target_field])
-                            else:
-                                # クエリ結果から対応する値を取得
-                                source_field = next((k for k, v in select_fields.items() if v == target_field), None)
-                                if source_field:
-                                    value = row_data[list(select_fields.keys()).index(source_field)]
-                                    # 元の値を記録します
-                                    row_dict[source_field] = value
-                                    # 型変換を適用
-                                    conversion_rule = type_conversion_mapping.get(source_field)
-                                    if conversion_rule:
-                                        value = convert_type(value, conversion_rule)
-                                else:
-                                    value = None
-                            
-                            # 値を文字列形式に変換する
-                            if value is None:
-                                row_dict[target_field] = ''
-                            elif isinstance(value, datetime.datetime):
-                                row_dict[target_field] = value.strftime('%Y-%m-%d %H:%M:%S')
-                            elif isinstance(value, datetime.date):
-                                row_dict[target_field] = value.strftime('%Y-%m-%d')
-                            else:
-                                row_dict[target_field] = str(value)
-                            
-                            insert_values.append(value)
-                        
-                        target_db.execute_query(insert_query, insert_values)
-                        insert_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        row_dict['error_message'] = str(e)
-                        row_dict['error_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        batch_error_records.append(row_dict)
-                        print(f"    データの挿入に失敗しました: {str(e)}")
-                        # target_db.rollback()
-                        continue
-                    
-                    # 100件のレコードごとに1回送信
-                    if insert_count % 100 == 0:
-                        target_db.commit()
-                        print(f"    {insert_count}/{len(rows)} 件のレコードが挿入されました")
-                
-                # 残りのトランザクションをコミットする
-                target_db.commit()
-                
-                # エラーデータをログに記録する
-                if batch_error_records:
-                    error_records.extend(batch_error_records)
-                    # 最初のデータバッチの場合は、ヘッダーを書き込む必要があります
-                    write_header = not error_log_file.exists()
-                    with open(error_log_file, 'a', newline='', encoding='utf-8') as f:
-                        writer = csv.DictWriter(f, fieldnames=batch_error_records[0].keys())
-                        if write_header:
-                            writer.writeheader()
-                        writer.writerows(batch_error_records)
-                
-                processed_count += insert_count
-                offset += batch_size
-                batch_count += 1
-                
-                print(f"  バッチ {batch_count} 完了、{insert_count} 件のレコードが正常に挿入されました")
-                print(f"  総進捗: {processed_count}/{total_count} ({(processed_count/total_count*100):.2f}%)")
+            # ページングに使うキー列の決定
+            key_columns = []
+            if paging_mode == 'keyset':
+                key_columns = table_key_columns
+                if key_columns:
+                    logger.info(f"  キーセットページングを使用します。キー列: {', '.join(key_columns)}")
+                else:
+                    logger.warning(f"  {sheet.source_name} のキー列が見つからないため、OFFSETページングを使用します")
+            
+            # SELECT対象の列（キー列がSELECT対象外の場合は末尾に追加）
+            select_columns = list(select_fields.keys())
+            select_columns += [column for column in key_columns if column not in select_fields]
+            
+            plan = TablePlan(
+                sheet=sheet,
+                column_plan=_compile_column_plan(insert_fields_list, select_fields, merge_fields, type_conversion_mapping),
+                select_columns=select_columns,
+                key_columns=key_columns,
+                insert_query=insert_query,
+                batch_size=batch_size,
+                queue_size=queue_size,
+                error_sink=error_sink,
+                checkpoint=checkpoint,
+                filter_condition=filter_condition,
+                filter_params=filter_params,
+                batch_controller=create_batch_controller(batch_size),
+                metrics=RUN_METRICS.table(sheet.logical_name),
+                replay_query=replay_query
+            )
+            
+            # 再開時は前回のチェックポイントを使用する（キー範囲の分割も前回と同じにする）
+            state = checkpoint.get_table(sheet.logical_name) if resume else None
+            if state is not None:
+                if state['key_columns'] != key_columns:
+                    raise ValueError(
+                        f"キー列が前回の実行 ({', '.join(state['key_columns']) or 'OFFSET'}) と異なるため再開できません: {sheet.logical_name}"
+                    )
+                if state['mode'] != migration_mode:
+                    raise ValueError(
+                        f"移行方式が前回の実行 ({state['mode']}) と異なるため再開できません"
+                        f"（{'--incremental を付けて' if state['mode'] == 'incremental' else '--incremental を付けずに'}再開してください）: {sheet.logical_name}"
+                    )
+                if state['status'] == 'done':
+                    logger.info("  前回の実行で移行済みのためスキップします")
+                    checkpoint.commit_watermark(sheet.logical_name)
+                    results[sheet.logical_name] = 0
+                    continue
+                bounds_list = state['bounds']
+                logger.info("  チェックポイントから再開します")
+            else:
+                bounds_list = None
+                if partition_count > 1 and key_columns:
+                    method = os.getenv('PARTITION_METHOD', 'ntile').lower()
+                    bounds_list = _compute_partition_bounds(source_db, plan, partition_count, method)
+                    logger.info(f"  {len(bounds_list)} 個のキー範囲に分割しました（分割方式: {method}）")
+                checkpoint.start_table(sheet.logical_name, key_columns, bounds_list, migration_mode)
+            
+            # バッチ処理（キー列がある場合は範囲分割して並列コピー可能）
+            if bounds_list:
+                progress = _copy_partitioned(plan, bounds_list)
+            else:
+                progress, _ = _load_progress(plan)
+                if progress['batches']:
+                    logger.info(f"  バッチ {progress['batches']} まで（{progress['processed']} 件）コミット済みのため、その続きから読み取ります")
+                _copy_range(source_db, target_db, plan, progress, total_count=total_count)
+                checkpoint.save_progress(sheet.logical_name, progress, done=True)
+            checkpoint.finish_table(sheet.logical_name)
+            checkpoint.commit_watermark(sheet.logical_name)
             
-            print(f"  移行が完了しました:")
-            print(f"    処理済みレコード数: {processed_count}")
-            print(f"    エラーレコード数: {error_count}")
-            print(f"    バッチ数: {batch_count}")
-            if error_count > 0:
-                print(f"    エラーログファイル: {error_log_file}")
+            logger.info(f"  移行が完了しました:")
+            logger.info(f"    処理済みレコード数: {progress['processed']}")
+            logger.info(f"    エラーレコード数: {progress['errors']}")
+            logger.info(f"    バッチ数: {progress['batches']}")
+            hits, misses = get_cache_stats([converter for _, _, _, converter in plan.column_plan])
+            logger.info(f"    変換キャッシュ: ヒット {hits} 件, ミス {misses} 件")
+            if plan.batch_controller:
+                logger.info(f"    バッチサイズ: {plan.batch_controller.summary()}")
+            error_sink.close()
+            if progress['errors'] > 0:
+                logger.info(f"    エラーログファイル: {error_sink.path}")
+            results[sheet.logical_name] = progress['processed']
             
     except Exception as e:
-        print(f"一対一移行中にエラーが発生しました: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"一対一移行中にエラーが発生しました: {str(e)}")
         raise
+    finally:
+        if error_sink:
+            error_sink.close()
+        checkpoint.close()
+    return results
\ No newline at end of file
@@ -1,18 +1,41 @@
 import pandas as pd
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import datetime
 from pathlib import Path
-from util import convert_type
+from util import compile_converter
 import os
 import glob
+import fnmatch
+import re
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from db_connector import DatabaseConnector
 import sys
 from excel_parser import ExcelParser, MigrationSheet
+from error_sink import ErrorSink, format_error_value
+from config import FETCH_CHUNK_SIZE, MIGRATION_WORKERS
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 # エラーログディレクトリを定義
 ERROR_LOG_DIR = Path("error_logs")
+# 復旧済みのエラーログの移動先
+RECOVERED_DIR = ERROR_LOG_DIR / "recovered"
+# 処理途中のエラーログの進捗ファイル（<エラーログ名>.progress、コミット済みの行数を記録する）
+PROGRESS_SUFFIX = ".progress"
+
+def error_file_pattern(source_table: str = None) -> re.Pattern:
+    """
+    エラーログのファイル名（error_log_<テーブル名>_[recover_]<日時>.csv[.gz]）に一致する正規表現
+    テーブル名を指定した場合、名前がそのテーブル名で始まる別のテーブル（dbo.T1に対するdbo.T1_EXTRAなど）のログには一致しない
+    :param source_table: ソーステーブル名（省略時はすべてのテーブル）
+    """
+    table = re.escape(source_table) if source_table else r'.+'
+    return re.compile(rf'^error_log_{table}_(recover_)?\d{{8}}_\d{{6}}\.csv(\.gz)?$')
 
 def process_default_value(default_config: str) -> Any:
     """
@@ -42,7 +65,7 @@ def process_default_value(default_config: str) -> Any:
     except json.JSONDecodeError:
         return default_config
     except Exception as e:
-        print(f"デフォルト値処理中にエラーが発生しました: {str(e)}")
+        logger.error(f"デフォルト値処理中にエラーが発生しました: {str(e)}")
         return None
 
 def get_error_files(source_table: str = None) -> List[Path]:
@@ -54,148 +77,324 @@ def get_error_files(source_table: str = None) -> List[Path]:
     if not ERROR_LOG_DIR.exists():
         return []
     
-    if source_table:
-        pattern = f"error_log_{source_table}_*.csv"
-    else:
-        pattern = "error_log_*.csv"
+    # 圧縮されたエラーログ（.csv.gz）も対象にする
+    pattern = error_file_pattern(source_table)
+    files = [file for file in ERROR_LOG_DIR.glob("error_log_*") if pattern.match(file.name)]
+    return sorted(files, key=lambda x: x.stat().st_mtime, reverse=True)
+
+def _progress_file(error_file: Path) -> Path:
+    return error_file.with_name(error_file.name + PROGRESS_SUFFIX)
+
+def load_recover_progress(error_file: Path) -> int:
+    """
+    前回の実行でコミット済みの行数を取得する（途中で失敗したファイルの再実行時に二重挿入しないため）
+    :param error_file: エラーログファイルのパス
+    :return: 先頭から読み飛ばす行数
+    """
+    progress_file = _progress_file(error_file)
+    if not progress_file.exists():
+        return 0
+    return int(json.loads(progress_file.read_text(encoding='utf-8'))['rows'])
+
+def save_recover_progress(error_file: Path, rows: int):
+    """
+    コミット済みの行数を進捗ファイルに記録する（一時ファイルに書いてから置き換える）
+    :param error_file: エラーログファイルのパス
+    :param rows: 先頭からコミット済みの行数
+    """
+    progress_file = _progress_file(error_file)
+    temp_file = progress_file.with_name(progress_file.name + ".tmp")
+    temp_file.write_text(json.dumps({'rows': rows}), encoding='utf-8')
+    temp_file.replace(progress_file)
+
+def finish_recover(error_file: Path):
+    """
+    処理が完了したエラーログをrecoveredディレクトリへ移動し、進捗ファイルを削除する
+    :param error_file: エラーログファイルのパス
+    """
+    RECOVERED_DIR.mkdir(parents=True, exist_ok=True)
+    error_file.replace(RECOVERED_DIR / error_file.name)
+    _progress_file(error_file).unlink(missing_ok=True)
+
+def resolve_mapping_names(parser: ExcelParser, patterns: List[str]) -> List[str]:
+    """
+    マッピング名またはワイルドカード（例: dbo.K_*）に一致するマッピング名を取得する
+    :param parser: Excelパーサーインスタンス
+    :param patterns: マッピング名（次期DB物理名）またはワイルドカードのリスト
+    :return: 一致したマッピング名のリスト（重複なし、指定順）
+    """
+    mapping_names = [str(name) for name in parser.get_sheet('マッピング一覧')['次期DB物理名'].dropna()]
+    matched = []
+    for pattern in patterns:
+        names = fnmatch.filter(mapping_names, pattern)
+        if not names:
+            logger.warning(f"マッピング名 '{pattern}' に一致する設定が見つかりません")
+        for name in names:
+            if name not in matched:
+                matched.append(name)
+    return matched
+
+def build_recover_plan(parser: ExcelParser, sheet_name: str, target_table: str) -> Tuple[str, List[Tuple[str, Any, Any]]]:
+    """
+    フィールドマッピングから復旧用のINSERT文と列ごとの変換プランを作成する
+    :param parser: Excelパーサーインスタンス
+    :param sheet_name: 対応するシート名
+    :param target_table: ターゲットテーブル名
+    :return: (INSERT文, [(ターゲットフィールド, ソースフィールド, 変換関数またはデフォルト値設定), ...])
+             ソースフィールドがNoneの列はデフォルト値設定をprocess_default_valueで評価する
+    """
+    mapping_df = parser.get_sheet(sheet_name)
+    
+    # フィールドマッピングの作成
+    select_fields = {}  # SELECT文用のフィールド
+    insert_fields = {}  # INSERT文用のフィールド
+    merge_fields = {}  # デフォルト値を処理するフィールド
+    type_conversion_mapping = {}  # 型変換のマッピング
+    
+    for _, row in mapping_df.iterrows():
+        target_field = str(row.get('次期Type物理名'))
+        source_field = str(row.get('現行Type物理名'))
+        is_transform = str(row.get('Transform', '')).upper() == 'Y'
+        is_merge = str(row.get('Merge', '')).upper() == 'Y'
+        default_value = row.get('デフォルト')
+
+        if is_transform:
+            select_fields[target_field] = source_field
+            insert_fields[target_field] = None
+            type_conversion_mapping[source_field] = {
+                'data_type': str(row.get('データ型', '')),
+                'not_null': str(row.get('Not Null', '')).upper() == 'Y',
+                'default_value': row.get('デフォルト')
+            }
+            
+        if is_merge and not pd.isna(default_value):
+            merge_fields[target_field] = default_value
+    
+    # INSERT文の準備
+    insert_fields_list = list(insert_fields.keys())
+    insert_query = f"INSERT INTO {target_table} ({', '.join(insert_fields_list)}) VALUES ({', '.join(['?' for _ in insert_fields_list])})"
     
-    return sorted(ERROR_LOG_DIR.glob(pattern), key=lambda x: x.stat().st_mtime, reverse=True)
+    column_plan = []
+    for target_field in insert_fields_list:
+        if target_field in merge_fields:
+            column_plan.append((target_field, None, merge_fields[target_field]))
+        else:
+            source_field = select_fields[target_field]
+            column_plan.append((target_field, source_field, compile_converter(type_conversion_mapping.get(source_field))))
+    return insert_query, column_plan
 
-def recover_data(excel_path: str, target_db, error_file: Path, sheet_name: str, target_sheet: MigrationSheet):
+def recover_data(excel_path: str, target_db, error_file: Path, sheet_name: str, target_sheet: MigrationSheet,
+                 parser: ExcelParser = None, error_sink: ErrorSink = None, chunk_size: int = None) -> Tuple[int, int, int]:
     """
     エラーログファイルからデータを復旧する
+    ファイルはチャンク単位で読み込み、列単位で変換して一括挿入する
+    チャンクごとにコミットしてコミット済みの行数を進捗ファイルに記録し、途中で失敗したファイルは次回その続きから処理する
+    （コミットと進捗ファイルの記録の間で異常終了した場合は、最後のチャンクが再挿入される）
     :param excel_path: Excelマッピングファイルのパス
     :param target_db: ターゲットデータベース接続
     :param error_file: エラーログファイルのパス
     :param sheet_name: 対応するシート名
+    :param target_sheet: 対応するテーブル設定
+    :param parser: Excelパーサーインスタンス（省略時はexcel_pathから作成）
+    :param error_sink: 再び失敗したレコードの出力先（省略時はファイルごとに新しいエラーログを作成）
+    :param chunk_size: 1回に読み込む行数（省略時はFETCH_CHUNK_SIZE）
+    :return: (総レコード数, 成功件数, 新しいエラー数)
     """
     try:
-        print(f"\nエラーデータファイルの処理を開始: {error_file}")
+        logger.info(f"エラーデータファイルの処理を開始: {error_file}")
         
-        # エラーデータの読み込み
-        error_df = pd.read_csv(error_file, encoding='utf-8')  # shift-jisエンコードでファイルを読み込み
-        total_errors = len(error_df)
-        print(f"エラー記録は {total_errors} 件です")
+        parser = parser or ExcelParser(excel_path)
+        target_table = target_sheet.physical_name
+        insert_query, column_plan = build_recover_plan(parser, sheet_name, target_table)
         
-        if total_errors == 0:
-            return
+        own_sink = error_sink is None
+        if own_sink:
+            error_sink = ErrorSink(ERROR_LOG_DIR / f"error_log_{target_sheet.source_name}_recover_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
         
-        # フィールドマッピング設定を読み込む
-        mapping_df = pd.read_excel(excel_path, sheet_name=sheet_name)
-        
-        # フィールドマッピングの作成
-        select_fields = {}  # SELECT文用のフィールド
-        insert_fields = {}  # INSERT文用のフィールド
-        merge_fields = {}  # デフォルト値を処理するフィールド
-        type_conversion_mapping = {}  # 型変換のマッピング
-        
-        for _, row in mapping_df.iterrows():
-            target_field = str(row.get('次期Type物理名'))
-            source_field = str(row.get('現行Type物理名'))
-            is_select = str(row.get('Select', '')).upper() == 'Y'
-            is_transform = str(row.get('Transform', '')).upper() == 'Y'
-            is_merge = str(row.get('Merge', '')).upper() == 'Y'
-            default_value = row.get('デフォルト')
-
-            if is_transform:
-                select_fields[target_field] = source_field
-
-            if is_transform:
-                insert_fields[target_field] = None
-                type_conversion_mapping[source_field] = {
-                    'data_type': str(row.get('データ型', '')),
-                    'not_null': str(row.get('Not Null', '')).upper() == 'Y',
-                    'default_value': row.get('デフォルト')
-                }
-                
-            if is_merge and not pd.isna(default_value):
-                merge_fields[target_field] = default_value
-        
-        # INSERT文の準備
-        target_table = target_sheet.physical_name  # ファイル名からターゲットテーブル名を取得
-        insert_fields_list = list(insert_fields.keys())
-        insert_query = f"INSERT INTO {target_table} ({', '.join(insert_fields_list)}) VALUES ({', '.join(['?' for _ in insert_fields_list])})"
-        
-        # 各エラー記録を処理
+        total_errors = 0
         success_count = 0
-        new_error_records = []
+        new_error_count = 0
         
-        for index, row in error_df.iterrows():
-            try:
-                insert_values = []
-                row_dict = {}
-                
-                for target_field in insert_fields_list:
-                    if target_field in merge_fields:
-                        value = process_default_value(merge_fields[target_field])
-                    else:
-                        # エラーレコードから元の値を取得
-                        source_field = select_fields[target_field]
-                        if source_field:
-                            value = row[source_field]
-                            row_dict[source_field] = value
-                            # 型変換を適用
-                            conversion_rule = type_conversion_mapping.get(source_field)
-                            if conversion_rule:
-                                value = convert_type(value, conversion_rule)
-                        else:
-                            value = None
-                    
-                    insert_values.append(value)
-                    row_dict[target_field] = value
-                
-                target_db.execute_query(insert_query, insert_values)
-                success_count += 1
-                
-                # 100件ごとにコミット
-                if success_count % 100 == 0:
-                    target_db.commit()
-                    print(f"成功した処理: {success_count}/{total_errors} 件")
-                
-            except Exception as e:
-                row_dict['error_message'] = str(e)
-                row_dict['error_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                new_error_records.append(row_dict)
-                print(f"レコード {index + 1} の処理に失敗しました: {str(e)}")
-                continue
-        
-        # 残りのトランザクションをコミット
-        target_db.commit()
-        
-        # 新しいエラーレコードがあれば、新しいエラーログファイルに保存
-        if new_error_records:
-            new_error_file = ERROR_LOG_DIR / f"error_log_{target_table}_recover_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            pd.DataFrame(new_error_records).to_csv(new_error_file, index=False)
-            print(f"新しいエラーレコードは以下に保存されました: {new_error_file}")
-        
-        print(f"\n復旧処理が完了しました: ")
-        print(f"  総レコード数: {total_errors}")
-        print(f"  成功した処理: {success_count}")
-        print(f"  新しいエラー数: {len(new_error_records)}")
+        # 前回の実行でコミット済みの行は読み飛ばす（ヘッダー行は残す）
+        committed_rows = load_recover_progress(error_file)
+        if committed_rows:
+            logger.info(f"  前回の実行で {committed_rows} 行までコミット済みのため、その続きから処理します")
+        
+        # エラーデータをチャンク単位で読み込む（値は文字列のまま読み込み、型変換はマッピングに従う）
+        for chunk in pd.read_csv(error_file, encoding='utf-8', dtype=str, chunksize=chunk_size or FETCH_CHUNK_SIZE,
+                                 skiprows=range(1, committed_rows + 1) if committed_rows else None):
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            
+            # 列単位で一括変換する
+            columns = []
+            for target_field, source_field, converter in column_plan:
+                if source_field is None:
+                    columns.append([process_default_value(converter) for _ in range(len(chunk))])
+                else:
+                    columns.append(converter.convert_column(chunk[source_field].to_numpy(dtype=object))[0])
+            insert_rows = [list(values) for values in zip(*columns)]
+            
+            def record_error(index, values, e):
+                nonlocal new_error_count
+                # エラーレコードは失敗した行についてのみ作成する
+                record = {}
+                for (target_field, source_field, _), value in zip(column_plan, values):
+                    if source_field is not None:
+                        record[source_field] = chunk[source_field].iat[index]
+                    record[target_field] = format_error_value(value)
+                record['error_message'] = str(e)
+                record['error_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                error_sink.record(record)
+                new_error_count += 1
+            
+            # 一括挿入を実行（チャンク全体を1回でコミットし、失敗したバッチは二分割して不正な行だけを除外）
+            success_count += target_db.bulk_insert(insert_query, insert_rows, batch_size=max(len(insert_rows), 1),
+                                                   on_error=record_error)
+            total_errors += len(chunk)
+            
+            # 記録済みの位置より前のエラーレコードが失われないよう、先にエラーログへ追記してから進捗を記録する
+            error_sink.flush()
+            save_recover_progress(error_file, committed_rows + total_errors)
+            logger.info("  %s: %d 件処理済み（成功 %d 件）", error_file.name, committed_rows + total_errors, success_count)
+        
+        if own_sink:
+            error_sink.close()
+            if new_error_count:
+                logger.info(f"新しいエラーレコードは以下に保存されました: {error_sink.path}")
+        else:
+            error_sink.flush()
+        
+        logger.info(f"復旧処理が完了しました: {error_file.name}")
+        logger.info(f"  総レコード数: {total_errors}")
+        logger.info(f"  成功した処理: {success_count}")
+        logger.info(f"  新しいエラー数: {new_error_count}")
+        return total_errors, success_count, new_error_count
         
     except Exception as e:
-        print(f"エラーデータ処理中に例外が発生しました: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"エラーデータ処理中に例外が発生しました: {str(e)}")
         raise
 
+def recover_all(excel_path: str, patterns: List[str], workers: int = None, chunk_size: int = None) -> bool:
+    """
+    マッピング名（ワイルドカード可）に対応するすべてのエラーログを並列に復旧する
+    再び失敗したレコードはマッピングごとに1つのエラーログにまとめ、
+    処理が完了したエラーログはrecoveredディレクトリへ移動する（再実行時に二重挿入しないため）
+    :param excel_path: Excelマッピングファイルのパス
+    :param patterns: マッピング名またはワイルドカードのリスト
+    :param workers: 同時に処理するファイル数（省略時はMIGRATION_WORKERS）
+    :param chunk_size: 1回に読み込む行数（省略時はFETCH_CHUNK_SIZE）
+    :return: すべてのファイルの処理に成功したかどうか
+    """
+    parser = ExcelParser(excel_path)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    # 処理対象のファイルを収集（同じファイルは一度だけ処理する）
+    tasks = []
+    sinks = []
+    seen_files = set()
+    for mapping_name in resolve_mapping_names(parser, patterns):
+        target_sheet = parser.parse_mapping_data_to_run(mapping_name)
+        error_files = [file for file in get_error_files(target_sheet.source_name) if file not in seen_files]
+        if not error_files:
+            logger.warning(f"テーブル '{target_sheet.source_name}' のエラーログファイルが見つかりません")
+            continue
+        seen_files.update(error_files)
+        error_sink = ErrorSink(ERROR_LOG_DIR / f"error_log_{target_sheet.source_name}_recover_{timestamp}.csv")
+        sinks.append(error_sink)
+        tasks.extend((target_sheet, error_file, error_sink) for error_file in error_files)
+    
+    if not tasks:
+        logger.info("処理するエラーログファイルがありません")
+        return True
+    
+    workers = workers or MIGRATION_WORKERS
+    logger.info(f"{len(tasks)} 個のエラーログファイルを {workers} 並列で処理します")
+    local = threading.local()
+    connections = []
+    lock = threading.Lock()
+    
+    def process(task):
+        target_sheet, error_file, error_sink = task
+        # ワーカースレッドごとに専用のターゲット接続を使う
+        if getattr(local, 'target_db', None) is None:
+            local.target_db = DatabaseConnector(is_source=False)
+            with lock:
+                connections.append(local.target_db)
+        try:
+            result = recover_data(excel_path, local.target_db, error_file, target_sheet.logical_name, target_sheet,
+                                  parser, error_sink, chunk_size)
+        except Exception:
+            # 接続が切れている可能性があるため破棄し、このスレッドの次のファイルでは再接続させる
+            try:
+                local.target_db.close()
+            except Exception:
+                pass
+            local.target_db = None
+            raise
+        finish_recover(error_file)
+        return result
+    
+    totals = [0, 0, 0]
+    failed_files = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recover') as executor:
+            futures = {executor.submit(process, task): task for task in tasks}
+            for future in as_completed(futures):
+                error_file = futures[future][1]
+                try:
+                    for i, count in enumerate(future.result()):
+                        totals[i] += count
+                except Exception as e:
+                    failed_files.append((error_file, str(e)))
+    finally:
+        for error_sink in sinks:
+            error_sink.close()
+        for db in connections:
+            db.close()
+    
+    logger.info("=== 復旧結果サマリー ===")
+    logger.info(f"  処理ファイル数: {len(tasks) - len(failed_files)}/{len(tasks)}")
+    logger.info(f"  総レコード数: {totals[0]}")
+    logger.info(f"  成功した処理: {totals[1]}")
+    logger.info(f"  新しいエラー数: {totals[2]}")
+    for error_sink in sinks:
+        if error_sink.count:
+            logger.info(f"  新しいエラーログファイル: {error_sink.path}")
+    for error_file, error in failed_files:
+        logger.error(f"  失敗したファイル: {error_file.name} - {error}")
+    return not failed_files
+
+def main_cli():
+    """
+    コマンドラインで指定したマッピングのエラーログを対話なしで復旧する
+    """
+    load_dotenv()
+    arg_parser = argparse.ArgumentParser(description="エラーログファイルからデータを復旧する")
+    arg_parser.add_argument('mappings', nargs='+', help="マッピング名（次期DB物理名、ワイルドカード可 例: 'dbo.K_*'）")
+    arg_parser.add_argument('--excel', default="数据移行2.xlsx", help="Excelマッピングファイルのパス")
+    arg_parser.add_argument('--workers', type=int, default=MIGRATION_WORKERS, help="同時に処理するファイル数")
+    arg_parser.add_argument('--chunk-size', type=int, default=FETCH_CHUNK_SIZE, help="1回に読み込む行数")
+    args = arg_parser.parse_args()
+    if not recover_all(args.excel, args.mappings, args.workers, args.chunk_size):
+        sys.exit(1)
+
 def main():
     """
-    メイン関数
+    メイン関数（対話形式で1つのエラーログファイルを選択して復旧する）
     """
     try:
         # 環境変数を読み込む
         load_dotenv()
         
         # データベース接続の作成
-        print("\nデータベースに接続中...")
+        logger.info("データベースに接続中...")
         target_db = DatabaseConnector(is_source=False)
         
         # データベース接続の確認
         if target_db is None:
             raise Exception("ターゲットデータベース接続に失敗しました")
             
-        print("データベース接続に成功しました")
+        logger.info("データベース接続に成功しました")
 
         # コマンドライン引数のチェック
         # if len(sys.argv) != 2:
@@ -213,13 +412,13 @@ def main():
         target_sheet = parser.parse_mapping_data_to_run(mapping_name)
         
         if not target_sheet:
-            print(f"エラー: マッピング名 '{mapping_name}' に対応する設定が見つかりません")
+            logger.error(f"エラー: マッピング名 '{mapping_name}' に対応する設定が見つかりません")
             return
             
         # 対応するエラーログファイルの取得
         error_files = get_error_files(target_sheet.source_name)
         if not error_files:
-            print(f"テーブル '{target_sheet.source_name}' のエラーログファイルが見つかりません")
+            logger.warning(f"テーブル '{target_sheet.source_name}' のエラーログファイルが見つかりません")
             return
             
         print("以下のエラーログファイルが見つかりました:")
@@ -241,15 +440,18 @@ def main():
         error_file = error_files[choice - 1]
         
         # エラーデータを処理する
-        recover_data(excel_path, target_db, error_file, target_sheet.logical_name, target_sheet)
+        recover_data(excel_path, target_db, error_file, target_sheet.logical_name, target_sheet, parser)
+        finish_recover(error_file)
         
     except Exception as e:
-        print(f"プログラム実行中にエラーが発生しました: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"プログラム実行中にエラーが発生しました: {str(e)}")
     finally:
         if 'target_db' in locals():
             target_db.close()  
 
 if __name__ == "__main__":
-    main()
+    # 引数がある場合は対話なしで復旧する
+    if len(sys.argv) > 1:
+        main_cli()
+    else:
+        main()
@@ -1,35 +1,96 @@
-import pyodbc
-from config import SOURCE_DB_CONFIG, TARGET_DB_CONFIG
+import time
+from config import SOURCE_DB_CONFIG, TARGET_DB_CONFIG, BULK_INSERT_BATCH_SIZE, FETCH_CHUNK_SIZE
+from insert_strategy import INSERT_STRATEGY, INSERT_CALIBRATION_ROWS, create_strategy, calibrate_strategy
+from backends import get_backend
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+def execute_batch_isolated(conn, cursor, query, rows, on_error=None, input_sizes=None, start=0, strategy=None, metrics=None,
+                           backend=None):
+    """
+    バッチを一括実行してコミットし、失敗した場合は半分に分割して再実行する
+    不正な行が1行ずつに特定されるまで分割を繰り返し、不正な行以外はすべてコミットする
+    （不正な行がk件の場合の往復回数は約 k * log2(行数)）
+    :param conn: データベース接続
+    :param cursor: カーソル
+    :param query: INSERT文（?パラメータ付き）
+    :param rows: 値リストのリスト
+    :param on_error: 失敗した行の通知先 on_error(行インデックス, 値リスト, 例外)
+    :param input_sizes: cursor.setinputsizesに渡す列ごとの型定義
+    :param start: rowsの先頭行のインデックス（on_errorに渡す行インデックスの基準）
+    :param strategy: 複数行の送信に使う挿入方式（省略時はfast_executemany、insert_strategy参照）
+    :param metrics: 挿入・コミットの処理時間の記録先（metrics.TableMetrics）
+    :param backend: 接続のバックエンド（接続エラーの判定に使用、省略時はodbc）
+    :return: 挿入に成功した件数
+    """
+    if not rows:
+        return 0
+    backend = backend or get_backend()
+    started = time.perf_counter()
+    try:
+        if len(rows) == 1:
+            cursor.fast_executemany = False
+            if input_sizes:
+                cursor.setinputsizes(input_sizes)
+            cursor.execute(query, rows[0])
+        elif strategy:
+            strategy.execute(cursor, rows)
+        else:
+            # パラメータ配列を一括でバインドして1往復で送信
+            cursor.fast_executemany = True
+            if input_sizes:
+                cursor.setinputsizes(input_sizes)
+            cursor.executemany(query, rows)
+        if metrics:
+            executed = time.perf_counter()
+            metrics.record_rows('insert', executed - started, rows)
+        conn.commit()
+        if metrics:
+            metrics.record('commit', time.perf_counter() - executed, len(rows))
+        return len(rows)
+    except Exception as e:
+        # 接続エラーは分割して再実行しても成功しないため、そのまま呼び出し元へ返す
+        if backend.is_connection_error(e):
+            raise
+        conn.rollback()
+        if metrics:
+            # 失敗した実行も挿入時間に含める（行数は成功した実行のみ数える）
+            metrics.record('insert', time.perf_counter() - started)
+        if len(rows) == 1:
+            if on_error:
+                on_error(start, rows[0], e)
+            return 0
+    middle = len(rows) // 2
+    return (execute_batch_isolated(conn, cursor, query, rows[:middle], on_error, input_sizes, start, strategy, metrics, backend) +
+            execute_batch_isolated(conn, cursor, query, rows[middle:], on_error, input_sizes, start + middle, strategy, metrics,
+                                   backend))
 
 class DatabaseConnector:
-    def __init__(self, is_source=True):
+    def __init__(self, is_source=True, config=None):
         """
         データベース接続の初期化
         :param is_source: Trueはソースデータベース、Falseはターゲットデータベース
+        :param config: 接続設定（省略時はis_sourceに応じた既定の設定、名前付き接続はconfig.get_source_db_configで取得）
         """
-        self.config = SOURCE_DB_CONFIG if is_source else TARGET_DB_CONFIG
+        self.config = config or (SOURCE_DB_CONFIG if is_source else TARGET_DB_CONFIG)
+        # 接続先の種類（odbc: SQL Server、sqlite: SQLiteファイル）とSQLの方言
+        self.backend = get_backend(self.config.get('backend'))
+        self.dialect = self.backend.dialect
         self.conn = None
         self.cursor = None
+        # INSERT文ごとに選択した挿入方式
+        self.insert_strategies = {}
 
     def connect(self):
         """データベース接続の確立"""
         if not self.conn:
             try:
-                # 標準的なODBC接続文字列フォーマットを使用
-                conn_str = (
-                    "Driver={ODBC Driver 17 for SQL Server};"
-                    f"Server={self.config['server']};"
-                    f"Database={self.config['database']};"
-                    f"Uid={self.config['uid']};"
-                    f"Pwd={self.config['pwd']};"
-                    "TrustServerCertificate=yes"
-                )
-                print(f"データベースへの接続を試みます。接続文字列: {conn_str}")
-                self.conn = pyodbc.connect(conn_str)
+                self.conn = self.backend.connect(self.config)
                 self.cursor = self.conn.cursor()
-                print(f"データベースへの接続が成功しました: {self.config['server']}/{self.config['database']}")
-            except pyodbc.Error as e:
-                print(f"接続に失敗しました: {str(e)}")
+                logger.info(f"データベースへの接続が成功しました: {self.backend.describe(self.config)}")
+            except Exception as e:
+                logger.error(f"接続に失敗しました: {str(e)}")
                 raise
         return self.cursor
 
@@ -47,15 +108,121 @@ class DatabaseConnector:
             cursor.execute(query)
         return cursor
 
-    def fetch_all(self, query, params=None):
+    def fetch_all(self, query, params=None, metrics=None):
         """
         クエリ結果の全件取得
         :param query: SQLクエリ文
         :param params: クエリパラメータ
+        :param metrics: 読み取り時間の記録先（metrics.TableMetrics）
         :return: クエリ結果リスト
         """
+        started = time.perf_counter()
         cursor = self.execute_query(query, params)
-        return cursor.fetchall()
+        rows = cursor.fetchall()
+        if metrics:
+            metrics.record_rows('fetch', time.perf_counter() - started, rows)
+        return rows
+
+    def get_key_columns(self, table_name):
+        """
+        テーブルの主キー（なければ一意のクラスター化インデックス）の列を取得
+        :param table_name: テーブル名（スキーマ付き可）
+        :return: キー列名のリスト（キー順）、見つからない場合は空リスト
+        """
+        return self.backend.get_key_columns(self, table_name)
+
+    def get_table_columns(self, table_name):
+        """
+        テーブルの挿入可能な列（IDENTITY列・計算列を除く）の定義を取得
+        :param table_name: テーブル名（スキーマ付き可）
+        :return: [{'name': 列名, 'data_type': 'nvarchar(20)'などのデータ型, 'nullable': NULL許可}, ...]（列順）
+        """
+        return self.backend.get_table_columns(self, table_name)
+
+    def fetch_iter(self, query, params=None, chunk_size=None, metrics=None):
+        """
+        クエリ結果をチャンク単位で逐次取得するジェネレーター
+        専用の前方専用カーソルでfetchmanyを繰り返すため、
+        メモリ上に保持されるのは常に1チャンク分のみ
+        :param query: SQLクエリ文
+        :param params: クエリパラメータ
+        :param chunk_size: 1チャンクの行数（省略時はFETCH_CHUNK_SIZE）
+        :param metrics: 読み取り時間の記録先（metrics.TableMetrics、クエリの実行時間は最初のチャンクに含める）
+        :return: 行リストのジェネレーター
+        """
+        self.connect()
+        chunk_size = chunk_size or FETCH_CHUNK_SIZE
+        cursor = self.conn.cursor()
+        try:
+            started = time.perf_counter()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if metrics:
+                    metrics.record_rows('fetch', time.perf_counter() - started, rows)
+                yield rows
+                started = time.perf_counter()
+        finally:
+            cursor.close()
+
+    def get_insert_strategy(self, query, sample_rows, input_sizes=None, strategy=None):
+        """
+        INSERT文の挿入方式を取得（初回のみ作成し、以降は同じ方式を使用）
+        autoの場合は最初のバッチの先頭INSERT_CALIBRATION_ROWS行で各方式を計測して選択する
+        :param query: INSERT文（?パラメータ付き）
+        :param sample_rows: 計測に使用する行
+        :param input_sizes: cursor.setinputsizesに渡す列ごとの型定義
+        :param strategy: 方式名（省略時はINSERT_STRATEGY）
+        :return: 挿入方式
+        """
+        if query not in self.insert_strategies:
+            cursor = self.connect()
+            name = (strategy or INSERT_STRATEGY).lower()
+            if name == 'auto':
+                # 計測はロールバックを伴うため、呼び出し元の未コミットの処理に影響しないよう専用の接続で行う
+                calibration_conn = self.backend.connect(self.config)
+                try:
+                    self.insert_strategies[query] = calibrate_strategy(
+                        calibration_conn, calibration_conn.cursor(), query, sample_rows[:INSERT_CALIBRATION_ROWS],
+                        input_sizes, self.dialect)
+                finally:
+                    calibration_conn.close()
+            else:
+                self.insert_strategies[query] = create_strategy(name, cursor, query, input_sizes, self.dialect)
+        return self.insert_strategies[query]
+
+    def bulk_insert(self, query, rows, batch_size=None, input_sizes=None, on_error=None, strategy=None, metrics=None):
+        """
+        挿入方式（既定はfast_executemany）による一括挿入（バッチごとにコミット）
+        失敗したバッチは二分割による再実行で不正な行だけを取り除き、残りの行はコミットする
+        :param query: INSERT文（?パラメータ付き）
+        :param rows: 挿入する値リストのリスト
+        :param batch_size: 1回のexecutemanyで送信する行数（省略時はBULK_INSERT_BATCH_SIZE）
+        :param input_sizes: cursor.setinputsizesに渡す列ごとの型定義
+        :param on_error: 挿入に失敗した行の通知先 on_error(行インデックス, 値リスト, 例外)
+        :param strategy: 挿入方式名（executemany / values / tvp / auto、省略時はINSERT_STRATEGY）
+        :param metrics: 挿入・コミットの処理時間の記録先（metrics.TableMetrics）
+        :return: 挿入に成功した件数
+        """
+        cursor = self.connect()
+        batch_size = batch_size or BULK_INSERT_BATCH_SIZE
+        if not isinstance(rows, list):
+            rows = list(rows)
+        if not rows:
+            return 0
+        insert_strategy = self.get_insert_strategy(query, rows, input_sizes, strategy)
+
+        success_count = 0
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            success_count += execute_batch_isolated(self.conn, cursor, query, batch, on_error, input_sizes, start, insert_strategy, metrics,
+                                                    self.backend)
+        return success_count
 
     def commit(self):
         """トランザクションのコミット"""
@@ -1,6 +1,8 @@
 import pyodbc
 import os
 from dotenv import load_dotenv
+from db_connector import execute_batch_isolated
+from backends import OdbcBackend
 
 class DatabaseConnector2:
     def __init__(self):
@@ -82,6 +84,52 @@ class DatabaseConnector2:
             print(f"执行批量查询失败: {str(e)}")
             raise
     
+    def fetch_all(self, query: str, params: list = None) -> list:
+        """
+        执行查询并返回全部结果
+        :param query: SQL查询语句
+        :param params: 查询参数
+        :return: 结果行列表
+        """
+        self.execute_query(query, params)
+        return self.cursor.fetchall()
+    
+    def get_key_columns(self, table_name: str) -> list:
+        """
+        获取表的主键（没有时为唯一聚集索引）列
+        :param table_name: 表名（可带架构名）
+        :return: 键列名列表
+        """
+        return OdbcBackend().get_key_columns(self, table_name)
+    
+    def get_table_columns(self, table_name: str) -> list:
+        """
+        获取表中可插入的列（不含IDENTITY列和计算列）的定义
+        :param table_name: 表名（可带架构名）
+        :return: [{'name': 列名, 'data_type': 数据类型, 'nullable': 是否允许NULL}, ...]
+        """
+        return OdbcBackend().get_table_columns(self, table_name)
+    
+    def bulk_insert(self, query: str, rows: list, on_error=None) -> int:
+        """
+        批量插入并提交（与DatabaseConnector.bulk_insert相同的接口，失败时二分拆分重试）
+        :param query: INSERT语句
+        :param rows: 参数列表
+        :param on_error: 出错行的回调 on_error(行索引, 参数, 异常)
+        :return: 成功的行数
+        """
+        return self.executemany_isolated(query, rows, on_error)
+    
+    def executemany_isolated(self, query: str, params_list: list, on_error=None) -> int:
+        """
+        批量执行并提交，失败时二分拆分重试，只跳过出错的行
+        :param query: SQL查询语句
+        :param params_list: 查询参数列表
+        :param on_error: 出错行的回调 on_error(行索引, 参数, 异常)
+        :return: 成功的行数
+        """
+        return execute_batch_isolated(self.conn, self.cursor, query, params_list, on_error)
+    
     def commit(self):
         """
         提交事务
@@ -0,0 +1,92 @@
+import csv
+import datetime
+import gzip
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+def format_error_value(value: Any) -> str:
+    """
+    エラーログに出力する値を文字列に変換する
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+class ErrorSink:
+    def __init__(self, path: Path, flush_size: int = None, compress: bool = None):
+        """
+        エラーレコードの出力先（CSVファイル）の初期化
+        レコードはメモリに溜めてまとめて追記し、ファイルは最初のエラーが出るまで作成しない
+        :param path: CSVファイルのパス（圧縮時は末尾に.gzを付ける）
+        :param flush_size: 溜めるレコード数の上限（省略時はERROR_LOG_FLUSH_SIZE）
+        :param compress: gzip圧縮するかどうか（省略時はERROR_LOG_COMPRESS）
+        """
+        if flush_size is None:
+            flush_size = int(os.getenv('ERROR_LOG_FLUSH_SIZE', '10000'))
+        if compress is None:
+            compress = os.getenv('ERROR_LOG_COMPRESS', 'false').lower() in ('1', 'true', 'yes')
+        self.path = Path(f"{path}.gz") if compress else Path(path)
+        self.flush_size = flush_size
+        self.compress = compress
+        self.count = 0  # 記録したエラーレコード数
+        self._buffer: List[Dict[str, Any]] = []
+        self._fieldnames: Optional[List[str]] = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, record: Dict[str, Any]):
+        """
+        エラーレコードを追加する（上限に達したらファイルに追記する）
+        """
+        with self._lock:
+            self._buffer.append(record)
+            self.count += 1
+            if len(self._buffer) >= self.flush_size:
+                self._flush()
+
+    def flush(self):
+        """
+        溜めたエラーレコードをファイルに追記する
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._fieldnames is None:
+            self._fieldnames = list(self._buffer[0].keys())
+        if self.compress:
+            # 圧縮時は追記ごとに独立したgzipメンバーとして書き込む（途中で終了しても読み込める）
+            write_header = not self.path.exists()
+            with gzip.open(self.path, 'at', newline='', encoding='utf-8') as f:
+                self._write(f, write_header)
+        else:
+            write_header = self._file is None and not self.path.exists()
+            if self._file is None:
+                self._file = open(self.path, 'a', newline='', encoding='utf-8')
+            self._write(self._file, write_header)
+            self._file.flush()
+        self._buffer = []
+
+    def _write(self, f, write_header: bool):
+        writer = csv.DictWriter(f, fieldnames=self._fieldnames, extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+        writer.writerows(self._buffer)
+
+    def close(self):
+        """
+        残りのエラーレコードを追記してファイルを閉じる
+        """
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -1,8 +1,25 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Tuple
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Tuple, Iterable
 from dataclasses import dataclass
 from enum import Enum
+from util import compile_converter, ColumnConverter
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# 解析済みワークブックのキャッシュディレクトリ
+MAPPING_CACHE_DIR = Path(os.getenv('MAPPING_CACHE_DIR', '.mapping_cache'))
+
+# 無効データレポートの列
+INVALID_REPORT_COLUMNS = ['表名', '源字段', '目标字段', '原始值', '目标类型', '行号', '原因']
+# 事前検証でレポートに残す無効セルの件数（先頭から。件数は列ごとにすべて集計する）
+VALIDATION_SAMPLE_ROWS = int(os.getenv('VALIDATION_SAMPLE_ROWS', '1000'))
 
 class MigrationType(Enum):
     ONE_TO_ONE = "one_to_one"
@@ -39,6 +56,14 @@ class MigrationConfig:
     table_mapping: TableMapping
     field_mappings: List[FieldMapping]
 
+@dataclass
+class ValidationReport:
+    """事前検証の結果"""
+    total_rows: int             # 検証行数
+    invalid_rows: int           # 無効な行数
+    counts: Dict[Tuple[str, str], int]  # (ソースフィールド, 原因) -> 無効件数
+    samples: pd.DataFrame       # 無効セルのサンプル（先頭からVALIDATION_SAMPLE_ROWS件まで）
+
 class ExcelParser:
     def __init__(self, excel_path: str):
         """
@@ -47,6 +72,70 @@ class ExcelParser:
         """
         self.excel_path = excel_path
         self.migration_sheets: Dict[str, MigrationSheet] = {}  # 論理名をキーとして使用
+        self._sheets: Dict[str, pd.DataFrame] = None  # シート名 → DataFrame（全シートを一度だけ読み込む）
+        self._lock = threading.Lock()
+
+    def _workbook_hash(self) -> str:
+        """
+        ワークブックの内容のハッシュ値を計算
+        """
+        sha256 = hashlib.sha256()
+        with open(self.excel_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def _load_workbook(self) -> Dict[str, pd.DataFrame]:
+        """
+        全シートを読み込む（内容が変わっていなければディスクキャッシュから読み込む）
+        """
+        # 別のディレクトリにある同名のワークブックと区別するため、絶対パスのハッシュ値を名前に含める
+        path = Path(self.excel_path).resolve()
+        prefix = f"{path.stem}.{hashlib.sha256(str(path).encode('utf-8')).hexdigest()[:8]}"
+        cache_file = MAPPING_CACHE_DIR / f"{prefix}.{self._workbook_hash()[:16]}.pkl"
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'rb') as f:
+                    sheets = pickle.load(f)
+                logger.info(f"マッピングキャッシュを読み込みました: {cache_file}")
+                return sheets
+            except Exception as e:
+                logger.warning(f"マッピングキャッシュの読み込みに失敗したため、Excelを再読み込みします: {str(e)}")
+
+        sheets = pd.read_excel(self.excel_path, sheet_name=None)
+        try:
+            MAPPING_CACHE_DIR.mkdir(exist_ok=True)
+            # 古いバージョンのキャッシュを削除
+            for old_file in MAPPING_CACHE_DIR.glob(f"{prefix}.*.pkl"):
+                old_file.unlink()
+            temp_file = cache_file.with_suffix('.tmp')
+            with open(temp_file, 'wb') as f:
+                pickle.dump(sheets, f, protocol=pickle.HIGHEST_PROTOCOL)
+            temp_file.replace(cache_file)
+        except Exception as e:
+            logger.error(f"マッピングキャッシュの保存に失敗しました: {str(e)}")
+        return sheets
+
+    def load_workbook(self) -> Dict[str, pd.DataFrame]:
+        """
+        ワークブックの全シートを取得（初回のみ読み込み）
+        :return: シート名をキーとしたDataFrameの辞書
+        """
+        with self._lock:
+            if self._sheets is None:
+                self._sheets = self._load_workbook()
+        return self._sheets
+
+    def get_sheet(self, sheet_name: str) -> pd.DataFrame:
+        """
+        指定されたシートのDataFrameを取得
+        :param sheet_name: シート名
+        :return: シートのDataFrame
+        """
+        sheets = self.load_workbook()
+        if sheet_name not in sheets:
+            raise ValueError(f"シートが見つかりません: {sheet_name}")
+        return sheets[sheet_name]
 
     def parse_mapping_data_to_run(self, mapping_name: str) -> MigrationSheet:
         """
@@ -56,7 +145,7 @@ class ExcelParser:
         """
         try:
             # マッピング一覧シートの読み込み
-            df = pd.read_excel(self.excel_path, sheet_name='マッピング一覧')
+            df = self.get_sheet('マッピング一覧')
             
             # 指定されたマッピング名の検索
             row = df[df['次期DB物理名'] == mapping_name]
@@ -89,7 +178,7 @@ class ExcelParser:
                 migration_type=migration_type
             )  
         except Exception as e:
-            print(f"マッピングデータの解析中にエラーが発生しました: {str(e)}")
+            logger.error(f"マッピングデータの解析中にエラーが発生しました: {str(e)}")
             raise
 
     def parse_mapping_sheet(self) -> Dict[str, MigrationSheet]:
@@ -99,7 +188,7 @@ class ExcelParser:
         """
         try:
             # マッピング一覧シートの読み込み
-            df = pd.read_excel(self.excel_path, sheet_name='マッピング一覧')
+            df = self.get_sheet('マッピング一覧')
             # 各行の処理
             for _, row in df.iterrows():
                 logical_name = row.get('次期DB論理名')
@@ -120,7 +209,7 @@ class ExcelParser:
                 elif migration_type_str == 'many_to_one':
                     migration_type = MigrationType.MANY_TO_ONE
                 else:
-                    print(f"サポートされていない移行タイプです: {migration_type_str}")
+                    logger.warning(f"サポートされていない移行タイプです: {migration_type_str}")
                     continue
                 
                 # MigrationSheetオブジェクトの作成
@@ -136,7 +225,7 @@ class ExcelParser:
             return self.migration_sheets
             
         except Exception as e:
-            print(f"マッピング一覧シートの解析中にエラーが発生しました: {str(e)}")
+            logger.error(f"マッピング一覧シートの解析中にエラーが発生しました: {str(e)}")
             return {}
 
     def get_sheet_info(self, logical_name: str) -> MigrationSheet:
@@ -158,7 +247,7 @@ class ExcelParser:
         :return: フィールドマッピングのDataFrame
         """
         try:
-            df = pd.read_excel(self.excel_path, sheet_name)
+            df = self.get_sheet(sheet_name)
             # 必要な列のみを保持
             required_columns = [
                 '次期DB物理名', '次期Type物理名', '次期Typeデータ型',
@@ -245,6 +334,125 @@ class ExcelParser:
         
         return valid_df, invalid_df
 
+    def get_validation_rules(self, sheet_name: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        フィールドマッピングから列ごとの検証ルールを取得（Transform対象の列のみ）
+        データ型・Not Null・デフォルトの列は 'データ型' / '次期Typeデータ型' のどちらの見出しでもよい
+        :param sheet_name: シート名
+        :return: [(ソースフィールド, ターゲットフィールド, 変換ルール), ...]
+        """
+        df = self.get_sheet(sheet_name)
+        type_column = 'データ型' if 'データ型' in df.columns else '次期Typeデータ型'
+        not_null_column = 'Not Null' if 'Not Null' in df.columns else '次期TypeNot Null'
+        default_column = 'デフォルト' if 'デフォルト' in df.columns else '次期Typeデフォルト'
+        rules = []
+        for _, row in df.iterrows():
+            if str(row.get('Transform', '')).upper() != 'Y':
+                continue
+            rules.append((str(row.get('現行Type物理名')), str(row.get('次期Type物理名')), {
+                'data_type': str(row.get(type_column, '')),
+                'not_null': str(row.get(not_null_column, '')).upper() == 'Y',
+                'default_value': row.get(default_column)
+            }))
+        return rules
+
+    def compile_validation_rules(self, sheet_name: str) -> List[Tuple[str, str, Dict[str, Any], ColumnConverter]]:
+        """
+        検証ルールと型変換を事前にコンパイルする（シートごとに1回だけ行い、各バッチで使い回す）
+        :param sheet_name: シート名
+        :return: [(ソースフィールド, ターゲットフィールド, 変換ルール, ColumnConverter), ...]
+        """
+        return [
+            (source_column, target_column, rule, compile_converter(rule, verbose=False, use_cache=False))
+            for source_column, target_column, rule in self.get_validation_rules(sheet_name)
+        ]
+
+    def validate_table_data(self, sheet_name: str, source_data: pd.DataFrame, row_offset: int = 0,
+                            compiled_rules: List[Tuple[str, str, Dict[str, Any], ColumnConverter]] = None,
+                            max_samples: int = None) -> Tuple[np.ndarray, Dict[Tuple[str, str], int], pd.DataFrame]:
+        """
+        テーブルデータを列単位でまとめて検証する（移行時と同じ型変換で判定する）
+        :param sheet_name: シート名
+        :param source_data: ソースデータのDataFrame（1バッチ分）
+        :param row_offset: バッチ先頭行の行番号のずれ（バッチ単位で検証する場合）
+        :param compiled_rules: compile_validation_rulesの結果（省略時はここでコンパイルする）
+        :param max_samples: レポートに含める無効セルの最大件数（省略時はすべて）
+        :return: (無効な行のブールマスク, (ソースフィールド, 原因)ごとの無効件数, 無効データのレポート（無効なセルのみ）)
+        """
+        if compiled_rules is None:
+            compiled_rules = self.compile_validation_rules(sheet_name)
+        invalid_rows = np.zeros(len(source_data), dtype=bool)
+        counts = {}
+        reports = []
+        remaining = len(source_data) * len(compiled_rules) if max_samples is None else max_samples
+        for source_column, target_column, rule, converter in compiled_rules:
+            if source_column not in source_data.columns:
+                continue
+            values = source_data[source_column].to_numpy(dtype=object)
+            is_null = source_data[source_column].isna().to_numpy()
+            
+            # 型変換に失敗した値（NULLは型検証の対象外）
+            _, type_invalid = converter.convert_column(values)
+            type_invalid &= ~is_null
+            # デフォルト値のないNOT NULL列のNULL
+            null_invalid = is_null if rule['not_null'] and pd.isna(rule['default_value']) else np.zeros_like(is_null)
+            
+            column_invalid = type_invalid | null_invalid
+            if not column_invalid.any():
+                continue
+            invalid_rows |= column_invalid
+            for reason, mask in (('类型转换失败', type_invalid), ('违反非空约束', null_invalid)):
+                count = int(mask.sum())
+                if count:
+                    counts[(source_column, reason)] = counts.get((source_column, reason), 0) + count
+            if remaining <= 0:
+                continue
+            # 件数はすべて数え、レポートには先頭から残り件数分だけ含める
+            positions = np.flatnonzero(column_invalid)[:remaining]
+            remaining -= len(positions)
+            reports.append(pd.DataFrame({
+                '表名': sheet_name,
+                '源字段': source_column,
+                '目标字段': target_column,
+                '原始值': values[positions],
+                '目标类型': rule['data_type'],
+                '行号': positions + row_offset + 1,
+                '原因': np.where(type_invalid[positions], '类型转换失败', '违反非空约束')
+            }))
+        
+        report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=INVALID_REPORT_COLUMNS)
+        return invalid_rows, counts, report
+
+    def prevalidate_table(self, sheet_name: str, batches: Iterable[pd.DataFrame],
+                          max_samples: int = None) -> ValidationReport:
+        """
+        テーブル全体をバッチ単位で事前検証する
+        無効件数は列ごとにすべて集計し、無効セルの内容は先頭からmax_samples件だけ保持する（メモリ使用量はテーブルの大きさによらない）
+        :param sheet_name: シート名
+        :param batches: ソースデータのDataFrameのイテラブル（先頭から順に）
+        :param max_samples: レポートに残す無効セルの件数（省略時はVALIDATION_SAMPLE_ROWS）
+        :return: 検証結果
+        """
+        max_samples = VALIDATION_SAMPLE_ROWS if max_samples is None else max_samples
+        compiled_rules = self.compile_validation_rules(sheet_name)
+        total_rows = 0
+        invalid_count = 0
+        counts = {}
+        samples = []
+        sampled = 0
+        for batch in batches:
+            invalid_rows, batch_counts, report = self.validate_table_data(
+                sheet_name, batch, total_rows, compiled_rules, max(max_samples - sampled, 0))
+            total_rows += len(batch)
+            invalid_count += int(invalid_rows.sum())
+            for key, count in batch_counts.items():
+                counts[key] = counts.get(key, 0) + count
+            if not report.empty:
+                samples.append(report)
+                sampled += len(report)
+        samples = pd.concat(samples, ignore_index=True) if samples else pd.DataFrame(columns=INVALID_REPORT_COLUMNS)
+        return ValidationReport(total_rows, invalid_count, counts, samples)
+
     def save_invalid_data(self, invalid_df: pd.DataFrame, output_path: str):
         """
         無効データをCSVファイルに保存
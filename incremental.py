@@ -0,0 +1,75 @@
+from typing import Any, List, Sequence, Tuple
+
+def build_watermark_expression(watermark_columns: Sequence[str]) -> str:
+    """
+    ウォーターマーク列から比較に使う式を作成
+    複数列の場合は宣言順にCOALESCEする（例: UPDATE_D が NULL の行は CREATE_D を使う）
+    :param watermark_columns: ウォーターマーク列リスト
+    :return: SQL式
+    """
+    if len(watermark_columns) == 1:
+        return watermark_columns[0]
+    return f"COALESCE({', '.join(watermark_columns)})"
+
+def build_watermark_condition(watermark_expression: str, lower: Any, upper: Any) -> Tuple[str, List[Any]]:
+    """
+    前回のハイウォーターマークより後、今回のハイウォーターマーク以下の行を抽出するWHERE条件を作成
+    :param watermark_expression: build_watermark_expressionで作成した式
+    :param lower: 前回のハイウォーターマーク（含まない、Noneは全件）
+    :param upper: 今回のハイウォーターマーク（含む）
+    :return: (WHERE条件文字列, パラメータリスト)
+    """
+    conditions = []
+    params = []
+    if lower is not None:
+        conditions.append(f"{watermark_expression} > ?")
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f"{watermark_expression} <= ?")
+        params.append(upper)
+    return " AND ".join(conditions), params
+
+def build_merge_query(table_name: str, insert_fields: Sequence[str], match_fields: Sequence[str]) -> str:
+    """
+    1行分のパラメータでアップサートするMERGE文を作成
+    :param table_name: ターゲットテーブル名
+    :param insert_fields: 挿入列リスト（パラメータの順序）
+    :param match_fields: 既存行の照合に使う列リスト（insert_fieldsに含まれること）
+    :return: MERGE文
+    """
+    columns = ', '.join(insert_fields)
+    on_clause = ' AND '.join(f"t.{field} = s.{field}" for field in match_fields)
+    update_fields = [field for field in insert_fields if field not in match_fields]
+    query = (
+        f"MERGE INTO {table_name} WITH (HOLDLOCK) AS t "
+        f"USING (VALUES ({', '.join(['?' for _ in insert_fields])})) AS s ({columns}) "
+        f"ON {on_clause}"
+    )
+    if update_fields:
+        query += f" WHEN MATCHED THEN UPDATE SET {', '.join(f't.{field} = s.{field}' for field in update_fields)}"
+    query += f" WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({', '.join(f's.{field}' for field in insert_fields)});"
+    return query
+
+def build_upsert_query(table_name: str, insert_fields: Sequence[str], match_fields: Sequence[str],
+                       dialect: str = 'mssql') -> str:
+    """
+    1行分のパラメータでアップサートする文をターゲットの方言に合わせて作成
+    :param table_name: ターゲットテーブル名
+    :param insert_fields: 挿入列リスト（パラメータの順序）
+    :param match_fields: 既存行の照合に使う列リスト（insert_fieldsに含まれること）
+    :param dialect: SQLの方言（mssql: MERGE、sqlite: INSERT ... ON CONFLICT、照合列に一意制約が必要）
+    :return: アップサート文
+    """
+    if dialect != 'sqlite':
+        return build_merge_query(table_name, insert_fields, match_fields)
+    columns = ', '.join(insert_fields)
+    update_fields = [field for field in insert_fields if field not in match_fields]
+    query = (
+        f"INSERT INTO {table_name} ({columns}) VALUES ({', '.join(['?' for _ in insert_fields])}) "
+        f"ON CONFLICT ({', '.join(match_fields)}) "
+    )
+    if update_fields:
+        query += f"DO UPDATE SET {', '.join(f'{field} = excluded.{field}' for field in update_fields)}"
+    else:
+        query += "DO NOTHING"
+    return query
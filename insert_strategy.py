@@ -0,0 +1,181 @@
+import os
+import re
+import time
+from typing import Any, List, Optional, Sequence, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# 挿入方式（executemany / values / tvp / auto）、autoは対象テーブルごとにサンプルで計測して選択する
+INSERT_STRATEGY = os.getenv('INSERT_STRATEGY', 'executemany').lower()
+# 計測に使用するサンプル行数
+INSERT_CALIBRATION_ROWS = int(os.getenv('INSERT_CALIBRATION_ROWS', '1000'))
+# テーブル値パラメーターのテーブル型名（<テーブル名><接尾辞>、事前にターゲットDBへ作成しておく）
+INSERT_TVP_TYPE_SUFFIX = os.getenv('INSERT_TVP_TYPE_SUFFIX', '_tvp')
+
+# SQL Serverの1ステートメントあたりのパラメーター数の上限（2100未満）と、VALUES句の最大行数
+MAX_PARAMETERS = 2099
+MAX_VALUES_ROWS = 1000
+
+_INSERT_PATTERN = re.compile(r'^\s*INSERT\s+INTO\s+(\S+)\s*\(([^)]*)\)\s*VALUES\s*\(([?,\s]*)\)\s*;?\s*$', re.IGNORECASE)
+
+def parse_insert_query(query: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    「INSERT INTO テーブル (列, ...) VALUES (?, ...)」形式のINSERT文からテーブル名と列名を取り出す
+    :param query: INSERT文
+    :return: (テーブル名, 列名のリスト)、形式が異なる場合（MERGEなど）はNone
+    """
+    match = _INSERT_PATTERN.match(query)
+    if not match:
+        return None
+    columns = [column.strip() for column in match.group(2).split(',')]
+    if match.group(3).count('?') != len(columns):
+        return None
+    return match.group(1), columns
+
+class ExecuteManyStrategy:
+    """fast_executemanyでパラメーター配列を一括バインドして送信する（既定の方式）"""
+    name = 'executemany'
+
+    def __init__(self, query: str, input_sizes=None):
+        self.query = query
+        self.input_sizes = input_sizes
+
+    def execute(self, cursor, rows: Sequence[Sequence[Any]]):
+        cursor.fast_executemany = True
+        if self.input_sizes:
+            cursor.setinputsizes(self.input_sizes)
+        cursor.executemany(self.query, rows)
+
+class MultiRowValuesStrategy:
+    """複数行のVALUES句（INSERT ... VALUES (...),(...)）で送信する（パラメーター数の上限で分割）"""
+    name = 'values'
+
+    def __init__(self, table: str, columns: List[str]):
+        self.table = table
+        self.columns = columns
+        self.rows_per_statement = max(1, min(MAX_VALUES_ROWS, MAX_PARAMETERS // len(columns)))
+        self._statements = {}
+
+    def _statement(self, row_count: int) -> str:
+        statement = self._statements.get(row_count)
+        if statement is None:
+            placeholders = f"({', '.join('?' for _ in self.columns)})"
+            statement = f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES {', '.join([placeholders] * row_count)}"
+            self._statements[row_count] = statement
+        return statement
+
+    def execute(self, cursor, rows: Sequence[Sequence[Any]]):
+        cursor.fast_executemany = False
+        for start in range(0, len(rows), self.rows_per_statement):
+            chunk = rows[start:start + self.rows_per_statement]
+            params = [value for row in chunk for value in row]
+            cursor.execute(self._statement(len(chunk)), params)
+
+class TableValuedParameterStrategy:
+    """テーブル値パラメーターで全行を1パラメーターとして送信する（ターゲットDBにテーブル型が必要）"""
+    name = 'tvp'
+
+    def __init__(self, table: str, columns: List[str], type_name: str, type_schema: str):
+        self.type_name = type_name
+        self.type_schema = type_schema
+        self.query = f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM ?"
+
+    def execute(self, cursor, rows: Sequence[Sequence[Any]]):
+        cursor.fast_executemany = False
+        # 先頭の2要素でテーブル型名とスキーマを指定する（pyodbcのTVPの指定方法）
+        cursor.execute(self.query, [[self.type_name, self.type_schema] + [tuple(row) for row in rows]])
+
+def _split_table_name(table: str) -> Tuple[str, str]:
+    parts = [part.strip('[]') for part in table.split('.')]
+    if len(parts) == 1:
+        return 'dbo', parts[0]
+    return parts[-2], parts[-1]
+
+def find_tvp_strategy(cursor, table: str, columns: List[str]) -> Optional[TableValuedParameterStrategy]:
+    """
+    テーブルに対応するテーブル型（<テーブル名>INSERT_TVP_TYPE_SUFFIX）がターゲットDBに存在する場合にTVP方式を作成
+    テーブル型はINSERT文のすべての列を同じ名前で持つ必要がある
+    :param cursor: ターゲットDBのカーソル
+    :param table: テーブル名（スキーマ付き可）
+    :param columns: INSERT文の列名
+    :return: TVP方式、テーブル型がない場合はNone
+    """
+    schema, name = _split_table_name(table)
+    type_name = f"{name}{INSERT_TVP_TYPE_SUFFIX}"
+    cursor.execute("""
+        SELECT c.name
+        FROM sys.table_types t
+        JOIN sys.columns c ON c.object_id = t.type_table_object_id
+        WHERE t.name = ? AND SCHEMA_NAME(t.schema_id) = ?
+    """, [type_name, schema])
+    type_columns = {row[0].lower() for row in cursor.fetchall()}
+    if not type_columns or any(column.strip('[]').lower() not in type_columns for column in columns):
+        return None
+    return TableValuedParameterStrategy(table, columns, type_name, schema)
+
+def create_strategy(name: str, cursor, query: str, input_sizes=None, dialect: str = 'mssql'):
+    """
+    方式名から挿入方式を作成する（INSERT文の形式が合わない場合や、TVPのテーブル型がない場合はexecutemany）
+    :param name: 方式名（executemany / values / tvp）
+    :param cursor: ターゲットDBのカーソル（TVPのテーブル型の確認に使用）
+    :param query: INSERT文（?パラメータ付き）
+    :param input_sizes: cursor.setinputsizesに渡す列ごとの型定義（executemanyのみ使用）
+    :param dialect: 接続先のSQLの方言（TVPはmssqlのみ）
+    :return: 挿入方式
+    """
+    parsed = parse_insert_query(query)
+    if name == 'values' and parsed:
+        return MultiRowValuesStrategy(*parsed)
+    if name == 'tvp' and parsed and dialect == 'mssql':
+        strategy = find_tvp_strategy(cursor, *parsed)
+        if strategy:
+            return strategy
+        logger.warning(f"  テーブル型 {parsed[0]}{INSERT_TVP_TYPE_SUFFIX} が見つからないため、executemanyで挿入します")
+    return ExecuteManyStrategy(query, input_sizes)
+
+def calibrate_strategy(conn, cursor, query: str, sample_rows: Sequence[Sequence[Any]], input_sizes=None,
+                       dialect: str = 'mssql'):
+    """
+    サンプル行を各方式で挿入してロールバックし、最も速い方式を選択する
+    初回実行の準備コストが先頭の方式に偏らないよう、各方式を1回ずつ計測せずに実行してから計測する
+    失敗した方式（TVPのテーブル型がない、型が合わないなど）は候補から除外する
+    :param conn: ターゲットDBの計測専用の接続（ロールバックするため、未コミットの処理がある接続は渡さない）
+    :param cursor: ターゲットDBのカーソル
+    :param query: INSERT文（?パラメータ付き）
+    :param sample_rows: 計測に使用する行
+    :param input_sizes: cursor.setinputsizesに渡す列ごとの型定義
+    :param dialect: 接続先のSQLの方言（TVPはmssqlのみ）
+    :return: 選択した挿入方式
+    """
+    default = ExecuteManyStrategy(query, input_sizes)
+    parsed = parse_insert_query(query)
+    if not parsed or len(sample_rows) < 2:
+        return default
+
+    candidates = [default, MultiRowValuesStrategy(*parsed)]
+    tvp_strategy = find_tvp_strategy(cursor, *parsed) if dialect == 'mssql' else None
+    if tvp_strategy:
+        candidates.append(tvp_strategy)
+
+    timings = []
+    for warm_up in (True, False):
+        for strategy in candidates:
+            try:
+                started = time.perf_counter()
+                strategy.execute(cursor, sample_rows)
+                if not warm_up:
+                    timings.append((time.perf_counter() - started, strategy))
+            except Exception as e:
+                logger.warning(f"  挿入方式 {strategy.name} を計測できませんでした: {str(e)}")
+                candidates = [candidate for candidate in candidates if candidate is not strategy]
+            finally:
+                # 計測用に挿入した行は残さない
+                conn.rollback()
+
+    if not timings:
+        return default
+    elapsed, best = min(timings, key=lambda timing: timing[0])
+    summary = ', '.join(f"{strategy.name} {seconds * 1000:.1f}ms" for seconds, strategy in timings)
+    logger.info(f"  挿入方式の計測 {parsed[0]} ({len(sample_rows)} 行): {summary} → {best.name}")
+    return best
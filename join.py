@@ -0,0 +1,238 @@
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# ビルド側をメモリに保持する最大行数（超えた場合はパーティションに分割してディスクへ退避する）
+JOIN_MEMORY_ROWS = int(os.getenv('JOIN_MEMORY_ROWS', '1000000'))
+# ディスクへ退避する場合のパーティション数
+JOIN_SPILL_PARTITIONS = int(os.getenv('JOIN_SPILL_PARTITIONS', '16'))
+# 上限を超えたパーティションを再分割する最大の深さ
+_MAX_SPLIT_DEPTH = 8
+
+class _SpillFiles:
+    def __init__(self, directory: str, prefix: str, partitions: int, chunk_size: int = 1000, salt: int = 0):
+        """
+        キーのハッシュ値で振り分けた行をパーティションごとの一時ファイルに書き込む
+        :param directory: 一時ファイルのディレクトリ
+        :param prefix: ファイル名の接頭辞
+        :param partitions: パーティション数
+        :param chunk_size: 1回に書き込む行数
+        :param salt: ハッシュ値に混ぜる値（再分割時に前回と異なる振り分けにする）
+        """
+        self.partitions = partitions
+        self.chunk_size = chunk_size
+        self.salt = salt
+        self.counts = [0] * partitions  # パーティションごとの行数
+        self._paths = [os.path.join(directory, f"{prefix}_{i}.pkl") for i in range(partitions)]
+        self._files = [open(path, 'wb') for path in self._paths]
+        self._buffers: List[List[Any]] = [[] for _ in range(partitions)]
+
+    def add(self, key, row):
+        partition = (hash((self.salt, key)) if self.salt else hash(key)) % self.partitions
+        self.counts[partition] += 1
+        buffer = self._buffers[partition]
+        buffer.append((key, row))
+        if len(buffer) >= self.chunk_size:
+            pickle.dump(buffer, self._files[partition], pickle.HIGHEST_PROTOCOL)
+            self._buffers[partition] = []
+
+    def close(self):
+        for partition, buffer in enumerate(self._buffers):
+            if buffer:
+                pickle.dump(buffer, self._files[partition], pickle.HIGHEST_PROTOCOL)
+            self._files[partition].close()
+        self._buffers = [[] for _ in range(self.partitions)]
+
+    def read(self, partition: int) -> Iterator[Tuple[Any, Any]]:
+        """
+        パーティションの (キー, 行) を書き込んだ順に返す
+        """
+        with open(self._paths[partition], 'rb') as f:
+            while True:
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    return
+                yield from chunk
+
+    def remove(self):
+        """
+        一時ファイルを削除する
+        """
+        for path in self._paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+def hash_join(build_rows: Iterable[Sequence[Any]], probe_rows: Iterable[Sequence[Any]],
+              build_key: Callable[[Sequence[Any]], Any], probe_key: Callable[[Sequence[Any]], Any],
+              build_width: int, left_outer: bool = False, max_rows: int = None,
+              partitions: int = None) -> Iterator[Tuple[Any, ...]]:
+    """
+    ビルド側をハッシュ表にし、プローブ側をストリームで照合する等価結合
+    ビルド側がmax_rowsを超えた場合は、両側をキーのハッシュ値でパーティションに分割して
+    一時ファイルへ退避し、パーティションごとに結合する（グレースハッシュ結合）
+    max_rowsを超えたパーティションは振り分けを変えて再分割し、同じキーの行が多く分割できない場合は
+    ビルド側をmax_rows行ずつ読み込んでプローブ側を繰り返し照合するため、メモリに保持する行数はmax_rows以下になる
+    （外部結合ではこの場合に限り、プローブ側の行ごとに1バイトの一致フラグを保持する）
+    キーがNoneを含む行は結合しない（SQLの等価結合と同じ）
+    :param build_rows: ビルド側の行（通常は小さい方のテーブル）
+    :param probe_rows: プローブ側の行（結合結果の左側になる）
+    :param build_key: ビルド側の行からキーを取り出す関数
+    :param probe_key: プローブ側の行からキーを取り出す関数
+    :param build_width: ビルド側の列数（外部結合で一致しない場合にNoneで埋める）
+    :param left_outer: Trueの場合、一致しないプローブ側の行もビルド側をNoneにして返す
+    :param max_rows: ビルド側をメモリに保持する最大行数（省略時はJOIN_MEMORY_ROWS）
+    :param partitions: 退避時のパーティション数（省略時はJOIN_SPILL_PARTITIONS）
+    :return: プローブ側の行 + ビルド側の行 のタプルのジェネレーター（退避時は順序を保証しない）
+    """
+    max_rows = max_rows or JOIN_MEMORY_ROWS
+    partitions = partitions or JOIN_SPILL_PARTITIONS
+    empty = (None,) * build_width
+
+    table: Dict[Any, List[Tuple[Any, ...]]] = {}
+    row_count = 0
+    with tempfile.TemporaryDirectory(prefix='join_') as directory:
+        build_spill = None
+        for row in build_rows:
+            key = build_key(row)
+            if _has_null(key):
+                continue
+            if build_spill is not None:
+                build_spill.add(key, tuple(row))
+                continue
+            table.setdefault(key, []).append(tuple(row))
+            row_count += 1
+            if row_count > max_rows:
+                # メモリ上限を超えたため、保持している行もパーティションへ退避する
+                logger.info(f"  結合: ビルド側が {max_rows} 行を超えたため、{partitions} 個のパーティションに分割してディスクへ退避します")
+                build_spill = _SpillFiles(directory, 'build', partitions)
+                for table_key, table_rows in table.items():
+                    for table_row in table_rows:
+                        build_spill.add(table_key, table_row)
+                table = {}
+
+        if build_spill is None:
+            # ビルド側がメモリに収まる場合はプローブ側をそのまま照合する
+            for row in probe_rows:
+                matches = table.get(probe_key(row))
+                if matches:
+                    for match in matches:
+                        yield tuple(row) + match
+                elif left_outer:
+                    yield tuple(row) + empty
+            return
+
+        build_spill.close()
+        probe_spill = _SpillFiles(directory, 'probe', partitions)
+        for row in probe_rows:
+            key = probe_key(row)
+            if _has_null(key):
+                if left_outer:
+                    yield tuple(row) + empty
+                continue
+            probe_spill.add(key, tuple(row))
+        probe_spill.close()
+
+        for partition in range(partitions):
+            yield from _join_partition(build_spill, probe_spill, partition, directory, max_rows, empty, left_outer)
+
+def _join_partition(build_spill: _SpillFiles, probe_spill: _SpillFiles, partition: int, directory: str,
+                    max_rows: int, empty: Tuple[Any, ...], left_outer: bool, depth: int = 0) -> Iterator[Tuple[Any, ...]]:
+    """
+    退避した1つのパーティションを結合する（ビルド側がmax_rowsを超える場合は再分割する）
+    """
+    if build_spill.counts[partition] <= max_rows:
+        table = {}
+        for key, row in build_spill.read(partition):
+            table.setdefault(key, []).append(row)
+        for key, row in probe_spill.read(partition):
+            matches = table.get(key)
+            if matches:
+                for match in matches:
+                    yield row + match
+            elif left_outer:
+                yield row + empty
+        return
+
+    if depth < _MAX_SPLIT_DEPTH:
+        prefix = f"{depth + 1}_{partition}_{id(build_spill)}"
+        sub_build = _SpillFiles(directory, f"build_{prefix}", build_spill.partitions, salt=depth + 1)
+        for key, row in build_spill.read(partition):
+            sub_build.add(key, row)
+        sub_build.close()
+        # 1つのパーティションにすべての行が残った場合（同じキーの行が多い場合）は再分割しても小さくならない
+        if max(sub_build.counts) < build_spill.counts[partition]:
+            sub_probe = _SpillFiles(directory, f"probe_{prefix}", build_spill.partitions, salt=depth + 1)
+            for key, row in probe_spill.read(partition):
+                sub_probe.add(key, row)
+            sub_probe.close()
+            try:
+                for sub_partition in range(sub_build.partitions):
+                    yield from _join_partition(sub_build, sub_probe, sub_partition, directory, max_rows, empty,
+                                               left_outer, depth + 1)
+            finally:
+                sub_build.remove()
+                sub_probe.remove()
+            return
+        sub_build.remove()
+
+    # 分割できない場合はビルド側をmax_rows行ずつ読み込み、ブロックごとにプローブ側を照合する
+    logger.warning("  結合: 同じキーの行が多いため、パーティション（%d 行）をブロック単位で照合します",
+                   build_spill.counts[partition])
+    matched = bytearray(probe_spill.counts[partition]) if left_outer else None
+    for block in iter_chunks(build_spill.read(partition), max_rows):
+        table = {}
+        for key, row in block:
+            table.setdefault(key, []).append(row)
+        for index, (key, row) in enumerate(probe_spill.read(partition)):
+            matches = table.get(key)
+            if matches:
+                if matched is not None:
+                    matched[index] = 1
+                for match in matches:
+                    yield row + match
+    if left_outer:
+        for index, (key, row) in enumerate(probe_spill.read(partition)):
+            if not matched[index]:
+                yield row + empty
+
+def _has_null(key) -> bool:
+    return key is None or (isinstance(key, tuple) and any(value is None for value in key))
+
+def _normalize_key_value(value):
+    # SQL Serverの比較と同様に文字列末尾の空白を無視する（char型の列と結合するため）
+    return value.rstrip() if isinstance(value, str) else value
+
+def key_getter(indexes: Sequence[int]) -> Callable[[Sequence[Any]], Any]:
+    """
+    行から結合キーを取り出す関数を作成（単一列は値、複数列はタプル）
+    文字列は末尾の空白を除いて比較する（大文字・小文字は区別する）
+    """
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: _normalize_key_value(row[index])
+    return lambda row: tuple(_normalize_key_value(row[index]) for index in indexes)
+
+def iter_rows(chunks: Iterable[List[Any]]) -> Iterator[Any]:
+    """
+    fetch_iterのチャンクを1行ずつ返す
+    """
+    for chunk in chunks:
+        yield from chunk
+
+def iter_chunks(rows: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """
+    行をchunk_size件ずつのリストにまとめて返す
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,108 @@
+from typing import List, Sequence, Any, Tuple
+
+def build_keyset_condition(key_columns: Sequence[str]) -> str:
+    """
+    キーセット（シーク）ページング用のWHERE条件を作成
+    (k1, k2) > (?, ?) を SQL Server で使える形に展開する
+    :param key_columns: キー列リスト（ORDER BY順）
+    :return: WHERE条件文字列
+    """
+    clauses = []
+    for i, key_column in enumerate(key_columns):
+        parts = [f"{column} = ?" for column in key_columns[:i]]
+        parts.append(f"{key_column} > ?")
+        clauses.append(f"({' AND '.join(parts)})")
+    return " OR ".join(clauses)
+
+def build_keyset_params(key_columns: Sequence[str], last_key: Sequence[Any]) -> List[Any]:
+    """
+    build_keyset_conditionに対応するパラメータリストを作成
+    :param key_columns: キー列リスト
+    :param last_key: 前バッチ最終行のキー値
+    :return: パラメータリスト
+    """
+    params = []
+    for i in range(len(key_columns)):
+        params.extend(last_key[:i + 1])
+    return params
+
+def build_range_condition(key_column: str, lower: Any, upper: Any) -> Tuple[str, List[Any]]:
+    """
+    キー範囲（下限を含まない、上限を含む）のWHERE条件を作成
+    :param key_column: 範囲分割に使うキー列（先頭キー列）
+    :param lower: 下限値（Noneは下限なし）
+    :param upper: 上限値（Noneは上限なし）
+    :return: (WHERE条件文字列, パラメータリスト)
+    """
+    conditions = []
+    params = []
+    if lower is not None:
+        conditions.append(f"{key_column} > ?")
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f"{key_column} <= ?")
+        params.append(upper)
+    return " AND ".join(conditions), params
+
+def build_key_check_queries(table_name: str, key_columns: Sequence[str]) -> Tuple[str, str]:
+    """
+    キー列がキーセットページングに使えるか（一意かつNULLを含まないか）を確認するSELECT文を作成
+    (k > ?) によるシークでは、値が重複する行はバッチの境界で読み飛ばされ、NULLの行は読み取られない
+    :param table_name: ソーステーブル名
+    :param key_columns: キー列リスト
+    :return: (値が重複するキーの件数を返すSELECT文, キー列がNULLの行数を返すSELECT文)
+    """
+    columns = ', '.join(key_columns)
+    duplicate_query = (
+        f"SELECT COUNT(*) FROM (SELECT {columns} FROM {table_name} "
+        f"GROUP BY {columns} HAVING COUNT(*) > 1) duplicates"
+    )
+    null_query = f"SELECT COUNT(*) FROM {table_name} WHERE {' OR '.join(f'{column} IS NULL' for column in key_columns)}"
+    return duplicate_query, null_query
+
+def build_keyset_query(table_name: str, columns: Sequence[str], key_columns: Sequence[str],
+                       batch_size: int, has_last_key: bool, range_condition: str = None, dialect: str = 'mssql') -> str:
+    """
+    キーセットページングのSELECT文を作成
+    パラメータはキーセット条件、範囲条件の順に渡すこと
+    :param table_name: ソーステーブル名
+    :param columns: 取得する列リスト（キー列を含むこと）
+    :param key_columns: キー列リスト
+    :param batch_size: 1回に取得する行数
+    :param has_last_key: 前バッチの最終キー以降から取得するかどうか
+    :param range_condition: build_range_conditionで作成した範囲条件
+    :param dialect: SQLの方言（mssql: TOP、sqlite: LIMIT）
+    :return: SELECT文
+    """
+    conditions = []
+    if has_last_key:
+        conditions.append(f"({build_keyset_condition(key_columns)})")
+    if range_condition:
+        conditions.append(range_condition)
+    where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    if dialect == 'sqlite':
+        return (
+            f"SELECT {', '.join(columns)} FROM {table_name}"
+            f"{where_clause} ORDER BY {', '.join(key_columns)} LIMIT {batch_size}"
+        )
+    return (
+        f"SELECT TOP ({batch_size}) {', '.join(columns)} FROM {table_name}"
+        f"{where_clause} ORDER BY {', '.join(key_columns)}"
+    )
+
+def build_offset_query(table_name: str, columns: Sequence[str], offset: int, batch_size: int,
+                       condition: str = None, dialect: str = 'mssql') -> str:
+    """
+    OFFSETページングのSELECT文を作成（キー列がないテーブル用）
+    :param table_name: ソーステーブル名
+    :param columns: 取得する列リスト
+    :param offset: 読み飛ばす行数
+    :param batch_size: 1回に取得する行数
+    :param condition: 抽出条件
+    :param dialect: SQLの方言（mssql: OFFSET/FETCH、sqlite: LIMIT/OFFSET）
+    :return: SELECT文
+    """
+    where_clause = f" WHERE {condition}" if condition else ""
+    if dialect == 'sqlite':
+        return f"SELECT {', '.join(columns)} FROM {table_name}{where_clause} LIMIT {batch_size} OFFSET {offset}"
+    return f"SELECT {', '.join(columns)} FROM {table_name}{where_clause} ORDER BY (SELECT NULL) OFFSET {offset} ROWS FETCH NEXT {batch_size} ROWS ONLY"
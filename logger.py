@@ -0,0 +1,192 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 出力するログレベル（DEBUG / INFO / WARNING / ERROR）、DEBUGでは各バッチのSQLも出力する
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# コンソールに加えて出力するログファイル（省略時はコンソールのみ）
+LOG_FILE = os.getenv('LOG_FILE')
+# 書き込みスレッドに渡すまでのキューの最大件数（満杯時はINFO以下を破棄し、WARNING以上は空くまで待つ）
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# 同じ種類のメッセージ（ロガー・レベル・書式・例外の型が同じもの）を集計する区間（秒）と、区間ごとに出力する件数
+# 超過分は出力せず、区間の終わりに「N件を省略しました」とまとめて出力する（0で無制限）
+LOG_RATE_INTERVAL = float(os.getenv('LOG_RATE_INTERVAL', '10'))
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', '20'))
+
+LOG_FORMAT = '%(asctime)s %(levelname)-7s [%(threadName)s] %(message)s'
+ROOT_LOGGER_NAME = 'migration'
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, limit: int, interval: float):
+        """
+        同じ種類のメッセージを区間ごとにlimit件まで通し、超過分を件数として集計するフィルター
+        種類はロガー名・レベル・書式文字列（引数を埋め込む前）・引数に含まれる例外の型で判定するため、
+        大量に出力される箇所では値をf文字列ではなく引数で渡す
+        :param limit: 区間ごとに出力する件数（0以下は無制限）
+        :param interval: 集計する区間（秒）
+        """
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self._windows = {}  # 種類 -> [区間の開始時刻, 件数, 省略件数, 最後に省略したレコード]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(record: logging.LogRecord):
+        args = record.args if isinstance(record.args, tuple) else ()
+        error_types = tuple(type(arg).__name__ for arg in args if isinstance(arg, BaseException))
+        return record.name, record.levelno, str(record.msg), error_types
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or getattr(record, 'rate_limit_summary', False):
+            return True
+        key = self._key(record)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is not None and window[2]:
+                    # 前の区間の省略件数は次のflushで出力する
+                    self._windows[(key, window[0])] = window
+                window = self._windows[key] = [now, 0, 0, None]
+            window[1] += 1
+            if window[1] <= self.limit:
+                return True
+            window[2] += 1
+            window[3] = record
+            return False
+
+    def flush(self, force: bool = False):
+        """
+        区間が終わった種類の省略件数をまとめたレコードを作成する
+        :param force: 区間の途中のものも含めてすべて出力する（終了時）
+        :return: まとめのレコードのリスト
+        """
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for key, window in list(self._windows.items()):
+                started, _, suppressed, record = window
+                expired = isinstance(key[0], tuple) or now - started >= self.interval
+                if not (force or expired):
+                    continue
+                if suppressed:
+                    summaries.append(self._summary(record, suppressed, now - started))
+                if expired or force:
+                    del self._windows[key]
+        return summaries
+
+    @staticmethod
+    def _summary(record: logging.LogRecord, suppressed: int, elapsed: float) -> logging.LogRecord:
+        args = record.args if isinstance(record.args, tuple) else ()
+        error_types = ', '.join(sorted({type(arg).__name__ for arg in args if isinstance(arg, BaseException)}))
+        detail = f"（{error_types}）" if error_types else ""
+        summary = logging.LogRecord(
+            record.name, record.levelno, record.pathname, record.lineno,
+            "直近 %.0f 秒間に同じ種類のメッセージ %d 件を省略しました%s 最後の省略分: %s",
+            (elapsed, suppressed, detail, record.getMessage()), None,
+        )
+        summary.rate_limit_summary = True
+        return summary
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """キューが満杯のときINFO以下のレコードを破棄して件数を数える（処理中のスレッドを待たせない）"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _LoggingState:
+    def __init__(self):
+        self.handler = None
+        self.listener = None
+        self.rate_filter = None
+        self.stop_event = threading.Event()
+        self.flusher = None
+
+_state = _LoggingState()
+_setup_lock = threading.Lock()
+
+def _flush_summaries(force: bool = False):
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    for summary in _state.rate_filter.flush(force):
+        root.handle(summary)
+    dropped, _state.handler.dropped = _state.handler.dropped, 0
+    if dropped:
+        root.warning("ログキューが満杯のため %d 件のメッセージを破棄しました", dropped)
+
+def _run_flusher():
+    while not _state.stop_event.wait(max(min(LOG_RATE_INTERVAL, 1.0), 0.1)):
+        _flush_summaries()
+
+def setup_logging(level: str = None, log_file: str = None):
+    """
+    ログ出力を初期化する（2回目以降の呼び出しは何もしない）
+    各スレッドはキューに積むだけで戻り、コンソール・ファイルへの書き込みはバックグラウンドのスレッドで行う
+    :param level: ログレベル（省略時はLOG_LEVEL）
+    :param log_file: ログファイル（省略時はLOG_FILE）
+    """
+    with _setup_lock:
+        if _state.listener is not None:
+            return
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = [logging.StreamHandler(sys.stdout)]
+        log_file = log_file or LOG_FILE
+        if log_file:
+            handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _state.rate_filter = RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_INTERVAL)
+        _state.handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _state.handler.addFilter(_state.rate_filter)
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel(getattr(logging, level or LOG_LEVEL, logging.INFO))
+        root.addHandler(_state.handler)
+        root.propagate = False
+
+        _state.listener = logging.handlers.QueueListener(_state.handler.queue, *handlers)
+        _state.listener.start()
+        _state.flusher = threading.Thread(target=_run_flusher, name='log-flusher', daemon=True)
+        _state.flusher.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """
+    省略件数のまとめを出力し、キューに残っているログをすべて書き込んでから書き込みスレッドを停止する
+    """
+    with _setup_lock:
+        if _state.listener is None:
+            return
+        _state.stop_event.set()
+        _state.flusher.join()
+        _flush_summaries(force=True)
+        _state.listener.stop()
+        logging.getLogger(ROOT_LOGGER_NAME).removeHandler(_state.handler)
+        _state.listener = None
+        _state.stop_event = threading.Event()
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    モジュールのロガーを取得する（初回にsetup_loggingを行う）
+    :param name: モジュール名（通常は__name__）
+    """
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
@@ -1,44 +1,36 @@
-import pandas as pd
+import sys
 from excel_parser import ExcelParser, MigrationType
-from db_connector import DatabaseConnector
 import os
 from dotenv import load_dotenv
 from data_migration_onetoone import execute_one_to_one_migration
 from data_migration_onetomany import execute_one_to_many_migration
 from data_migration_manytoone import execute_many_to_one_migration
+from scheduler import MigrationScheduler, print_run_summary
+from metrics import RUN_METRICS
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 class DataMigrationExecutor:
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: str, profile: bool = False):
         """
         データ移行実行の初期化
         :param excel_path: Excel設定ファイルパス
+        :param profile: テーブルごとにCPU・メモリをプロファイルするかどうか
         """
         self.excel_path = excel_path
+        self.profile = profile
         self.parser = None
-        self.source_db = None
-        self.target_db = None
+        self.scheduler = None
 
     def initialize(self):
         """
-        データベース接続とExcelパーサーの初期化
+        Excelパーサーの初期化（データベース接続はワーカーごとに作成）
         """
         try:
             # 環境変数の読み込み
             load_dotenv()
             
-            # データベース接続の作成
-            print("\nデータベースに接続中...")
-            self.source_db = DatabaseConnector(is_source=True)
-            self.target_db = DatabaseConnector(is_source=False)
-            
-            # 验证数据库连接
-            if self.source_db is None:
-                raise Exception("ソースデータベース接続に失敗しました")
-            if self.target_db is None:
-                raise Exception("ターゲットデータベース接続に失敗しました")
-                
-            print("データベース接続が成功しました")
-            
             # 创建Excel解析器
             self.parser = ExcelParser(self.excel_path)
             
@@ -48,17 +40,15 @@ class DataMigrationExecutor:
             return True
             
         except Exception as e:
-            print(f"初期化に失敗しました: {str(e)}")
+            logger.error(f"初期化に失敗しました: {str(e)}")
             return False
 
     def cleanup(self):
         """
         リソースのクリーンアップ
         """
-        if self.source_db:
-            self.source_db.close()
-        if self.target_db:
-            self.target_db.close()
+        if self.scheduler:
+            self.scheduler.close()
 
     def execute_migration(self):
         """
@@ -68,64 +58,39 @@ class DataMigrationExecutor:
             if not self.initialize():
                 return
             
-            print("\nデータ移行を開始します...")
+            logger.info("データ移行を開始します...")
             
             # 移行対象のテーブルを取得
             migration_sheets = self.parser.get_migration_sheets()
             
-            # 移行タイプでグループ化
-            one_to_one_sheets = []
-            one_to_many_sheets = []
-            many_to_one_sheets = []
-            
-            for sheet in migration_sheets:
-                if sheet.migration_type == MigrationType.ONE_TO_ONE:
-                    one_to_one_sheets.append(sheet)
-                elif sheet.migration_type == MigrationType.ONE_TO_MANY:
-                    one_to_many_sheets.append(sheet)
-                elif sheet.migration_type == MigrationType.MANY_TO_ONE:
-                    many_to_one_sheets.append(sheet)
-            
-            # 1対1移行を開始します
-            if one_to_one_sheets:
-                print("\n=== 1対1移行を開始します ===")
-                execute_one_to_one_migration(
-                    self.excel_path,
-                    self.parser,
-                    self.source_db,
-                    self.target_db,
-                    one_to_one_sheets
-                )
-            
-            # 1対多移行を開始します
-            if one_to_many_sheets:
-                print("\n=== 1対多移行を開始します ===")
-                execute_one_to_many_migration(
-                    self.excel_path,
-                    self.parser,
-                    self.source_db,
-                    self.target_db,
-                    one_to_many_sheets
-                )
+            # 移行タイプの順に投入し、ワーカープールで並列実行
+            type_order = [MigrationType.ONE_TO_ONE, MigrationType.ONE_TO_MANY, MigrationType.MANY_TO_ONE]
+            migration_sheets = sorted(migration_sheets, key=lambda sheet: type_order.index(sheet.migration_type))
             
-            # 多対1移行を開始します
-            if many_to_one_sheets:
-                print("\n=== 多対1移行を開始します ===")
-                execute_many_to_one_migration(
-                    self.excel_path,
-                    self.parser,
-                    self.source_db,
-                    self.target_db,
-                    many_to_one_sheets
-                )
+            # プロファイル時は計測値が混ざらないようにテーブルを1つずつ移行する
+            if self.profile:
+                logger.info("プロファイルを有効にしたため、テーブルを1つずつ移行します")
+            self.scheduler = MigrationScheduler(
+                self.excel_path,
+                self.parser,
+                {
+                    MigrationType.ONE_TO_ONE: execute_one_to_one_migration,
+                    MigrationType.ONE_TO_MANY: execute_one_to_many_migration,
+                    MigrationType.MANY_TO_ONE: execute_many_to_one_migration
+                },
+                max_workers=1 if self.profile else None,
+                profile=self.profile
+            )
+            results = self.scheduler.run(migration_sheets)
+            print_run_summary(results)
             
-            print("\n全移行タスクが完了しました")
+            logger.info("全移行タスクが完了しました")
             
         except Exception as e:
-            print(f"移行中にエラーが発生しました: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"移行中にエラーが発生しました: {str(e)}")
         finally:
+            # 処理段階ごとの計測値をレポートに出力（失敗したテーブルも含める）
+            RUN_METRICS.write_report()
             self.cleanup()
 
 def main():
@@ -133,7 +98,9 @@ def main():
     メインプログラム
     """
     excel_path = "数据移行2.xlsx"
-    executor = DataMigrationExecutor(excel_path)
+    # --profile: テーブルごとにCPU・メモリをプロファイルし、profiles/に出力する
+    profile = '--profile' in sys.argv[1:]
+    executor = DataMigrationExecutor(excel_path, profile=profile)
     executor.execute_migration()
 
 if __name__ == "__main__":
@@ -1,25 +1,46 @@
+import argparse
 from db_connector2 import DatabaseConnector2
 from data_migration_manytoone2 import generate_test_data
+from data_generator import load_column_specs_from_workbook
+from excel_parser import ExcelParser
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="生成测试数据")
+    arg_parser.add_argument('table', nargs='?', default="K_KEIJO_MEISAI_TBL", help="目标表名")
+    arg_parser.add_argument('count', nargs='?', type=int, default=10000, help="生成的数据条数")
+    arg_parser.add_argument('--excel', help="映射Excel路径（指定时从字段映射sheet读取列定义，否则读取目标表结构）")
+    arg_parser.add_argument('--mapping', help="マッピング一覧的次期DB物理名（省略时与表名相同）")
+    arg_parser.add_argument('--workers', type=int, help="并行写入的线程数（默认DATAGEN_WORKERS）")
+    arg_parser.add_argument('--batch-size', type=int, help="每批行数（默认DATAGEN_BATCH_SIZE）")
+    arg_parser.add_argument('--seed', type=int, help="随机数种子（默认DATAGEN_SEED）")
+    return arg_parser.parse_args()
 
 def main():
     """
     主函数
     """
+    args = parse_args()
     try:
         print("\n开始生成测试数据...")
-        
+
         # 创建数据库连接
         print("\n正在连接数据库...")
         target_db = DatabaseConnector2()
-        
+
         if not target_db.test_connection():
             raise Exception("目标数据库连接失败")
-            
+
         print("数据库连接成功")
-        
-        # 生成测试数据
-        generate_test_data(target_db, "K_KEIJO_MEISAI_TBL", 10000)
-        
+
+        # 读取列定义
+        specs = None
+        if args.excel:
+            specs = load_column_specs_from_workbook(ExcelParser(args.excel), args.mapping or args.table)
+
+        # 生成测试数据（各线程使用独立的连接）
+        generate_test_data(target_db, args.table, args.count, specs=specs, connection_factory=DatabaseConnector2,
+                           batch_size=args.batch_size, workers=args.workers, seed=args.seed)
+
     except Exception as e:
         print(f"发生错误: {str(e)}")
         import traceback
@@ -30,4 +51,4 @@ def main():
             target_db.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
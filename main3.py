@@ -1,17 +1,35 @@
 import sys
+import time
+import datetime
+import pandas as pd
+from pathlib import Path
 from excel_parser import ExcelParser, MigrationSheet, MigrationType
 from db_connector import DatabaseConnector
 from data_migration_onetoone3 import execute_one_to_one_migration
 from data_migration_onetomany import execute_one_to_many_migration
 from data_migration_manytoone import execute_many_to_one_migration
+from metrics import RUN_METRICS
+from profiling import profile_table
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 class DataMigrationExecutor:
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: str, resume: bool = False, incremental: bool = False, validate_only: bool = False,
+                 profile: bool = False):
         """
         データ移行実行クラスの初期化
         :param excel_path: Excelファイルパス
+        :param resume: 1対1移行をチェックポイントの続きから再開するかどうか
+        :param incremental: 1対1移行を前回のハイウォーターマーク以降の差分だけで実行するかどうか
+        :param validate_only: 移行せずにソーステーブルの事前検証だけを行うかどうか
+        :param profile: 移行処理のCPU・メモリをプロファイルするかどうか
         """
         self.excel_path = excel_path
+        self.resume = resume
+        self.incremental = incremental
+        self.validate_only = validate_only
+        self.profile = profile
         self.parser = None
         self.source_db = None
         self.target_db = None
@@ -34,13 +52,11 @@ class DataMigrationExecutor:
                 raise Exception("ソースデータベース接続に失敗しました")
             if self.target_db is None:
                 raise Exception("ターゲットデータベース接続に失敗しました")
-            print("データベース接続が成功しました")
+            logger.info("データベース接続が成功しました")
             return True
             
         except Exception as e:
-            print(f"初期化に失敗しました: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"初期化に失敗しました: {str(e)}")
             return False
     
     def cleanup(self):
@@ -53,7 +69,44 @@ class DataMigrationExecutor:
             if self.target_db:
                 self.target_db.close()
         except Exception as e:
-            print(f"リソースのクリーンアップ中にエラーが発生しました: {str(e)}")
+            logger.error(f"リソースのクリーンアップ中にエラーが発生しました: {str(e)}")
+    
+    def validate_source(self, migration_sheet: MigrationSheet):
+        """
+        ソーステーブル全体を移行時と同じ型変換で事前検証する（データは挿入しない）
+        :param migration_sheet: 検証対象のテーブル設定
+        """
+        if migration_sheet.migration_type == MigrationType.MANY_TO_ONE:
+            logger.warning("多対1移行の事前検証はサポートされていません")
+            return
+        
+        rules = self.parser.get_validation_rules(migration_sheet.logical_name)
+        columns = list(dict.fromkeys(source_column for source_column, _, _ in rules))
+        if not columns:
+            logger.warning("  検証対象のフィールドが見つかりません")
+            return
+        
+        logger.info(f"=== ソーステーブル {migration_sheet.source_name} の事前検証を開始します ===")
+        start_time = time.time()
+        query = f"SELECT {', '.join(columns)} FROM {migration_sheet.source_name}"
+        batches = (
+            pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+            for rows in self.source_db.fetch_iter(query)
+        )
+        report = self.parser.prevalidate_table(migration_sheet.logical_name, batches)
+        
+        logger.info(f"  検証行数: {report.total_rows}")
+        logger.info(f"  無効な行数: {report.invalid_rows}")
+        logger.info(f"  処理時間: {time.time() - start_time:.1f} 秒")
+        if report.counts:
+            logger.info("  列ごとの無効件数:")
+            for (source_column, reason), count in sorted(report.counts.items()):
+                logger.info(f"    {source_column} ({reason}): {count} 件")
+            report_dir = Path("error_logs")
+            report_dir.mkdir(exist_ok=True)
+            report_file = report_dir / f"validation_{migration_sheet.source_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            self.parser.save_invalid_data(report.samples, str(report_file))
+            logger.info(f"  無効データレポート（先頭 {len(report.samples)} 件）: {report_file}")
     
     def execute_migration(self, mapping_name: str):
         """
@@ -64,47 +117,55 @@ class DataMigrationExecutor:
             if not self.initialize():
                 return
             
-            print("\nデータ移行を開始します...")
+            logger.info("データ移行を開始します...")
             
             # 指定された移行設定の取得
             migration_sheet = self.parser.parse_mapping_data_to_run(mapping_name)
             
-            # 移行タイプに応じた移行の実行
-            if migration_sheet.migration_type == MigrationType.ONE_TO_ONE:
-                print("\n=== 1対1移行を開始します ===")
-                execute_one_to_one_migration(
-                    self.excel_path,
-                    self.parser,
-                    self.source_db,
-                    self.target_db,
-                    [migration_sheet]
-                )
-            elif migration_sheet.migration_type == MigrationType.ONE_TO_MANY:
-                print("\n=== 1対多移行を開始します ===")
-                execute_one_to_many_migration(
-                    self.excel_path,
-                    self.parser,
-                    self.source_db,
-                    self.target_db,
-                    [migration_sheet]
-                )
-            elif migration_sheet.migration_type == MigrationType.MANY_TO_ONE:
-                print("\n=== 多対1移行を開始します ===")
-                execute_many_to_one_migration(
-                    self.excel_path,
-                    self.parser,
-                    self.source_db,
-                    self.target_db,
-                    [migration_sheet]
-                )
+            # 事前検証のみの場合は移行しない
+            if self.validate_only:
+                self.validate_source(migration_sheet)
+                return
+            
+            # 移行タイプに応じた移行の実行（--profile指定時はCPU・メモリをプロファイルする）
+            with profile_table(migration_sheet.logical_name, self.profile):
+                if migration_sheet.migration_type == MigrationType.ONE_TO_ONE:
+                    logger.info("=== 1対1移行を開始します ===")
+                    execute_one_to_one_migration(
+                        self.excel_path,
+                        self.parser,
+                        self.source_db,
+                        self.target_db,
+                        [migration_sheet],
+                        resume=self.resume,
+                        incremental=self.incremental
+                    )
+                elif migration_sheet.migration_type == MigrationType.ONE_TO_MANY:
+                    logger.info("=== 1対多移行を開始します ===")
+                    execute_one_to_many_migration(
+                        self.excel_path,
+                        self.parser,
+                        self.source_db,
+                        self.target_db,
+                        [migration_sheet]
+                    )
+                elif migration_sheet.migration_type == MigrationType.MANY_TO_ONE:
+                    logger.info("=== 多対1移行を開始します ===")
+                    execute_many_to_one_migration(
+                        self.excel_path,
+                        self.parser,
+                        self.source_db,
+                        self.target_db,
+                        [migration_sheet]
+                    )
             
-            print("\nデータ移行が完了しました")
+            logger.info("データ移行が完了しました")
             
         except Exception as e:
-            print(f"データ移行中にエラーが発生しました: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"データ移行中にエラーが発生しました: {str(e)}")
         finally:
+            # 処理段階ごとの計測値をレポートに出力（事前検証のみの場合は計測値がないため出力しない）
+            RUN_METRICS.write_report()
             self.cleanup()
 
 def main():
@@ -112,16 +173,29 @@ def main():
     メイン関数
     """
     # コマンドライン引数のチェック
-    if len(sys.argv) != 2:
-        print("使用方法: python main3.py <マッピング一覧名称>")
+    options = {'--resume', '--incremental', '--validate', '--profile'}
+    args = sys.argv[1:]
+    resume = '--resume' in args
+    incremental = '--incremental' in args
+    validate_only = '--validate' in args
+    profile = '--profile' in args
+    args = [arg for arg in args if arg not in options]
+    if len(args) != 1:
+        print("使用方法: python main3.py <マッピング一覧名称> [--resume] [--incremental] [--validate] [--profile]")
+        print("  --resume: 中断した1対1移行を最後にコミットしたバッチの続きから再開する")
+        print("            （コミット直後に中断したバッチの行はMERGEで書き込む。挿入対象にキー列がない場合は重複する場合がある）")
+        print("  --incremental: 前回の実行以降に更新された行（Watermark列で判定）だけをアップサートする")
+        print("  --validate: 移行せずにソーステーブルを事前検証し、無効データレポートを出力する")
+        print("  --profile: 移行処理のCPU・メモリをプロファイルし、profiles/に出力する")
         sys.exit(1)
     
     # マッピング名パラメータの取得
-    mapping_name = sys.argv[1]
+    mapping_name = args[0]
     # mapping_name="dbo.AccountingDetailTbl"
     excel_path = "数据移行2.xlsx"
     # 移行の実行
-    executor = DataMigrationExecutor(excel_path)
+    executor = DataMigrationExecutor(excel_path, resume=resume, incremental=incremental, validate_only=validate_only,
+                                     profile=profile)
     executor.execute_migration(mapping_name)
 
 if __name__ == "__main__":
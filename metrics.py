@@ -0,0 +1,167 @@
+import datetime
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+from adaptive_batch import estimate_batch_bytes
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# 実行レポート（JSON）の出力ディレクトリ
+METRICS_REPORT_DIR = os.getenv('METRICS_REPORT_DIR', 'reports')
+# Prometheusのtextfile形式で出力するファイル（node_exporterのtextfileコレクター用、未設定の場合は出力しない）
+METRICS_PROMETHEUS_FILE = os.getenv('METRICS_PROMETHEUS_FILE')
+
+# 計測する処理段階（読み取り・変換・挿入・コミット）と、ボトルネックの判定先
+STAGES = ('fetch', 'convert', 'insert', 'commit')
+_BOUND_BY_STAGE = {'fetch': 'source', 'convert': 'conversion', 'insert': 'target', 'commit': 'target'}
+
+class TableMetrics:
+    def __init__(self, name: str):
+        """
+        1テーブル分の処理段階ごとの計測値（範囲ワーカー・パイプラインのスレッド間で共有する）
+        :param name: テーブルの論理名
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._stages = {stage: {'seconds': 0.0, 'calls': 0, 'rows': 0, 'bytes': 0} for stage in STAGES}
+        self._first = None
+        self._last = None
+
+    def record(self, stage: str, seconds: float, rows: int = 0, bytes_count: int = 0):
+        """
+        1回分の処理時間と件数を加算する
+        :param stage: 処理段階（fetch / convert / insert / commit）
+        :param seconds: 処理時間（秒）
+        :param rows: 処理した行数
+        :param bytes_count: 処理したデータの推定バイト数
+        """
+        now = time.time()
+        with self._lock:
+            values = self._stages[stage]
+            values['seconds'] += seconds
+            values['calls'] += 1
+            values['rows'] += rows
+            values['bytes'] += bytes_count
+            if self._first is None:
+                self._first = now - seconds
+            self._last = now
+
+    def record_rows(self, stage: str, seconds: float, rows: Sequence[Sequence[Any]]):
+        """
+        行のリストから件数と推定バイト数を求めて加算する
+        """
+        self.record(stage, seconds, len(rows), estimate_batch_bytes(rows))
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for stage, values in self._stages.items():
+                stages[stage] = dict(values, seconds=round(values['seconds'], 3))
+                stages[stage]['rows_per_second'] = round(values['rows'] / values['seconds'], 1) if values['seconds'] else None
+            elapsed = (self._last - self._first) if self._first is not None else 0.0
+        # 最も時間のかかった段階をボトルネックとする（パイプラインでは各段が並行するため合計時間で比較する）
+        bound_seconds = {}
+        for stage, values in stages.items():
+            bound = _BOUND_BY_STAGE[stage]
+            bound_seconds[bound] = bound_seconds.get(bound, 0.0) + values['seconds']
+        bottleneck = max(bound_seconds, key=bound_seconds.get) if any(bound_seconds.values()) else None
+        return {
+            'table': self.name,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_fetched': stages['fetch']['rows'],
+            'rows_inserted': stages['commit']['rows'],
+            'bottleneck': bottleneck,
+            'stages': stages
+        }
+
+class RunMetrics:
+    def __init__(self):
+        """
+        1回の実行（main.py / main3.py）全体の計測値
+        """
+        self.started_at = datetime.datetime.now()
+        self._lock = threading.Lock()
+        self._tables: Dict[str, TableMetrics] = {}
+
+    def table(self, name: str) -> TableMetrics:
+        """
+        テーブルの計測値を取得（初回のみ作成）
+        :param name: テーブルの論理名
+        """
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = TableMetrics(name)
+            return self._tables[name]
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            tables = list(self._tables.values())
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'tables': [table.to_dict() for table in tables]
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheusのテキスト形式に変換する
+        """
+        report = self.to_dict()
+        lines = []
+        metrics = [
+            ('migration_stage_seconds_total', 'counter', '処理段階ごとの処理時間（秒）', 'seconds'),
+            ('migration_stage_calls_total', 'counter', '処理段階ごとの実行回数', 'calls'),
+            ('migration_stage_rows_total', 'counter', '処理段階ごとの行数', 'rows'),
+            ('migration_stage_bytes_total', 'counter', '処理段階ごとの推定バイト数', 'bytes'),
+        ]
+        for metric, metric_type, help_text, key in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for table in report['tables']:
+                for stage, values in table['stages'].items():
+                    lines.append(f'{metric}{{table="{_escape_label(table["table"])}",stage="{stage}"}} {values[key]}')
+        lines.append("# HELP migration_table_elapsed_seconds テーブルの移行にかかった時間（秒）")
+        lines.append("# TYPE migration_table_elapsed_seconds gauge")
+        for table in report['tables']:
+            lines.append(f'migration_table_elapsed_seconds{{table="{_escape_label(table["table"])}"}} {table["elapsed_seconds"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, report_dir: str = None, prometheus_file: Optional[str] = None) -> Optional[Path]:
+        """
+        テーブルごとの計測値をJSONレポートに出力し、設定されている場合はPrometheusのtextfileも出力する
+        :param report_dir: 出力ディレクトリ（省略時はMETRICS_REPORT_DIR）
+        :param prometheus_file: Prometheusのtextfileのパス（省略時はMETRICS_PROMETHEUS_FILE）
+        :return: JSONレポートのパス、計測値がない場合はNone
+        """
+        report = self.to_dict()
+        if not report['tables']:
+            return None
+        directory = Path(report_dir or METRICS_REPORT_DIR)
+        directory.mkdir(exist_ok=True)
+        report_path = directory / f"run_report_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        logger.info(f"実行レポート: {report_path}")
+        for table in report['tables']:
+            stages = ', '.join(f"{stage} {values['seconds']:.1f}秒" for stage, values in table['stages'].items())
+            logger.info(f"  {table['table']}: {stages}（ボトルネック: {table['bottleneck']}）")
+
+        prometheus_file = prometheus_file or METRICS_PROMETHEUS_FILE
+        if prometheus_file:
+            # 収集中に書きかけのファイルを読まれないよう、一時ファイルに書いてから置き換える
+            temp_path = f"{prometheus_file}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(temp_path, prometheus_file)
+            logger.info(f"Prometheusメトリクス: {prometheus_file}")
+        return report_path
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# 実行全体で共有する計測値
+RUN_METRICS = RunMetrics()
@@ -0,0 +1,168 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable
+
+# ステージの終了を表す番兵
+_END = object()
+
+def run_pipeline(source: Iterable, convert: Callable[[Any], Any], write: Callable[[Any], None], queue_size: int = 2):
+    """
+    読み取り → 変換 → 書き込みの3段パイプラインを実行する
+    読み取りと書き込みは専用スレッド、変換は呼び出し元スレッドで実行し、
+    バッチN+1の読み取り・バッチNの変換・バッチN-1の書き込みを並行させる。
+    段間のキューはqueue_sizeで上限を設けるため、保持するバッチ数は一定に収まる。
+    いずれかの段で例外が発生した場合は全段を停止し、最初の例外を再送出する。
+    :param source: バッチを順に返すイテラブル（読み取りスレッドで反復される）
+    :param convert: バッチの変換関数
+    :param write: 変換済みバッチの書き込み関数（書き込みスレッドで順番どおりに呼ばれる）
+    :param queue_size: 段間キューの最大バッチ数（0以下の場合は逐次実行）
+    """
+    if queue_size <= 0:
+        for batch in source:
+            write(convert(batch))
+        return
+
+    read_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    errors = []
+
+    def put(target_queue, item):
+        # キューに空きができるか停止要求が出るまで待つ
+        while not stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(source_queue):
+        # 停止要求が出た場合は番兵を返す
+        while True:
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                if stop_event.is_set():
+                    return _END
+
+    def fail(e):
+        errors.append(e)
+        stop_event.set()
+
+    def reader():
+        try:
+            for batch in source:
+                if not put(read_queue, batch):
+                    break
+            put(read_queue, _END)
+        except Exception as e:
+            fail(e)
+        finally:
+            if hasattr(source, 'close'):
+                source.close()
+
+    def writer():
+        try:
+            while True:
+                batch = get(write_queue)
+                if batch is _END:
+                    break
+                write(batch)
+        except Exception as e:
+            fail(e)
+
+    reader_thread = threading.Thread(target=reader, name='pipeline-reader', daemon=True)
+    writer_thread = threading.Thread(target=writer, name='pipeline-writer', daemon=True)
+    reader_thread.start()
+    writer_thread.start()
+    try:
+        while True:
+            batch = get(read_queue)
+            if batch is _END:
+                break
+            if not put(write_queue, convert(batch)):
+                break
+        put(write_queue, _END)
+    except BaseException as e:
+        fail(e)
+    finally:
+        reader_thread.join()
+        writer_thread.join()
+
+    if errors:
+        raise errors[0]
+
+def run_fanout(source: Iterable, route: Callable[[Any], Dict[Any, Any]], writers: Dict[Any, Callable[[Any], None]], queue_size: int = 2):
+    """
+    1回の読み取りを複数の書き込み先へ振り分けるファンアウトを実行する
+    読み取りと振り分け（変換）は呼び出し元スレッド、書き込みは書き込み先ごとの専用スレッドで実行し、
+    各書き込み先は自分のキューのバッチを順番どおりに並行して書き込む。
+    キューはqueue_sizeで上限を設けるため、最も遅い書き込み先に合わせて読み取りが待機する。
+    いずれかの書き込み先で例外が発生した場合は全体を停止し、最初の例外を再送出する。
+    :param source: バッチを順に返すイテラブル
+    :param route: バッチを書き込み先ごとのバッチ {書き込み先キー: バッチ} に変換する関数
+    :param writers: 書き込み先キーごとの書き込み関数（それぞれ専用スレッドで呼ばれる）
+    :param queue_size: 書き込み先ごとのキューの最大バッチ数（0以下の場合は逐次実行）
+    """
+    if queue_size <= 0:
+        for batch in source:
+            for key, routed in route(batch).items():
+                writers[key](routed)
+        return
+
+    queues = {key: queue.Queue(maxsize=queue_size) for key in writers}
+    stop_event = threading.Event()
+    errors = []
+
+    def put(target_queue, item):
+        while not stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def writer(key):
+        write = writers[key]
+        source_queue = queues[key]
+        try:
+            while True:
+                try:
+                    batch = source_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if stop_event.is_set():
+                        break
+                    continue
+                if batch is _END:
+                    break
+                write(batch)
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    threads = [threading.Thread(target=writer, args=(key,), name=f'fanout-writer-{i}', daemon=True)
+               for i, key in enumerate(writers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for batch in source:
+            if stop_event.is_set():
+                break
+            for key, routed in route(batch).items():
+                if not put(queues[key], routed):
+                    break
+        for target_queue in queues.values():
+            put(target_queue, _END)
+    except BaseException as e:
+        errors.append(e)
+        stop_event.set()
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
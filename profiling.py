@@ -0,0 +1,161 @@
+import contextlib
+import cProfile
+import datetime
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# プロファイル結果の出力ディレクトリ
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# サンプリングの間隔（秒）
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+# レポートに出力する関数の数
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '20'))
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+class TableProfiler:
+    def __init__(self, name: str, output_dir: str = None, interval: float = None, top_n: int = None):
+        """
+        1テーブルの移行処理のプロファイラー（withブロック内の処理を計測する）
+        - CPU: 呼び出し元スレッドをcProfileで計測し、パイプライン・範囲並列などの全スレッドをスタックのサンプリングで計測する
+        - メモリ: tracemallocでピークメモリと確保箇所を計測する
+        終了時に <テーブル名>_<日時>.prof（cProfile）、.folded（サンプリングしたスタック、フレームグラフ用）、
+        .txt（上位の関数とメモリのレポート）を出力する
+        テーブルを並列に移行すると計測値が混ざるため、テーブルを1つずつ移行するときに使用する
+        :param name: テーブルの論理名
+        :param output_dir: 出力ディレクトリ（省略時はPROFILE_DIR）
+        :param interval: サンプリングの間隔（秒、省略時はPROFILE_INTERVAL）
+        :param top_n: レポートに出力する関数の数（省略時はPROFILE_TOP_N）
+        """
+        self.name = name
+        self.output_dir = Path(output_dir or PROFILE_DIR)
+        self.interval = interval or PROFILE_INTERVAL
+        self.top_n = top_n or PROFILE_TOP_N
+        self._profile = cProfile.Profile()
+        self._stacks = Counter()  # (スレッド名, フレーム...) ごとのサンプル数
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+        self._started = None
+        self.elapsed = 0.0
+        self.peak_memory = 0
+        self._snapshot = None
+
+    def _sample(self):
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(re.sub(r'[-_]\d+$', '', names.get(ident, str(ident))))
+                self._stacks[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+        self._sampler.start()
+        self._started = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._profile.disable()
+        self.elapsed = time.perf_counter() - self._started
+        self._stop_event.set()
+        self._sampler.join()
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        self._snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        try:
+            self.write()
+        except Exception as e:
+            logger.error(f"プロファイルの出力に失敗しました: {str(e)}")
+        return False
+
+    def hot_functions(self):
+        """
+        サンプリング結果の上位の関数
+        :return: (自身の処理中のサンプル数の上位, 呼び出し中を含むサンプル数の上位)、いずれも [(関数, サンプル数), ...]
+        """
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                total_counts[label] += count
+        return self_counts.most_common(self.top_n), total_counts.most_common(self.top_n)
+
+    def write(self):
+        """
+        プロファイル結果をファイルに出力し、概要を表示する
+        """
+        self.output_dir.mkdir(exist_ok=True)
+        safe_name = re.sub(r'[^\w.-]', '_', self.name)
+        base = self.output_dir / f"{safe_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        self._profile.dump_stats(f"{base}.prof")
+        with open(f"{base}.folded", 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+        sample_count = sum(self._stacks.values())
+        self_top, total_top = self.hot_functions()
+        lines = [
+            f"テーブル: {self.name}",
+            f"処理時間: {self.elapsed:.2f} 秒",
+            f"ピークメモリ: {self.peak_memory / 1024 / 1024:.1f} MB",
+            f"サンプル数: {sample_count}（間隔 {self.interval * 1000:.0f} ms、全スレッド）",
+            "",
+            "== 自身の処理中のサンプル数の上位（待機中を含む） ==",
+        ]
+        lines += [f"{count:8d} {count / sample_count * 100:6.1f}%  {label}" for label, count in self_top] if sample_count else []
+        lines += ["", "== 呼び出し中を含むサンプル数の上位 =="]
+        lines += [f"{count:8d} {count / sample_count * 100:6.1f}%  {label}" for label, count in total_top] if sample_count else []
+        lines += ["", "== メモリ確保箇所の上位（終了時点） =="]
+        lines += [str(stat) for stat in self._snapshot.statistics('lineno')[:self.top_n]]
+        lines += ["", "== cProfile（呼び出し元スレッド、累積時間順） =="]
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(self.top_n)
+        lines.append(stream.getvalue())
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+        logger.info(f"プロファイル: {base}.txt（ピークメモリ {self.peak_memory / 1024 / 1024:.1f} MB）")
+        for label, count in self_top[:5]:
+            logger.info(f"  {count / sample_count * 100:5.1f}%  {label}")
+
+def profile_table(name: str, enabled: bool):
+    """
+    テーブルの移行処理を計測するコンテキストマネージャーを取得
+    無効の場合は何もしないコンテキストマネージャーを返す（オーバーヘッドなし）
+    :param name: テーブルの論理名
+    :param enabled: プロファイルするかどうか
+    """
+    if not enabled:
+        return contextlib.nullcontext()
+    return TableProfiler(name)
@@ -0,0 +1,146 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from excel_parser import MigrationSheet, MigrationType
+from db_connector import DatabaseConnector
+from config import MIGRATION_WORKERS
+from profiling import profile_table
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass
+class TableResult:
+    """テーブル単位の移行結果"""
+    logical_name: str           # 次期DB論理名
+    migration_type: MigrationType
+    success: bool               # 移行が成功したかどうか
+    row_count: int = 0          # 挿入件数
+    elapsed: float = 0.0        # 処理時間（秒）
+    error: Optional[str] = None  # エラーメッセージ
+
+class MigrationScheduler:
+    def __init__(self, excel_path: str, parser, migration_functions: Dict[MigrationType, Callable],
+                 max_workers: int = None, profile: bool = False):
+        """
+        テーブル並列移行スケジューラーの初期化
+        :param excel_path: Excelファイルパス
+        :param parser: Excelパーサーインスタンス
+        :param migration_functions: 移行タイプごとの移行関数
+        :param max_workers: 同時実行数（省略時はMIGRATION_WORKERS）
+        :param profile: テーブルごとにCPU・メモリをプロファイルするかどうか
+        """
+        self.excel_path = excel_path
+        self.parser = parser
+        self.migration_functions = migration_functions
+        self.max_workers = max_workers or MIGRATION_WORKERS
+        self.profile = profile
+        self._local = threading.local()
+        self._connections: List[DatabaseConnector] = []
+        self._lock = threading.Lock()
+
+    def _get_connections(self):
+        """
+        ワーカースレッド専用のソース/ターゲット接続を取得（初回のみ作成）
+        :return: (ソース接続, ターゲット接続)
+        """
+        if getattr(self._local, 'source_db', None) is None:
+            self._local.source_db = DatabaseConnector(is_source=True)
+            self._local.target_db = DatabaseConnector(is_source=False)
+            with self._lock:
+                self._connections.extend([self._local.source_db, self._local.target_db])
+        return self._local.source_db, self._local.target_db
+
+    def _reset_connections(self):
+        """
+        ワーカースレッドの接続を破棄（失敗したテーブルの後に再接続させる）
+        """
+        for db in (getattr(self._local, 'source_db', None), getattr(self._local, 'target_db', None)):
+            if db:
+                try:
+                    db.close()
+                except Exception:
+                    pass
+        self._local.source_db = None
+        self._local.target_db = None
+
+    def _run_sheet(self, sheet: MigrationSheet) -> TableResult:
+        """
+        1テーブルの移行を実行
+        :param sheet: 移行対象のテーブル設定
+        :return: 移行結果
+        """
+        start_time = time.time()
+        try:
+            source_db, target_db = self._get_connections()
+            migrate = self.migration_functions[sheet.migration_type]
+            with profile_table(sheet.logical_name, self.profile):
+                row_counts = migrate(self.excel_path, self.parser, source_db, target_db, [sheet]) or {}
+            return TableResult(
+                logical_name=sheet.logical_name,
+                migration_type=sheet.migration_type,
+                success=True,
+                row_count=row_counts.get(sheet.logical_name, 0),
+                elapsed=time.time() - start_time
+            )
+        except Exception as e:
+            self._reset_connections()
+            return TableResult(
+                logical_name=sheet.logical_name,
+                migration_type=sheet.migration_type,
+                success=False,
+                elapsed=time.time() - start_time,
+                error=str(e)
+            )
+
+    def run(self, sheets: List[MigrationSheet]) -> List[TableResult]:
+        """
+        テーブルを並列に移行
+        :param sheets: 移行対象のテーブル設定リスト
+        :return: 移行結果リスト（入力順）
+        """
+        results = []
+        logger.info(f"{len(sheets)} テーブルを {self.max_workers} 並列で移行します")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='migration') as executor:
+                futures = [executor.submit(self._run_sheet, sheet) for sheet in sheets]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+                    status = "成功" if result.success else f"失敗: {result.error}"
+                    logger.info(f"[{len(results)}/{len(sheets)}] {result.logical_name} {status} "
+                                f"({result.row_count} 件, {result.elapsed:.1f} 秒)")
+        finally:
+            self.close()
+
+        order = {sheet.logical_name: i for i, sheet in enumerate(sheets)}
+        results.sort(key=lambda result: order[result.logical_name])
+        return results
+
+    def close(self):
+        """
+        全ワーカーの接続をクローズ
+        """
+        with self._lock:
+            for db in self._connections:
+                try:
+                    db.close()
+                except Exception as e:
+                    logger.error(f"接続のクローズ中にエラーが発生しました: {str(e)}")
+            self._connections = []
+
+def print_run_summary(results: List[TableResult]):
+    """
+    移行結果のサマリーを出力
+    :param results: 移行結果リスト
+    """
+    failed = [result for result in results if not result.success]
+    logger.info("=== 移行結果サマリー ===")
+    logger.info(f"  対象テーブル数: {len(results)}")
+    logger.info(f"  成功: {len(results) - len(failed)}")
+    logger.info(f"  失敗: {len(failed)}")
+    logger.info(f"  挿入件数合計: {sum(result.row_count for result in results)}")
+    for result in failed:
+        logger.error(f"  失敗テーブル: {result.logical_name} ({result.migration_type.value}) - {result.error}")
@@ -0,0 +1,18 @@
+import sqlite3
+from data_migration_onetoone3 import _check_key_columns
+from db_connector import DatabaseConnector
+
+def test_check_key_columns_rejects_duplicates_and_nulls(tmp_path):
+    path = tmp_path / 'source.db'
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE S (ID INTEGER PRIMARY KEY, CODE INTEGER, SEQ INTEGER)")
+        conn.executemany("INSERT INTO S VALUES (?, ?, ?)", [(1, 1, 1), (2, 1, 2), (3, None, 3), (4, 2, 4)])
+    source_db = DatabaseConnector(config={'backend': 'sqlite', 'database': str(path)})
+    try:
+        # 重複する値とNULLを含む列、NULLを含む複合キーは使えない
+        assert not _check_key_columns(source_db, 'dbo.S', ['CODE'])
+        assert not _check_key_columns(source_db, 'dbo.S', ['CODE', 'SEQ'])
+        assert _check_key_columns(source_db, 'dbo.S', ['SEQ'])
+        assert _check_key_columns(source_db, 'dbo.S', ['ID'], check_unique=False)
+    finally:
+        source_db.close()
@@ -0,0 +1,116 @@
+import sqlite3
+import pytest
+import data_migration_onetoone3 as onetoone3
+from checkpoint import CheckpointStore
+from db_connector import DatabaseConnector
+from error_sink import ErrorSink
+from excel_parser import MigrationSheet, MigrationType
+from incremental import build_upsert_query
+from util import compile_converter
+
+ROW_COUNT = 25
+
+class CrashAfterCommit(Exception):
+    """コミット後・チェックポイント記録前の中断を再現する例外"""
+
+def _create_databases(tmp_path):
+    source_path = tmp_path / 'source.db'
+    target_path = tmp_path / 'target.db'
+    with sqlite3.connect(source_path) as conn:
+        conn.execute("CREATE TABLE S (ID INTEGER PRIMARY KEY, NAME TEXT)")
+        conn.executemany("INSERT INTO S VALUES (?, ?)", [(i, f"name{i}") for i in range(1, ROW_COUNT + 1)])
+    with sqlite3.connect(target_path) as conn:
+        conn.execute("CREATE TABLE T (ID INTEGER PRIMARY KEY, NAME TEXT)")
+    return source_path, target_path
+
+def _build_plan(tmp_path, target_db, checkpoint, batch_size):
+    insert_fields = ['ID', 'NAME']
+    return onetoone3.TablePlan(
+        sheet=MigrationSheet('L', 'dbo.T', 'dbo.S', MigrationType.ONE_TO_ONE),
+        column_plan=[
+            ('ID', 'ID', 0, compile_converter({'data_type': 'int', 'default_value': None})),
+            ('NAME', 'NAME', 1, compile_converter({'data_type': 'nvarchar(20)', 'default_value': None})),
+        ],
+        select_columns=['ID', 'NAME'],
+        key_columns=['ID'],
+        insert_query="INSERT INTO dbo.T (ID, NAME) VALUES (?, ?)",
+        batch_size=batch_size,
+        queue_size=0,
+        error_sink=ErrorSink(tmp_path / 'error_log.csv'),
+        checkpoint=checkpoint,
+        replay_query=build_upsert_query('dbo.T', insert_fields, ['ID'], target_db.dialect),
+    )
+
+def test_resume_after_crash_upserts_in_flight_batch(tmp_path, monkeypatch):
+    source_path, target_path = _create_databases(tmp_path)
+    source_db = DatabaseConnector(config={'backend': 'sqlite', 'database': str(source_path)})
+    target_db = DatabaseConnector(config={'backend': 'sqlite', 'database': str(target_path)})
+    checkpoint = CheckpointStore(tmp_path / 'checkpoint.db')
+    checkpoint.start_table('L', ['ID'])
+    try:
+        # 2バッチ目のコミット直後に中断する
+        plan = _build_plan(tmp_path, target_db, checkpoint, 10)
+        bulk_insert = target_db.bulk_insert
+        calls = []
+
+        def crashing_bulk_insert(*args, **kwargs):
+            count = bulk_insert(*args, **kwargs)
+            calls.append(count)
+            if len(calls) == 2:
+                raise CrashAfterCommit()
+            return count
+
+        monkeypatch.setattr(target_db, 'bulk_insert', crashing_bulk_insert)
+        progress, _ = onetoone3._load_progress(plan)
+        with pytest.raises(CrashAfterCommit):
+            onetoone3._copy_range(source_db, target_db, plan, progress)
+        monkeypatch.undo()
+
+        progress, done = onetoone3._load_progress(plan)
+        assert not done
+        assert progress['offset'] == 10
+        assert progress['pending_offset'] == 20
+
+        # 小さいバッチで再開しても、コミット済みだった行は重複もエラーもなく書き込まれる
+        plan = _build_plan(tmp_path, target_db, checkpoint, 4)
+        onetoone3._copy_range(source_db, target_db, plan, progress)
+        plan.error_sink.close()
+
+        rows = target_db.fetch_all("SELECT ID, NAME FROM dbo.T ORDER BY ID")
+        assert [tuple(row) for row in rows] == [(i, f"name{i}") for i in range(1, ROW_COUNT + 1)]
+        assert progress['errors'] == 0
+        assert progress['pending_offset'] is None
+    finally:
+        checkpoint.close()
+        source_db.close()
+        target_db.close()
+
+def test_incremental_upsert_updates_existing_rows(tmp_path):
+    _, target_path = _create_databases(tmp_path)
+    target_db = DatabaseConnector(config={'backend': 'sqlite', 'database': str(target_path)})
+    try:
+        target_db.bulk_insert("INSERT INTO dbo.T (ID, NAME) VALUES (?, ?)", [[1, 'old'], [2, 'old']])
+        query = build_upsert_query('dbo.T', ['ID', 'NAME'], ['ID'], target_db.dialect)
+        errors = []
+        count = target_db.bulk_insert(query, [[2, 'new'], [3, 'new']], on_error=lambda *error: errors.append(error))
+        assert count == 2 and not errors
+        rows = target_db.fetch_all("SELECT ID, NAME FROM dbo.T ORDER BY ID")
+        assert [tuple(row) for row in rows] == [(1, 'old'), (2, 'new'), (3, 'new')]
+    finally:
+        target_db.close()
+
+def test_checkpoint_records_migration_mode(tmp_path):
+    path = tmp_path / 'checkpoint.db'
+    # 移行方式の列がない旧形式のファイル
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE tables (table_name TEXT PRIMARY KEY, key_columns TEXT, bounds BLOB, status TEXT, updated_at TEXT)"
+        )
+        conn.execute("INSERT INTO tables VALUES ('OLD', 'ID', NULL, 'running', '')")
+    checkpoint = CheckpointStore(path)
+    try:
+        assert checkpoint.get_table('OLD')['mode'] == 'full'
+        checkpoint.start_table('L', ['ID'], mode='incremental')
+        assert checkpoint.get_table('L')['mode'] == 'incremental'
+    finally:
+        checkpoint.close()
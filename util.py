@@ -1,4 +1,333 @@
+import os
+import threading
+import warnings
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# 需要缓存转换结果的类型（解析开销大、且源数据多为低基数的列）
+CACHED_KINDS = ('date', 'int', 'decimal')
+
+class ConversionCache:
+    def __init__(self, maxsize: int):
+        """
+        有上限的LRU转换缓存，键为 (data_type, 原始值的类型, 原始值)
+        :param maxsize: 最大条目数（0表示不缓存）
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        批量查找
+        :return: 与keys顺序相同的列表，未命中的位置为None，命中为 (转换结果, 是否失败)
+        """
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                results.append(entry)
+        return results
+
+    def put_many(self, items):
+        """
+        批量写入，超出上限时淘汰最久未使用的条目
+        :param items: [(键, (转换结果, 是否失败)), ...]
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            for key, entry in items:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# 全局共享的转换缓存
+conversion_cache = ConversionCache(int(os.getenv('CONVERSION_CACHE_SIZE', '100000')))
+
+def _parse_date(value):
+    """
+    日期字符串转换为 YYYY-MM-DD 格式，无法解析时抛出ValueError
+    """
+    if value is None:
+        return None
+    date_str = str(value).strip()
+    if len(date_str) == 8 and date_str.isdigit():
+        year = date_str[:4]
+        month = date_str[4:6]
+        day = date_str[6:8]
+        return f"{year}-{month}-{day}"
+    elif len(date_str) == 6 and date_str.isdigit():
+        year = date_str[:4]
+        month = date_str[4:6]
+        return f"{year}-{month}-01"
+    else:
+        try:
+            return pd.to_datetime(date_str).strftime('%Y-%m-%d')
+        except Exception:
+            raise ValueError(f"无法解析日期格式: {date_str}")
+
+def _to_object_array(values) -> np.ndarray:
+    """
+    将一列值转换为一维object数组（不拆分字符串等序列）
+    """
+    column = np.empty(len(values), dtype=object)
+    column[:] = list(values)
+    return column
+
+class ColumnConverter:
+    def __init__(self, conversion_rule, verbose: bool = True, use_cache: bool = True):
+        """
+        预先解析转换规则（只解析一次data_type）
+        :param conversion_rule: 转换规则 {'data_type', 'not_null', 'default_value'}
+        :param verbose: 转换失败时是否输出警告（数据校验时关闭）
+        :param use_cache: 是否使用全局转换缓存（数据校验时关闭，避免挤掉迁移用的缓存条目）
+        """
+        conversion_rule = conversion_rule or {}
+        self.verbose = verbose
+        self.data_type = conversion_rule.get('data_type', '').lower()
+        self.default_value = conversion_rule.get('default_value', None)
+        if 'varchar' in self.data_type or 'nvarchar' in self.data_type:
+            self.kind = 'varchar'
+            self._convert = str
+        elif self.data_type == 'int':
+            self.kind = 'int'
+            self._convert = lambda value: int(float(value))
+        elif 'decimal' in self.data_type:
+            self.kind = 'decimal'
+            self._convert = float
+        elif self.data_type == 'date':
+            self.kind = 'date'
+            self._convert = _parse_date
+        else:
+            self.kind = None
+            self._convert = None
+        self.use_cache = use_cache and self.kind in CACHED_KINDS and conversion_cache.maxsize > 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, hits, misses):
+        with self._stats_lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+
+    def _convert_scalar(self, value):
+        """
+        转换单个值
+        :return: (是否成功, 转换结果)
+        """
+        try:
+            return True, self._convert(value)
+        except Exception as e:
+            if self.verbose:
+                if self.kind == 'date':
+                    logger.warning("%s", e)
+                else:
+                    # 大量出错时同类错误只输出一定条数，其余汇总为条数（见logger）
+                    logger.warning("数据类型转换错误: %s", e)
+            return False, self.default_value
+
+    def __call__(self, value):
+        """
+        转换单个值（结果与convert_type相同）
+        """
+        if self._convert is None:
+            return value
+        if not self.use_cache:
+            return self._convert_scalar(value)[1]
+
+        key = (self.data_type, type(value), value)
+        try:
+            entry = conversion_cache.get_many([key])[0]
+        except TypeError:
+            # 不可哈希的值不缓存
+            return self._convert_scalar(value)[1]
+        if entry is None:
+            self._count(0, 1)
+            ok, result = self._convert_scalar(value)
+            entry = (result, not ok)
+            conversion_cache.put_many([(key, entry)])
+        else:
+            self._count(1, 0)
+        result, is_failed = entry
+        return self.default_value if is_failed else result
+
+    def convert_column(self, values):
+        """
+        向量化转换一整列
+        :param values: 一批数据中的一列值（list / numpy数组 / pandas Series）
+        :return: (转换后的object数组, 转换失败的布尔掩码)，失败的行为default_value
+        """
+        column = _to_object_array(values)
+        if self.use_cache and len(column) > 0:
+            try:
+                return self._convert_column_cached(column)
+            except TypeError:
+                # 不可哈希的值不缓存
+                pass
+        return self._convert_column(column)
+
+    def _convert_column_cached(self, column: np.ndarray):
+        """
+        按唯一值转换一整列：已缓存的值只需查表，未缓存的唯一值向量化转换后写入缓存
+        """
+        # 空值（None/NaN）不参与去重，直接转换
+        codes, uniques = pd.factorize(column)
+        uniques = _to_object_array(uniques)
+        keys = [(self.data_type, type(value), value) for value in uniques]
+        entries = conversion_cache.get_many(keys)
+        miss_positions = [i for i, entry in enumerate(entries) if entry is None]
+        if miss_positions:
+            converted, failed = self._convert_column(uniques[miss_positions])
+            new_entries = []
+            for position, result, is_failed in zip(miss_positions, converted, failed):
+                entries[position] = (result, bool(is_failed))
+                new_entries.append((keys[position], entries[position]))
+            conversion_cache.put_many(new_entries)
+
+        result = np.empty(len(column), dtype=object)
+        failed = np.zeros(len(column), dtype=bool)
+        present = codes >= 0
+        if len(uniques):
+            unique_results = np.empty(len(uniques), dtype=object)
+            unique_failed = np.zeros(len(uniques), dtype=bool)
+            for i, (value, is_failed) in enumerate(entries):
+                unique_failed[i] = is_failed
+                unique_results[i] = self.default_value if is_failed else value
+            result[present] = unique_results[codes[present]]
+            failed[present] = unique_failed[codes[present]]
+        if not present.all():
+            result[~present], failed[~present] = self._convert_column(column[~present])
+
+        # 首次出现的唯一值计为未命中，其余非空行都只需查表
+        self._count(int(present.sum()) - len(miss_positions), len(miss_positions))
+        return result, failed
+
+    def _convert_column(self, column: np.ndarray):
+        """
+        向量化转换一整列（不使用缓存）
+        """
+        failed = np.zeros(len(column), dtype=bool)
+        if self.kind is None or len(column) == 0:
+            return column, failed
+
+        series = pd.Series(column, dtype=object)
+        if self.kind == 'varchar':
+            return series.astype(str).to_numpy(dtype=object), failed
+
+        if self.kind == 'date':
+            return self._convert_date_column(series, failed)
+
+        # 数值类型：先整体转换，无法转换的值再逐个按原规则处理
+        numbers = pd.to_numeric(series, errors='coerce').astype('float64').to_numpy()
+        invalid = ~np.isfinite(numbers)
+        if self.kind == 'int':
+            # 超出int64范围的值交给逐个转换（与convert_type相同，转换为Python的int）
+            invalid |= (numbers < -2.0 ** 63) | (numbers >= 2.0 ** 63)
+            numbers = np.trunc(np.where(invalid, 0, numbers)).astype('int64')
+        result = numbers.astype(object)
+        for i in np.flatnonzero(invalid):
+            ok, result[i] = self._convert_scalar(column[i])
+            failed[i] = not ok
+        return result, failed
+
+    def _convert_date_column(self, series: pd.Series, failed: np.ndarray):
+        """
+        向量化转换日期列（YYYYMMDD / YYYYMM 直接切片，其余格式统一解析）
+        """
+        result = np.full(len(series), None, dtype=object)
+        # 只有None直接返回None，NaN等其他空值与convert_type相同，按无法解析处理（使用default_value）
+        present = np.fromiter((value is not None for value in series), dtype=bool, count=len(series))
+        text = series.astype(str).str.strip()
+        is_digit = text.str.isdigit().to_numpy(dtype=bool)
+        length = text.str.len().to_numpy()
+
+        ymd = present & is_digit & (length == 8)
+        if ymd.any():
+            part = text[ymd]
+            result[ymd] = (part.str[:4] + '-' + part.str[4:6] + '-' + part.str[6:8]).to_numpy(dtype=object)
+
+        ym = present & is_digit & (length == 6)
+        if ym.any():
+            part = text[ym]
+            result[ym] = (part.str[:4] + '-' + part.str[4:6] + '-01').to_numpy(dtype=object)
+
+        other = present & ~ymd & ~ym
+        if other.any():
+            parsed = None
+            try:
+                with warnings.catch_warnings():
+                    # 混合时区时pandas会给出FutureWarning（今后的版本中改为抛出异常）
+                    warnings.simplefilter('ignore', FutureWarning)
+                    parsed = pd.to_datetime(text[other], errors='coerce', format='mixed')
+            except (ValueError, TypeError):
+                pass
+            if parsed is None or not pd.api.types.is_datetime64_any_dtype(parsed):
+                # 混合时区等无法统一为datetime64时逐个按原规则转换（与convert_type相同，按各自的时区取日期）
+                for position in np.flatnonzero(other):
+                    ok, result[position] = self._convert_scalar(series.iloc[position])
+                    failed[position] = not ok
+                return result, failed
+            parsed_ok = parsed.notna().to_numpy()
+            formatted = parsed.dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+            positions = np.flatnonzero(other)
+            result[positions[parsed_ok]] = formatted[parsed_ok]
+            bad_positions = positions[~parsed_ok]
+            if len(bad_positions):
+                result[bad_positions] = self.default_value
+                failed[bad_positions] = True
+                if self.verbose:
+                    logger.warning("无法解析日期格式: %d 件 (例: %s)", len(bad_positions), text.iloc[bad_positions[0]])
+        return result, failed
+
+def compile_converter(conversion_rule, verbose: bool = True, use_cache: bool = True) -> ColumnConverter:
+    """
+    预先解析转换规则，返回转换函数（可逐值调用，也可按列向量化转换）
+    """
+    return ColumnConverter(conversion_rule, verbose, use_cache)
+
+def convert_column(values, conversion_rule):
+    """
+    按转换规则向量化转换一整列
+    :return: (转换后的object数组, 转换失败的布尔掩码)
+    """
+    return compile_converter(conversion_rule).convert_column(values)
+
+def convert_rows(rows, conversion_plan):
+    """
+    按列批量转换一批行
+    :param rows: 源数据行列表
+    :param conversion_plan: [(源列索引, ColumnConverter), ...]
+    :return: 转换后的行列表（列顺序与conversion_plan相同）
+    """
+    columns = [
+        converter.convert_column([row[index] for row in rows])[0]
+        for index, converter in conversion_plan
+    ]
+    return [list(values) for values in zip(*columns)]
+
+def get_cache_stats(converters):
+    """
+    汇总一张表所用转换器的缓存命中情况
+    :param converters: ColumnConverter列表
+    :return: (命中数, 未命中数)
+    """
+    converters = [converter for converter in converters if isinstance(converter, ColumnConverter)]
+    hits = sum(converter.cache_hits for converter in converters)
+    misses = sum(converter.cache_misses for converter in converters)
+    return hits, misses
 
 def convert_type(value, conversion_rule):
     """
@@ -8,36 +337,5 @@ def convert_type(value, conversion_rule):
     #     if conversion_rule.get('not_null', False):
     #         return conversion_rule.get('default_value', '')
     #     return None
-        
-    try:
-        data_type = conversion_rule.get('data_type', '').lower()
-        if 'varchar' in data_type or 'nvarchar' in data_type:
-            return str(value)
-        elif data_type == 'int':
-            return int(float(value))
-        elif 'decimal' in data_type:
-            return float(value)
-        elif data_type == 'date':
-            if value is None:
-                return None
-            date_str = str(value).strip()
-            if len(date_str) == 8 and date_str.isdigit():
-                year = date_str[:4]
-                month = date_str[4:6]
-                day = date_str[6:8]
-                return f"{year}-{month}-{day}"
-            elif len(date_str) == 6 and date_str.isdigit():
-                year = date_str[:4]
-                month = date_str[4:6]
-                return f"{year}-{month}-01"
-            else:
-                try:
-                    return pd.to_datetime(date_str).strftime('%Y-%m-%d')
-                except:
-                    print(f"警告: 无法解析日期格式: {date_str}")
-                    return conversion_rule.get('default_value', None)
-        else:
-            return value
-    except Exception as e:
-        print(f"数据类型转换错误: {str(e)}")
-        return conversion_rule.get('default_value', None) 
\ No newline at end of file
+
+    return compile_converter(conversion_rule)(value)